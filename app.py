@@ -1,8 +1,25 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Literal, Optional
+import codecs
+import contextlib
+import json
+import os
+import time
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
 
 from core.event_bus import EventBus
+from core.idempotency import IdempotencyCache
+from core.metrics import REGISTRY
+from core.tracing import TRACER, TraceWriter, current_trace_id, new_trace_id
+from core.transport import RemoteEventBus, RemoteIdempotencyCache, RemoteOrderProjection
+from ecommerce.order_projection import OrderProjection
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class OrderWebhook(BaseModel):
@@ -14,26 +31,209 @@ class OrderWebhook(BaseModel):
     status: Literal["created", "paid", "shipped"]
 
 
-app = FastAPI(title="Event-Driven Webhook Handler")
+MAX_BATCH_RECORDS = 10_000
+"""Максимальна кількість записів в одному пакетному запиті."""
+
+EVENT_BROKER_SOCKET_ENV = "EVENT_BROKER_SOCKET"
+"""Змінна оточення зі шляхом до сокета брокера подій (режим кількох процесів uvicorn)."""
+
+EVENT_TRACE_FILE_ENV = "EVENT_TRACE_FILE"
+"""Змінна оточення з базовим шляхом файлу трасування (режим кількох процесів uvicorn)."""
+
+TRACE_ID_HEADER = "X-Trace-Id"
+"""Заголовок запиту/відповіді з ідентифікатором трасування."""
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware, що призначає кожному HTTP-запиту ідентифікатор трасування.
+
+    Ідентифікатор береться із заголовка `X-Trace-Id` (якщо партнер його передав)
+    або генерується, зберігається в `current_trace_id` (звідки його бере `EventBus.emit`)
+    і повертається у відповіді. Спан 'webhook.ingest' охоплює весь запит, включно
+    з читанням тіла та валідацією. Якщо трасування вимкнене, запит передається далі без змін.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACER.enabled:
+            await self.app(scope, receive, send)
+            return
 
-event_bus: Optional[EventBus] = None
+        header = TRACE_ID_HEADER.lower().encode("latin-1")
+        trace_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == header), "")
+        if not trace_id or len(trace_id) > 64:
+            trace_id = new_trace_id()
 
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(header, trace_id.encode("latin-1"))]
+            await send(message)
 
-def set_event_bus(bus_instance: EventBus):
+        token = current_trace_id.set(trace_id)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            current_trace_id.reset(token)
+            TRACER.record("webhook.ingest", trace_id, started, time.monotonic(), "http",
+                          method=scope["method"], path=scope["path"])
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Життєвий цикл застосунку.
+
+    У режимі кількох процесів (`run_server.py --workers N`) кожен процес uvicorn
+    імпортує лише цей модуль, тому шину потрібно підключити тут: якщо EventBus
+    ще не встановлено і задано змінну `EVENT_BROKER_SOCKET`, події публікуються
+    у спільний брокер через `RemoteEventBus`, запити до проєкції замовлень
+    виконуються через `RemoteOrderProjection`, а ключі ідемпотентності перевіряє
+    спільний кеш брокера (`RemoteIdempotencyCache`), тож повтор вебхука
+    відсікається незалежно від того, який процес його прийняв.
+
+    Якщо задано `EVENT_TRACE_FILE`, процес записує власні спани прийому вебхуків
+    в окремий файл з PID у назві (`traces.json` -> `traces.{pid}.json`), а спани шини
+    та воркерів пише процес брокера.
+    """
+    remote_bus = None
+    trace_writer = None
+    socket_path = os.environ.get(EVENT_BROKER_SOCKET_ENV)
+    if event_bus is None and socket_path:
+        remote_bus = RemoteEventBus(socket_path)
+        set_event_bus(remote_bus)
+        if order_projection is None:
+            set_order_projection(RemoteOrderProjection(remote_bus))
+        set_idempotency_cache(RemoteIdempotencyCache(remote_bus))
+
+    trace_file = os.environ.get(EVENT_TRACE_FILE_ENV)
+    if trace_file and not TRACER.enabled:
+        root, extension = os.path.splitext(trace_file)
+        trace_writer = TraceWriter(f"{root}.{os.getpid()}{extension}")
+        trace_writer.start()
+        TRACER.configure(trace_writer)
+    yield
+    if remote_bus:
+        remote_bus.close()
+    if trace_writer:
+        TRACER.configure(None)
+        trace_writer.stop()
+
+
+app = FastAPI(
+    title="Event-Driven Webhook Handler",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson else JSONResponse,
+)
+app.add_middleware(TracingMiddleware)
+
+event_bus: Optional[Union[EventBus, RemoteEventBus]] = None
+
+idempotency_cache: Union[IdempotencyCache, RemoteIdempotencyCache] = IdempotencyCache()
+"""Кеш ключів ідемпотентності для відсікання повторних вебхуків від партнерів."""
+
+order_projection: Optional[Union[OrderProjection, RemoteOrderProjection]] = None
+
+
+def set_event_bus(bus_instance: Union[EventBus, RemoteEventBus]):
     """
     Встановлює глобальний інстанс EventBus для використання обробниками вебхуків.
     Ця функція викликається під час ініціалізації сервера.
 
-    :param bus_instance: Інстанс EventBus.
-    :type bus_instance: EventBus
+    :param bus_instance: Інстанс EventBus (або RemoteEventBus у режимі кількох процесів).
+    :type bus_instance: Union[EventBus, RemoteEventBus]
     """
     global event_bus
     event_bus = bus_instance
     print("SERVER: EventBus успішно підключено")
 
 
+def set_idempotency_cache(cache: Union[IdempotencyCache, RemoteIdempotencyCache]):
+    """
+    Замінює кеш ідемпотентності (наприклад, на кеш з персистентним індексом
+    або на спільний кеш брокера в режимі кількох процесів).
+
+    :param cache: Інстанс IdempotencyCache (або RemoteIdempotencyCache).
+    :type cache: Union[IdempotencyCache, RemoteIdempotencyCache]
+    """
+    global idempotency_cache
+    idempotency_cache = cache
+
+
+def set_order_projection(projection: Union[OrderProjection, RemoteOrderProjection]):
+    """
+    Встановлює проєкцію стану замовлень, яку використовують ендпоінти запитів.
+
+    :param projection: Інстанс OrderProjection, підписаний на події 'order.*'
+                       (або RemoteOrderProjection у режимі кількох процесів).
+    :type projection: Union[OrderProjection, RemoteOrderProjection]
+    """
+    global order_projection
+    order_projection = projection
+
+
+def get_idempotency_key(order: OrderWebhook, header_key: Optional[str] = None) -> str:
+    """
+    Формує ключ ідемпотентності для вебхука.
+
+    Якщо партнер передав заголовок `Idempotency-Key`, використовується він,
+    інакше ключем є пара (order_id, status).
+
+    :param order: Валідовані дані вебхука.
+    :type order: OrderWebhook
+    :param header_key: Значення заголовка `Idempotency-Key`.
+    :type header_key: Optional[str]
+    :return: Ключ ідемпотентності.
+    :rtype: str
+    """
+    if header_key:
+        return f"key:{header_key}"
+    return f"order:{order.order_id}:{order.status}"
+
+
+async def _emit(method_name: str, *args):
+    """
+    Викликає метод емісії EventBus, не блокуючи event loop.
+
+    Якщо шина має фоновий `log_writer`, емісія лише кладе завдання у черги
+    і виконується напряму. Інакше (синхронний запис у файл або `RemoteEventBus`,
+    що чекає на підтвердження брокера) виклик переноситься у пул потоків.
+
+    :param method_name: Назва методу шини ('emit' або 'emit_batch').
+    :type method_name: str
+    :param args: Аргументи методу.
+    :raises Exception: Якщо емісія не вдалася (зокрема, брокер повернув помилку).
+    """
+    method = getattr(event_bus, method_name)
+    if isinstance(event_bus, RemoteEventBus):
+        return await run_in_threadpool(method, *args)
+    if getattr(event_bus, "log_writer", None) or not getattr(event_bus, "log_file", None):
+        return method(*args)
+    return await run_in_threadpool(method, *args)
+
+
+async def _dedup(method_name: str, *args):
+    """
+    Викликає метод кешу ідемпотентності, не блокуючи event loop.
+
+    Локальний кеш працює в пам'яті (індекс на диск дописує фоновий потік), тому
+    викликається напряму; запит до спільного кешу брокера переноситься у пул потоків.
+
+    :param method_name: Назва методу кешу ('add', 'add_many' або 'discard').
+    :type method_name: str
+    :param args: Аргументи методу.
+    """
+    method = getattr(idempotency_cache, method_name)
+    if isinstance(idempotency_cache, RemoteIdempotencyCache):
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
 @app.post("/webhook/order")
-def handle_order_book(order: OrderWebhook):
+async def handle_order_book(order: OrderWebhook, idempotency_key: Optional[str] = Header(None)):
     """
     Обробляє вхідні HTTP POST запити на вебхук замовлень.
 
@@ -41,21 +241,250 @@ def handle_order_book(order: OrderWebhook):
     - Ім'я події: 'order.{status}' (наприклад, 'order.created').
     - Дані: Корисне навантаження з ID замовлення.
 
-    Якщо EventBus не ініціалізовано, повертає помилку 500.
+    Повторні запити (той самий `Idempotency-Key` або та сама пара order_id/status)
+    відсікаються до емісії і повертають статус 'duplicate'.
+
+    Обробник асинхронний: емісія не займає слот пулу потоків, а запис у журнал
+    виконує фоновий записувач шини (див. `_emit`).
 
     :param order: Валідовані дані вебхука.
     :type order: OrderWebhook
+    :param idempotency_key: Значення заголовка `Idempotency-Key` (опціонально).
+    :type idempotency_key: Optional[str]
     :return: Словник зі статусом обробки.
     :rtype: Dict[str, Any]
+    :raises HTTPException: 500, якщо EventBus не ініціалізовано.
     """
     if not event_bus:
-        return {"status": "error", "message": "EventBus не ініціалізовано"}, 500
+        raise HTTPException(status_code=500, detail="EventBus не ініціалізовано")
 
     event_name = f"order.{order.status}"
-    data = {"order_id": order.order_id, "amount": 0}
+    key = get_idempotency_key(order, idempotency_key)
 
-    event_bus.emit(event_name, data)
+    if not await _dedup("add", key):
+        return {"status": "duplicate", "event_name": event_name, "message": "Подію вже прийнято раніше."}
 
-    print(f"SERVER: Отримано Webhook. Подія '{event_name}' додана до черги.")
+    data = {"order_id": order.order_id, "amount": 0}
+
+    try:
+        await _emit("emit", event_name, data)
+    except Exception:
+        await _dedup("discard", key)
+        raise
 
     return {"status": "success", "event_name": event_name, "message": "Подія прийнята в обробку."}
+
+
+async def _iter_batch_records(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """
+    Інкрементально розбирає тіло пакетного запиту в міру надходження даних.
+
+    Підтримуються два формати, що визначаються за першим непробільним символом:
+    - NDJSON: один JSON-об'єкт на рядок (некоректний рядок — помилка лише цього запису);
+    - JSON-масив: `[{...}, {...}]` (синтаксична помилка зупиняє розбір решти тіла).
+
+    :param request: Вхідний HTTP запит.
+    :type request: Request
+    :return: Асинхронний генератор пар (record, error). Для коректного запису error = None.
+    :rtype: AsyncIterator[Tuple[Any, Optional[str]]]
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    json_decoder = json.JSONDecoder()
+    buffer = ""
+    is_array: Optional[bool] = None
+    array_closed = False
+    stream_ended = False
+    chunks = request.stream()
+
+    while True:
+        if not stream_ended:
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                stream_ended = True
+                buffer += decoder.decode(b"", final=True)
+            else:
+                buffer += decoder.decode(chunk)
+
+        if is_array is None:
+            buffer = buffer.lstrip()
+            if not buffer:
+                if stream_ended:
+                    return
+                continue
+            is_array = buffer[0] == "["
+            if is_array:
+                buffer = buffer[1:]
+
+        if not is_array:
+            lines = buffer.split("\n")
+            buffer = "" if stream_ended else lines.pop()
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line), None
+                except json.JSONDecodeError as ex:
+                    yield None, f"Некоректний JSON: {ex}"
+        else:
+            position = 0
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) and buffer[position] == "]":
+                    array_closed = True
+                    position += 1
+                    break
+                if position >= len(buffer):
+                    break
+                try:
+                    record, position = json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as ex:
+                    if stream_ended:
+                        yield None, f"Некоректний JSON: {ex}"
+                        return
+                    break
+                yield record, None
+            buffer = buffer[position:]
+
+            if array_closed:
+                return
+            if stream_ended:
+                if buffer.strip():
+                    yield None, "Некоректний JSON: масив не закрито"
+                return
+
+        if stream_ended:
+            return
+
+
+@app.post("/webhook/order/batch")
+async def handle_order_batch(request: Request):
+    """
+    Пакетний вебхук замовлень для партнерів, що надсилають оновлення масово.
+
+    Приймає потокове тіло у форматі NDJSON або JSON-масиву. Записи валідуються
+    моделлю `OrderWebhook` по мірі надходження, дублікати відсікаються кешем
+    ідемпотентності, а всі валідні події публікуються в шину одним пакетом
+    (`EventBus.emit_batch`).
+
+    :param request: Вхідний HTTP запит.
+    :type request: Request
+    :return: Підсумок обробки та результати для кожного запису
+             (`accepted`, `duplicate` або `invalid`).
+    :rtype: Dict[str, Any]
+    :raises HTTPException: 500, якщо EventBus не ініціалізовано;
+                           413, якщо пакет перевищує `MAX_BATCH_RECORDS`.
+    """
+    if not event_bus:
+        raise HTTPException(status_code=500, detail="EventBus не ініціалізовано")
+
+    results: List[Dict[str, Any]] = []
+    candidates: List[Tuple[Dict[str, Any], str, Tuple[str, Any]]] = []
+    counts = {"accepted": 0, "duplicate": 0, "invalid": 0}
+
+    index = 0
+    async for record, error in _iter_batch_records(request):
+        if index >= MAX_BATCH_RECORDS:
+            raise HTTPException(status_code=413, detail=f"Пакет перевищує {MAX_BATCH_RECORDS} записів")
+
+        result: Dict[str, Any] = {"index": index}
+        index += 1
+
+        if error is not None:
+            error = [{"type": "json_invalid", "loc": [], "msg": error}]
+        else:
+            try:
+                order = OrderWebhook.model_validate(record)
+            except ValidationError as ex:
+                error = ex.errors(include_url=False, include_context=False, include_input=False)
+
+        if error is not None:
+            result.update(status="invalid", errors=error)
+            counts["invalid"] += 1
+        else:
+            event_name = f"order.{order.status}"
+            result.update(order_id=order.order_id, event_name=event_name)
+            candidates.append((result, get_idempotency_key(order),
+                               (event_name, {"order_id": order.order_id, "amount": 0})))
+        results.append(result)
+
+    # Ключі перевіряються одним викликом після розбору: пакет, відхилений як завеликий,
+    # не залишає ключів у кеші, а спільному кешу брокера потрібен один запит.
+    keys: List[str] = []
+    events: List[Tuple[str, Any]] = []
+    added = await _dedup("add_many", [key for _, key, _ in candidates]) if candidates else []
+    for (result, key, event), is_new in zip(candidates, added):
+        if is_new:
+            keys.append(key)
+            events.append(event)
+            result["status"] = "accepted"
+        else:
+            result["status"] = "duplicate"
+        counts[result["status"]] += 1
+
+    if events:
+        try:
+            await _emit("emit_batch", events)
+        except Exception:
+            for key in keys:
+                await _dedup("discard", key)
+            raise
+
+    return {"status": "success", **counts, "results": results}
+
+
+@app.get("/orders/{order_id}")
+def get_order(order_id: int):
+    """
+    Повертає поточний стан замовлення з проєкції.
+
+    :param order_id: ID замовлення.
+    :type order_id: int
+    :return: Запис замовлення (статус, сума, користувач, часові мітки).
+    :rtype: Dict[str, Any]
+    :raises HTTPException: 503, якщо проєкцію не ініціалізовано; 404, якщо замовлення невідоме.
+    """
+    if not order_projection:
+        raise HTTPException(status_code=503, detail="OrderProjection не ініціалізовано")
+
+    record = order_projection.get(order_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Замовлення {order_id} не знайдено")
+    return record
+
+
+@app.get("/users/{user_id}/orders")
+def get_user_orders(user_id: int):
+    """
+    Повертає всі замовлення користувача з проєкції.
+
+    :param user_id: ID користувача.
+    :type user_id: int
+    :return: Словник зі списком замовлень.
+    :rtype: Dict[str, Any]
+    :raises HTTPException: 503, якщо проєкцію не ініціалізовано.
+    """
+    if not order_projection:
+        raise HTTPException(status_code=503, detail="OrderProjection не ініціалізовано")
+
+    return {"user_id": user_id, "orders": order_projection.get_by_user(user_id)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Повертає метрики шини, черги та воркерів у текстовому форматі Prometheus.
+
+    У режимі кількох процесів метрики збираються в процесі брокера, якому
+    належать шина та EventWorker'и.
+
+    :return: Текст метрик.
+    :rtype: PlainTextResponse
+    """
+    if isinstance(event_bus, RemoteEventBus):
+        text = event_bus.query("metrics")
+    else:
+        text = REGISTRY.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,274 @@
+"""
+Мікробенчмарки `core/event_bus.py` та `ecommerce/worker.py`.
+
+Вимірюються:
+- вартість `subscribe` та маршрутизації залежно від кількості підписок;
+- вартість перевірки фільтрів підписок (`where`) залежно від кількості фільтрованих підписок;
+- вартість `emit` без журналу, із синхронним записом та з фоновим записувачем;
+- накладні витрати EventWorker на диспетчеризацію завдання;
+- швидкість `replay_from_file` залежно від розміру журналу.
+
+Усі прогони використовують навантаження з `benchmarks.workload` з фіксованим зерном.
+
+    python -m benchmarks.bus_micro --output micro.json
+    python -m benchmarks.bus_micro --only emit,replay --events 200000
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import tempfile
+import time
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.workload import WorkloadGenerator
+from core.event_bus import EventBus
+from core.log_pipeline import LogPipeline
+from core.log_writer import EventLogWriter
+from ecommerce.worker import STOP_SIGNAL, EventWorker
+
+
+def best_of(repeat: int, func: Callable[[], float]) -> float:
+    """Повертає найкращий (мінімальний) час з `repeat` запусків `func`."""
+    return min(func() for _ in range(repeat))
+
+
+def noop_listener(event_name: str, data: Any):
+    pass
+
+
+def make_listener(index: int) -> Callable:
+    """Створює окрему функцію-слухача (підписки порівнюються за ідентичністю)."""
+
+    def listener(event_name: str, data: Any):
+        pass
+
+    listener.__name__ = f"listener_{index}"
+    return listener
+
+
+def bench_subscribe_route(sizes: List[int], routes: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    Вимірює вартість підписки та пошуку слухачів для події.
+
+    Половина підписок — на подію, що маршрутизується ('order.created'), решта розподілена
+    між іншими іменами та вайлдкардом 'order.*'.
+    """
+    results = []
+    for size in sizes:
+        def run_subscribe() -> float:
+            bus = EventBus(Queue(), log_file=None)
+            listeners = [make_listener(i) for i in range(size)]
+            started = time.perf_counter()
+            for i, listener in enumerate(listeners):
+                if i % 2 == 0:
+                    bus.subscribe("order.created", listener)
+                elif i % 4 == 1:
+                    bus.subscribe("order.*", listener)
+                else:
+                    bus.subscribe(f"user.event_{i}", listener)
+            return time.perf_counter() - started
+
+        bus = EventBus(Queue(), log_file=None)
+        for i in range(size):
+            bus.subscribe("order.created" if i % 2 == 0 else "order.*" if i % 4 == 1 else f"user.event_{i}",
+                          make_listener(i))
+
+        def run_route() -> float:
+            started = time.perf_counter()
+            for _ in range(routes):
+                bus._get_matching_callbacks("order.created")
+            return time.perf_counter() - started
+
+        subscribe_time = best_of(repeat, run_subscribe)
+        route_time = best_of(repeat, run_route)
+        results.append({
+            "subscriptions": size,
+            "subscribe_us_per_op": subscribe_time / size * 1e6,
+            "route_us_per_op": route_time / routes * 1e6,
+            "matched_callbacks": len(bus._get_matching_callbacks("order.created")),
+        })
+    return results
+
+
+def bench_filters(sizes: List[int], events: List[tuple], repeat: int) -> List[Dict[str, Any]]:
+    """
+    Вимірює вартість маршрутизації з фільтрами підписок.
+
+    Кожна підписка на 'order.*' фільтрує за власним `user_id`, кожна друга додатково
+    задає діапазон суми замовлення, тож більшість подій проходить лише кілька фільтрів.
+    """
+    results = []
+    for size in sizes:
+        bus = EventBus(Queue(), log_file=None)
+        for i in range(size):
+            where: Dict[str, Any] = {"user_id": i}
+            if i % 2:
+                where["amount"] = {"gte": (i % 10) * 100}
+            bus.subscribe("order.*", make_listener(i), where=where)
+        for event_name in {event_name for _, event_name, _ in events}:
+            bus._get_matching_callbacks(event_name)
+
+        def run() -> float:
+            started = time.perf_counter()
+            for _, event_name, data in events:
+                bus._get_matching_callbacks(event_name, data)
+            return time.perf_counter() - started
+
+        elapsed = best_of(repeat, run)
+        matched = sum(len(bus._get_matching_callbacks(event_name, data)) for _, event_name, data in events)
+        results.append({
+            "filtered_subscriptions": size,
+            "route_us_per_op": elapsed / len(events) * 1e6,
+            "avg_matched_callbacks": matched / len(events),
+        })
+    return results
+
+
+def bench_emit(events: List[tuple], workdir: str, repeat: int) -> List[Dict[str, Any]]:
+    """Вимірює вартість `emit` для різних політик журналу (з одним підписаним слухачем)."""
+    results = []
+    for policy in ("none", "sync", "background"):
+        def run() -> float:
+            log_path = os.path.join(workdir, f"emit_{policy}.log")
+            log_writer = EventLogWriter(log_path) if policy == "background" else None
+            if log_writer:
+                log_writer.start()
+            bus = EventBus(Queue(), log_file=log_path if policy == "sync" else None, log_writer=log_writer)
+            bus.subscribe("order.*", noop_listener)
+
+            started = time.perf_counter()
+            for _, event_name, data in events:
+                bus.emit(event_name, data)
+            elapsed = time.perf_counter() - started
+
+            if log_writer:
+                log_writer.stop()
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            return elapsed
+
+        elapsed = best_of(repeat, run)
+        results.append({
+            "log_policy": policy,
+            "events": len(events),
+            "emit_us_per_op": elapsed / len(events) * 1e6,
+            "emits_per_sec": len(events) / elapsed,
+        })
+    return results
+
+
+def bench_worker(events: List[tuple], listeners: int, repeat: int) -> Dict[str, Any]:
+    """Вимірює пропускну здатність EventWorker на заздалегідь заповненій черзі з порожніми слухачами."""
+    callbacks = [make_listener(i) for i in range(listeners)]
+
+    def run() -> float:
+        queue = Queue()
+        for _, event_name, data in events:
+            queue.put((event_name, data, callbacks, time.monotonic(), None))
+        queue.put(STOP_SIGNAL)
+        worker = EventWorker(queue)
+        started = time.perf_counter()
+        worker.start()
+        worker.join()
+        return time.perf_counter() - started
+
+    elapsed = best_of(repeat, run)
+    return {
+        "tasks": len(events),
+        "listeners_per_task": listeners,
+        "dispatch_us_per_task": elapsed / len(events) * 1e6,
+        "tasks_per_sec": len(events) / elapsed,
+    }
+
+
+def bench_replay(sizes: List[int], seed: int, workdir: str, repeat: int) -> List[Dict[str, Any]]:
+    """Вимірює швидкість `replay_from_file` для журналів різного розміру."""
+    results = []
+    for size in sizes:
+        log_path = os.path.join(workdir, f"replay_{size}.log")
+        file_size = WorkloadGenerator(seed=seed).write_log(log_path, size)
+
+        def run() -> float:
+            bus = EventBus(Queue(), log_file=None)
+            bus.subscribe("order.*", noop_listener)
+            started = time.perf_counter()
+            bus.replay_from_file(log_path)
+            return time.perf_counter() - started
+
+        elapsed = best_of(repeat, run)
+        os.remove(log_path)
+        results.append({
+            "events": size,
+            "file_mb": file_size / 1e6,
+            "seconds": elapsed,
+            "events_per_sec": size / elapsed,
+            "mb_per_sec": file_size / 1e6 / elapsed,
+        })
+    return results
+
+
+BENCHMARKS = ("subscribe", "filters", "emit", "worker", "replay")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Мікробенчмарки EventBus та EventWorker")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Набір бенчмарків: {','.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--events", type=int, default=100_000, help="Кількість подій для emit/worker")
+    parser.add_argument("--subscription-sizes", default="1,10,100,1000,5000")
+    parser.add_argument("--routes", type=int, default=10_000, help="Кількість пошуків слухачів на вимір")
+    parser.add_argument("--replay-sizes", default="10000,100000,1000000")
+    parser.add_argument("--worker-listeners", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3, help="Кількість повторів (береться найкращий)")
+    parser.add_argument("--output", help="Файл для JSON результатів (за замовчуванням stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Не приховувати діагностичний вивід шини")
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(",")
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        else:
+            stack.callback(LogPipeline(level="DEBUG").start().stop)
+
+        events = list(WorkloadGenerator(seed=args.seed).events(args.events)) \
+            if {"filters", "emit", "worker"} & set(selected) else []
+
+        if "subscribe" in selected:
+            sizes = [int(value) for value in args.subscription_sizes.split(",")]
+            results["subscribe_route"] = bench_subscribe_route(sizes, args.routes, args.repeat)
+        if "filters" in selected:
+            sizes = [int(value) for value in args.subscription_sizes.split(",")]
+            results["filters"] = bench_filters(sizes, events[:args.routes], args.repeat)
+        if "emit" in selected:
+            results["emit"] = bench_emit(events, workdir, args.repeat)
+        if "worker" in selected:
+            results["worker"] = bench_worker(events, args.worker_listeners, args.repeat)
+        if "replay" in selected:
+            sizes = [int(value) for value in args.replay_sizes.split(",")]
+            results["replay"] = bench_replay(sizes, args.seed, workdir, args.repeat)
+
+    report = {
+        "benchmark": "bus_micro",
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Наскрізний бенчмарк: від отримання вебхука `/webhook/order` до завершення слухача.
+
+Приклади запуску (з кореня проєкту):
+
+    python -m benchmarks.webhook_e2e --requests 5000 --concurrency 64
+    python -m benchmarks.webhook_e2e --mode http --workers 1,4 --log-policies sync,background
+    python -m benchmarks.webhook_e2e --output results.json
+
+Результат — JSON зі списком прогонів (по одному на кожну комбінацію конфігурації шини).
+"""
+import argparse
+import asyncio
+import contextlib
+import http.client
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, LifoQueue
+from typing import Any, Dict, List, Optional
+
+import app as webhook_app
+from core.event_bus import EventBus
+from core.idempotency import IdempotencyCache
+from core.log_pipeline import LogPipeline
+from core.log_writer import EventLogWriter
+from ecommerce.worker import STOP_SIGNAL, EventWorker
+
+QUEUE_TYPES = {"fifo": Queue, "lifo": LifoQueue}
+LOG_POLICIES = ("sync", "background", "none")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Рахує основні статистики латентності у мілісекундах.
+
+    :param samples: Список вимірів у секундах.
+    :type samples: List[float]
+    :return: Словник {mean, p50, p90, p99, p999, max} у мілісекундах.
+    :rtype: Dict[str, float]
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "mean": statistics.fmean(ordered) * 1000,
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "p999": pick(0.999),
+        "max": ordered[-1] * 1000,
+    }
+
+
+class CompletionTracker:
+    """
+    Слухач бенчмарку: фіксує момент завершення обробки кожного замовлення
+    та дозволяє дочекатися, поки всі очікувані події будуть оброблені.
+    """
+
+    def __init__(self, expected: int, listener_cost: float = 0.0):
+        self.expected = expected
+        self.listener_cost = listener_cost
+        self.completed: Dict[int, float] = {}
+        self._done = threading.Event()
+
+    def listener(self, event_name: str, data: Any):
+        if self.listener_cost:
+            time.sleep(self.listener_cost)
+        self.completed[data["order_id"]] = time.perf_counter()
+        if len(self.completed) >= self.expected:
+            self._done.set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+
+async def asgi_post(app, path: str, body: bytes) -> int:
+    """
+    Виконує один POST запит напряму через ASGI-інтерфейс застосунку (без мережі).
+
+    :return: HTTP статус відповіді.
+    :rtype: int
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            response_done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+def drive_asgi(order_ids: List[int], concurrency: int, sent_at: Dict[int, float],
+               response_latency: List[float]) -> int:
+    """Відправляє всі запити через ASGI з заданою кількістю одночасних клієнтів."""
+    ids = iter(order_ids)
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for order_id in ids:
+            body = json.dumps({"order_id": order_id, "status": "created"}).encode()
+            started = time.perf_counter()
+            sent_at[order_id] = started
+            status = await asgi_post(webhook_app.app, "/webhook/order", body)
+            response_latency.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return errors
+
+
+def drive_http(order_ids: List[int], concurrency: int, sent_at: Dict[int, float],
+               response_latency: List[float], host: str, port: int) -> int:
+    """Відправляє всі запити через локальний HTTP (keep-alive з'єднання на кожен клієнтський потік)."""
+    ids = iter(order_ids)
+    lock = threading.Lock()
+    errors = 0
+
+    def client():
+        nonlocal errors
+        connection = http.client.HTTPConnection(host, port)
+        headers = {"Content-Type": "application/json"}
+        while True:
+            with lock:
+                order_id = next(ids, None)
+            if order_id is None:
+                break
+            body = json.dumps({"order_id": order_id, "status": "created"})
+            started = time.perf_counter()
+            sent_at[order_id] = started
+            connection.request("POST", "/webhook/order", body, headers)
+            response = connection.getresponse()
+            response.read()
+            response_latency.append(time.perf_counter() - started)
+            if response.status != 200:
+                with lock:
+                    errors += 1
+        connection.close()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return errors
+
+
+@contextlib.contextmanager
+def http_server(host: str, port: int):
+    """Запускає uvicorn з `app.app` у фоновому потоці на час бенчмарку."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(webhook_app.app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def run_config(args, queue_type: str, workers: int, log_policy: str, workdir: str) -> Dict[str, Any]:
+    """
+    Виконує один прогін бенчмарку для заданої конфігурації шини.
+
+    :return: Опис конфігурації та виміряні показники.
+    :rtype: Dict[str, Any]
+    """
+    event_queue = QUEUE_TYPES[queue_type](maxsize=args.queue_maxsize)
+    log_path = os.path.join(workdir, f"events_{queue_type}_{workers}_{log_policy}.log")
+    log_writer = None
+    if log_policy == "background":
+        log_writer = EventLogWriter(log_path)
+        log_writer.start()
+    bus = EventBus(event_queue, log_file=log_path if log_policy == "sync" else None, log_writer=log_writer)
+
+    tracker = CompletionTracker(args.requests, args.listener_cost_ms / 1000)
+    bus.subscribe("order.created", tracker.listener)
+    webhook_app.set_event_bus(bus)
+    webhook_app.set_idempotency_cache(IdempotencyCache(max_size=args.requests * 2))
+
+    worker_threads = [EventWorker(event_queue) for _ in range(workers)]
+    for worker in worker_threads:
+        worker.start()
+
+    order_ids = list(range(1, args.requests + 1))
+    sent_at: Dict[int, float] = {}
+    response_latency: List[float] = []
+
+    started = time.perf_counter()
+    if args.mode == "asgi":
+        errors = drive_asgi(order_ids, args.concurrency, sent_at, response_latency)
+    else:
+        errors = drive_http(order_ids, args.concurrency, sent_at, response_latency, args.host, args.port)
+    ingest_elapsed = time.perf_counter() - started
+
+    completed = tracker.wait(args.timeout)
+    total_elapsed = time.perf_counter() - started
+
+    for _ in worker_threads:
+        event_queue.put(STOP_SIGNAL)
+    for worker in worker_threads:
+        worker.join()
+    if log_writer:
+        log_writer.stop()
+
+    end_to_end = [tracker.completed[order_id] - sent_at[order_id] for order_id in tracker.completed]
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "queue": queue_type,
+            "queue_maxsize": args.queue_maxsize,
+            "workers": workers,
+            "log_policy": log_policy,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "listener_cost_ms": args.listener_cost_ms,
+        },
+        "completed": len(tracker.completed),
+        "timed_out": not completed,
+        "http_errors": errors,
+        "ingest_throughput_rps": args.requests / ingest_elapsed if ingest_elapsed else None,
+        "end_to_end_throughput_eps": len(tracker.completed) / total_elapsed if total_elapsed else None,
+        "response_latency_ms": percentiles(response_latency),
+        "end_to_end_latency_ms": percentiles(end_to_end),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Наскрізний бенчмарк вебхук -> EventBus -> слухач")
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi",
+                        help="asgi: виклик застосунку в процесі; http: локальний uvicorn")
+    parser.add_argument("--requests", type=int, default=2000, help="Кількість вебхуків на прогін")
+    parser.add_argument("--concurrency", type=int, default=32, help="Кількість одночасних клієнтів")
+    parser.add_argument("--queues", default="fifo", help=f"Типи черги через кому: {','.join(QUEUE_TYPES)}")
+    parser.add_argument("--queue-maxsize", type=int, default=0, help="Розмір черги (0 — необмежена)")
+    parser.add_argument("--workers", default="1", help="Кількість EventWorker'ів через кому, наприклад 1,2,4")
+    parser.add_argument("--log-policies", default=",".join(LOG_POLICIES),
+                        help=f"Політики журналу через кому: {','.join(LOG_POLICIES)}")
+    parser.add_argument("--listener-cost-ms", type=float, default=0.0, help="Штучна робота слухача, мс")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Максимальне очікування обробки, с")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Файл для JSON результатів (за замовчуванням stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Не приховувати діагностичний вивід шини")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    queue_types = args.queues.split(",")
+    worker_counts = [int(value) for value in args.workers.split(",")]
+    log_policies = args.log_policies.split(",")
+
+    for queue_type in queue_types:
+        if queue_type not in QUEUE_TYPES:
+            raise SystemExit(f"Невідомий тип черги: {queue_type}")
+    for log_policy in log_policies:
+        if log_policy not in LOG_POLICIES:
+            raise SystemExit(f"Невідома політика журналу: {log_policy}")
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        else:
+            stack.callback(LogPipeline(level="DEBUG").start().stop)
+        if args.mode == "http":
+            stack.enter_context(http_server(args.host, args.port))
+
+        for queue_type, workers, log_policy in itertools.product(queue_types, worker_counts, log_policies):
+            runs.append(run_config(args, queue_type, workers, log_policy, workdir))
+            print(f"BENCH: {runs[-1]['config']}", file=sys.stderr)
+
+    report = {
+        "benchmark": "webhook_e2e",
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Детермінований генератор синтетичного навантаження: життєві цикли замовлень
+(created -> paid -> shipped) з відмовами та нерівномірним розподілом користувачів.
+
+Генератор працює потоково (пам'ять залежить лише від кількості замовлень "у процесі"),
+тому придатний для мільйонів подій. Однаковий `seed` дає однакову послідовність подій.
+
+    python -m benchmarks.workload --events 1000000 --seed 42 --output workload.log
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class WorkloadGenerator:
+    """
+    Генерує потік подій замовлень у симульованому часі.
+
+    Нові замовлення надходять з експоненційними інтервалами (`arrival_rate` на секунду),
+    кожне наступне кроком життєвого циклу планується із затримкою, тому події
+    різних замовлень перемежовуються, як у реальному трафіку. Користувачі
+    обираються за розподілом Zipf (`user_skew`): невелика частка користувачів
+    створює більшість замовлень.
+    """
+
+    def __init__(self, seed: int = 42, users: int = 100_000, user_skew: float = 1.1,
+                 arrival_rate: float = 500.0, payment_failure_rate: float = 0.05,
+                 shipment_failure_rate: float = 0.02, mean_amount: float = 60.0,
+                 start_time: float = 1_700_000_000.0):
+        """
+        :param seed: Зерно генератора випадкових чисел.
+        :type seed: int
+        :param users: Кількість різних користувачів.
+        :type users: int
+        :param user_skew: Показник розподілу Zipf (0 — рівномірний розподіл).
+        :type user_skew: float
+        :param arrival_rate: Середня кількість нових замовлень за секунду симульованого часу.
+        :type arrival_rate: float
+        :param payment_failure_rate: Частка замовлень, оплата яких не проходить ('order.payment_failed').
+        :type payment_failure_rate: float
+        :param shipment_failure_rate: Частка оплачених замовлень, що скасовуються до відправки ('order.cancelled').
+        :type shipment_failure_rate: float
+        :param mean_amount: Середня сума замовлення.
+        :type mean_amount: float
+        :param start_time: Початок симульованого часу (Unix timestamp).
+        :type start_time: float
+        """
+        self.random = random.Random(seed)
+        self.users = users
+        self.arrival_rate = arrival_rate
+        self.payment_failure_rate = payment_failure_rate
+        self.shipment_failure_rate = shipment_failure_rate
+        self.mean_amount = mean_amount
+        self.start_time = start_time
+
+        weights = [1.0 / (rank ** user_skew) for rank in range(1, users + 1)]
+        self._cumulative = list(itertools.accumulate(weights))
+
+    def _pick_user(self) -> int:
+        """Внутрішній метод. Обирає ID користувача за розподілом Zipf."""
+        point = self.random.random() * self._cumulative[-1]
+        return bisect.bisect_left(self._cumulative, point) + 1
+
+    def events(self, limit: int) -> Iterator[Tuple[float, str, Dict[str, Any]]]:
+        """
+        Повертає генератор подій у порядку симульованого часу.
+
+        :param limit: Кількість подій, яку потрібно згенерувати.
+        :type limit: int
+        :return: Генератор кортежів (timestamp, event_name, data).
+        :rtype: Iterator[Tuple[float, str, Dict[str, Any]]]
+        """
+        rnd = self.random
+        pending: List[Tuple[float, int, str, Dict[str, Any]]] = []
+        sequence = itertools.count()
+        next_arrival = self.start_time
+        next_order_id = 1
+        produced = 0
+
+        while produced < limit:
+            if not pending or next_arrival <= pending[0][0]:
+                data = {
+                    "order_id": next_order_id,
+                    "user_id": self._pick_user(),
+                    "amount": round(rnd.lognormvariate(0, 0.8) * self.mean_amount / 1.37, 2),
+                }
+                next_order_id += 1
+                timestamp = next_arrival
+                next_arrival += rnd.expovariate(self.arrival_rate)
+                event_name = "order.created"
+            else:
+                timestamp, _, event_name, data = heapq.heappop(pending)
+
+            yield timestamp, event_name, data
+            produced += 1
+
+            next_step = self._next_step(event_name)
+            if next_step:
+                delay = rnd.expovariate(1 / 30.0) if next_step != "order.shipped" else rnd.expovariate(1 / 600.0)
+                heapq.heappush(pending, (timestamp + delay, next(sequence), next_step, {"order_id": data["order_id"]}))
+
+    def _next_step(self, event_name: str) -> Optional[str]:
+        """Внутрішній метод. Визначає наступний крок життєвого циклу замовлення."""
+        if event_name == "order.created":
+            return "order.payment_failed" if self.random.random() < self.payment_failure_rate else "order.paid"
+        if event_name == "order.paid":
+            return "order.cancelled" if self.random.random() < self.shipment_failure_rate else "order.shipped"
+        return None
+
+    def write_log(self, path: str, limit: int) -> int:
+        """
+        Записує навантаження у файл у форматі `events.log` (придатному для `EventBus.replay_from_file`).
+
+        :param path: Шлях до файлу.
+        :type path: str
+        :param limit: Кількість подій.
+        :type limit: int
+        :return: Розмір файлу в байтах.
+        :rtype: int
+        """
+        size = 0
+        with open(path, "w", encoding="utf-8") as file:
+            batch = []
+            for timestamp, event_name, data in self.events(limit):
+                batch.append(json.dumps({
+                    "timestamp": time.strftime("%d-%m-%Y %H:%M:%S", time.gmtime(timestamp)),
+                    "event": event_name,
+                    "data": data,
+                }) + "\n")
+                if len(batch) >= 10_000:
+                    chunk = "".join(batch)
+                    file.write(chunk)
+                    size += len(chunk.encode("utf-8"))
+                    batch = []
+            chunk = "".join(batch)
+            file.write(chunk)
+            size += len(chunk.encode("utf-8"))
+        return size
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Генератор синтетичних життєвих циклів замовлень")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--user-skew", type=float, default=1.1)
+    parser.add_argument("--payment-failure-rate", type=float, default=0.05)
+    parser.add_argument("--shipment-failure-rate", type=float, default=0.02)
+    parser.add_argument("--output", default="workload.log")
+    args = parser.parse_args(argv)
+
+    generator = WorkloadGenerator(
+        seed=args.seed,
+        users=args.users,
+        user_skew=args.user_skew,
+        payment_failure_rate=args.payment_failure_rate,
+        shipment_failure_rate=args.shipment_failure_rate,
+    )
+    started = time.perf_counter()
+    size = generator.write_log(args.output, args.events)
+    elapsed = time.perf_counter() - started
+    print(f"WORKLOAD: {args.events} подій ({size / 1e6:.1f} MB) записано у '{args.output}' за {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.event_bus import EventBus
+from core.metrics import EVENTS_DISPATCHED, EVENTS_EMITTED, EVENTS_REPLAYED, LISTENER_FAILURES, LOG_WRITE_SECONDS
+from core.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 100
+"""Кількість оброблених подій, після якої курсор фіксує зміщення."""
+
+COMMIT_INTERVAL = 1.0
+"""Мінімальний інтервал (секунди) між фіксаціями зміщення курсора, що наздогнав кінець журналу."""
+
+
+def _safe_name(subscriber_id: str) -> str:
+    """Перетворює ідентифікатор підписника на безпечне ім'я файлу."""
+    return re.sub(r"[^\w.@-]", "_", subscriber_id)
+
+
+class SubscriberCursor(threading.Thread):
+    """
+    Споживач довговічної шини для одного підписника.
+
+    Читає журнал подій з власного зміщення (у байтах), викликає колбек для подій,
+    що відповідають його підпискам, і фіксує зміщення у файл
+    `{offsets_dir}/{subscriber_id}.offset`. Початкове зміщення нового підписника
+    фіксується одразу при створенні курсора, далі — після обробки (кожні
+    `COMMIT_EVERY` подій, коли курсор наздогнав кінець журналу, але не частіше ніж раз
+    на `COMMIT_INTERVAL`, та при зупинці), тож після аварійного завершення
+    необроблений хвіст і не зафіксовані події доставляються повторно (at-least-once).
+
+    Кожен підписник має окремий потік, тому повільний слухач не затримує інших.
+    Атрибути `started_at`, `busy_seconds` та `last_heartbeat` сумісні з `EventWorker`
+    (див. `MetricsRegistry.watch_workers`).
+    """
+
+    def __init__(self, bus: "DurableEventBus", subscriber_id: str, callback: Callable):
+        """
+        :param bus: Шина, журнал якої читає курсор.
+        :type bus: DurableEventBus
+        :param subscriber_id: Стабільний ідентифікатор підписника (ключ зміщення).
+        :type subscriber_id: str
+        :param callback: Колбек підписника.
+        :type callback: Callable
+        """
+        super().__init__(name=f"cursor-{subscriber_id}")
+        self.daemon = True
+        self.bus = bus
+        self.subscriber_id = subscriber_id
+        self.callback = callback
+        self.offset_path = os.path.join(bus.offsets_dir, _safe_name(subscriber_id) + ".offset")
+        self.committed: Optional[int] = None
+        """Останнє зафіксоване зміщення (None — зміщення ще не зафіксоване)."""
+        self._committed_at = 0.0
+        stored = self._load_offset()
+        self.offset = stored if stored is not None else self._initial_offset()
+        """Зміщення (у байтах) першої необробленої події."""
+        if stored is None:
+            # Без файлу зміщення перезапуск знову почав би з `start_from` і пропустив би
+            # події, емітовані після підписки, тож початкову позицію фіксуємо одразу.
+            self.commit()
+        else:
+            self.committed = stored
+        self.started_at = 0.0
+        self.busy_seconds = 0.0
+        self.last_heartbeat = 0.0
+        self._stopped = False
+
+    def _load_offset(self) -> Optional[int]:
+        """Внутрішній метод. Читає зафіксоване зміщення (None, якщо файлу зміщення немає)."""
+        try:
+            with open(self.offset_path, "r", encoding="utf-8") as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning("DURABLE: Пошкоджений файл зміщення '%s', читаємо з початку журналу", self.offset_path)
+            return 0
+
+    def _initial_offset(self) -> int:
+        """
+        Внутрішній метод. Зміщення нового підписника: кінець журналу або його початок
+        (`DurableEventBus.start_from`).
+        """
+        return 0 if self.bus.start_from == "beginning" else self.bus.end_offset
+
+    def commit(self):
+        """Фіксує поточне зміщення через тимчасовий файл та атомарне перейменування."""
+        offset = self.offset
+        self._committed_at = time.monotonic()
+        if offset == self.committed:
+            return
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(str(offset))
+            if self.bus.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_path, self.offset_path)
+        self.committed = offset
+        logger.debug("DURABLE: Курсор '%s' зафіксував зміщення %d", self.subscriber_id, offset)
+
+    def lag(self) -> int:
+        """Кількість байтів журналу, які ще не оброблені цим підписником."""
+        return max(self.bus.end_offset - self.offset, 0)
+
+    def run(self):
+        """Основний цикл: читає журнал від зміщення та чекає на нові записи, коли наздогнав кінець."""
+        self.started_at = self.last_heartbeat = time.monotonic()
+        processed = 0
+        with open(self.bus.log_file, "rb") as file:
+            file.seek(self.offset)
+            while True:
+                line = file.readline()
+                if not line.endswith(b"\n"):
+                    # Кінець журналу або недописаний рядок: повертаємося до початку рядка й чекаємо.
+                    # При низькій частоті подій кінець досягається після кожної з них, тож
+                    # зміщення фіксується не частіше ніж раз на `COMMIT_INTERVAL`.
+                    file.seek(self.offset)
+                    if time.monotonic() - self._committed_at >= COMMIT_INTERVAL:
+                        self.commit()
+                        processed = 0
+                    if not self.bus.wait_for_append(self.offset):
+                        break
+                    self.last_heartbeat = time.monotonic()
+                    continue
+
+                self._dispatch(line)
+                self.offset += len(line)
+                processed += 1
+                if self._stopped:
+                    break
+                if processed >= COMMIT_EVERY:
+                    self.commit()
+                    processed = 0
+        self.commit()
+        logger.info("DURABLE: Курсор '%s' зупинено на зміщенні %d", self.subscriber_id, self.offset)
+
+    def _dispatch(self, line: bytes):
+        """Внутрішній метод. Викликає колбек, якщо подія відповідає підпискам курсора."""
+        started = self.last_heartbeat = time.monotonic()
+        try:
+            entry = json.loads(line)
+            event_name, data = entry["event"], entry["data"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("DURABLE: Курсор '%s' пропустив пошкоджений рядок журналу: %r", self.subscriber_id, line)
+            return
+
+        if self.callback not in self.bus._get_matching_callbacks(event_name, data):
+            return
+
+        try:
+            self.callback(event_name, data)
+        except Exception as ex:
+            LISTENER_FAILURES.inc(event_name)
+            logger.error("DURABLE ERROR: Слухач '%s' для '%s' впав. %s", self.subscriber_id, event_name, ex,
+                         exc_info=True)
+        EVENTS_DISPATCHED.inc(event_name)
+        self.busy_seconds += time.monotonic() - started
+
+    def stop(self):
+        """Просить курсор завершитися після поточної події (очікування — через `DurableEventBus.stop`)."""
+        self._stopped = True
+
+
+class DurableEventBus(EventBus):
+    """
+    Довговічний режим шини подій (at-least-once).
+
+    Замість черги в пам'яті чергою слугує сам журнал подій (append-only JSON-рядки у
+    форматі `events.log`): `emit` лише дописує рядок у журнал. Кожен підписник читає
+    журнал власним курсором (`SubscriberCursor`) і фіксує своє зміщення окремо, тож
+    після аварійного завершення кожен слухач продовжує з останньої підтвердженої
+    позиції, а відновлення коштує лише обробки необробленого хвоста журналу.
+
+    Підписки, вайлдкарди та фільтри працюють так само, як у `EventBus`, але
+    перевіряються курсором під час читання. Історія подій у пам'яті не ведеться —
+    історією є журнал. Слухачі мають бути ідемпотентними: подія, оброблена після
+    останньої фіксації зміщення, після перезапуску буде доставлена повторно.
+    """
+
+    def __init__(self, log_file: str = "events.log", offsets_dir: str = "bus_offsets", fsync: bool = False,
+                 start_from: str = "end"):
+        """
+        :param log_file: Журнал подій, що слугує чергою.
+        :type log_file: str
+        :param offsets_dir: Каталог файлів зміщень підписників.
+        :type offsets_dir: str
+        :param fsync: Якщо True, кожен запис журналу та зміщення синхронізується на диск
+                      (стійкість до втрати живлення ціною латентності `emit`). Інакше дані
+                      переживають падіння процесу, але не операційної системи.
+        :type fsync: bool
+        :param start_from: З якої позиції читає новий підписник без збереженого зміщення:
+                           'end' (лише нові події) або 'beginning' (увесь журнал).
+        :type start_from: str
+        :raises ValueError: Якщо `start_from` некоректне.
+        """
+        if start_from not in ("end", "beginning"):
+            raise ValueError(f"Некоректне значення start_from: '{start_from}'")
+        super().__init__(queue=None, log_file=log_file)
+        self.offsets_dir = offsets_dir
+        self.fsync = fsync
+        self.start_from = start_from
+        self.cursors: Dict[str, SubscriberCursor] = {}
+        """Курсори підписників: {subscriber_id: SubscriberCursor}."""
+        self._subscriber_ids: Dict[Callable, str] = {}
+        self._appended = threading.Condition()
+        self._started = False
+        self._stopped = False
+
+        os.makedirs(offsets_dir, exist_ok=True)
+        self._file = open(log_file, "ab")
+        self.end_offset = self._file.tell()
+        """Зміщення кінця журналу (у байтах)."""
+
+    def subscribe(self, event_name: str, callback: Callable, where: Optional[Dict[str, Any]] = None,
+                  subscriber_id: Optional[str] = None):
+        """
+        Підписує колбек на подію (див. `EventBus.subscribe`). Перша підписка колбека
+        створює його курсор; наступні підписки того ж колбека використовують той самий курсор.
+
+        :param event_name: Назва події або шаблон ('order.*').
+        :type event_name: str
+        :param callback: Колбек підписника.
+        :type callback: Callable
+        :param where: Фільтр за полями даних події.
+        :type where: Optional[Dict[str, Any]]
+        :param subscriber_id: Стабільний ідентифікатор підписника, під яким зберігається
+                              зміщення. За замовчуванням — `callback.__name__`.
+        :type subscriber_id: Optional[str]
+        :raises ValueError: Якщо фільтр некоректний або ідентифікатор уже зайнятий іншим колбеком.
+        """
+        subscriber_id = self._subscriber_ids.get(callback) or subscriber_id or callback.__name__
+        cursor = self.cursors.get(subscriber_id)
+        if cursor is not None and cursor.callback is not callback:
+            raise ValueError(f"Ідентифікатор підписника '{subscriber_id}' вже використовується іншим колбеком")
+
+        super().subscribe(event_name, callback, where)
+        if cursor is None:
+            self._subscriber_ids[callback] = subscriber_id
+            cursor = self.cursors[subscriber_id] = SubscriberCursor(self, subscriber_id, callback)
+            logger.info("DURABLE: Курсор '%s' починає зі зміщення %d", subscriber_id, cursor.offset)
+            if self._started:
+                cursor.start()
+
+    def emit(self, event_name: str, data: Any = None, trace_id: Optional[str] = None):
+        """
+        Емітує подію: дописує її в журнал і будить курсори. Повертається після запису
+        (та `fsync`, якщо ввімкнено), тож подія не втрачається при падінні процесу.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Дані події (мають серіалізуватися в JSON).
+        :type data: Any
+        :param trace_id: Ідентифікатор трасування (див. `EventBus.emit`).
+        :type trace_id: Optional[str]
+        """
+        self.emit_batch([(event_name, data)], trace_id)
+
+    def emit_batch(self, events: List[Tuple[str, Any]], trace_id: Optional[str] = None) -> int:
+        """
+        Емітує пакет подій одним записом у журнал.
+
+        :param events: Список пар (event_name, data).
+        :type events: List[Tuple[str, Any]]
+        :param trace_id: Ідентифікатор трасування пакета.
+        :type trace_id: Optional[str]
+        :return: Кількість записаних подій.
+        :rtype: int
+        """
+        trace_id = TRACER.resolve_trace_id(trace_id)
+        timestamp = time.strftime("%d-%m-%Y %H:%M:%S")
+        payload = "".join(json.dumps({"timestamp": timestamp, "event": event_name, "data": data}) + "\n"
+                          for event_name, data in events).encode("utf-8")
+
+        started = time.monotonic()
+        with self._appended:
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.end_offset += len(payload)
+            self._appended.notify_all()
+        finished = time.monotonic()
+        LOG_WRITE_SECONDS.observe(finished - started)
+        if trace_id:
+            TRACER.record("bus.log_write", trace_id, started, finished, "bus", events=len(events))
+
+        for event_name, _ in events:
+            EVENTS_EMITTED.inc(event_name)
+        logger.debug("DURABLE: %d подій дописано в журнал '%s'", len(events), self.log_file)
+        return len(events)
+
+    def wait_for_append(self, offset: int, timeout: float = 1.0) -> bool:
+        """
+        Чекає, доки журнал не виросте за `offset` (або не мине `timeout`).
+
+        :param offset: Зміщення, до якого курсор уже дочитав.
+        :type offset: int
+        :param timeout: Максимальний час очікування в секундах.
+        :type timeout: float
+        :return: False, якщо шину зупинено і курсор має завершитися.
+        :rtype: bool
+        """
+        with self._appended:
+            if self.end_offset <= offset and not self._stopped:
+                self._appended.wait(timeout)
+            return not self._stopped
+
+    def lag(self) -> Dict[str, int]:
+        """
+        Відставання підписників від кінця журналу.
+
+        :return: {subscriber_id: кількість необроблених байтів}.
+        :rtype: Dict[str, int]
+        """
+        return {subscriber_id: cursor.lag() for subscriber_id, cursor in self.cursors.items()}
+
+    def start(self) -> List[SubscriberCursor]:
+        """
+        Запускає курсори підписників. Кожен спочатку дочитує необроблений хвіст журналу.
+
+        :return: Запущені курсори.
+        :rtype: List[SubscriberCursor]
+        """
+        self._started = True
+        for cursor in self.cursors.values():
+            cursor.start()
+        return list(self.cursors.values())
+
+    def stop(self):
+        """
+        Зупиняє курсори (кожен завершує поточну подію та фіксує зміщення) і закриває журнал.
+        Події, які курсори не встигли прочитати, будуть оброблені після наступного запуску.
+        """
+        with self._appended:
+            self._stopped = True
+            self._appended.notify_all()
+        for cursor in self.cursors.values():
+            cursor.stop()
+            if cursor.is_alive():
+                cursor.join()
+        self._file.close()
+
+    def replay_from_file(self, filename: str):
+        """
+        Повторно програє події з файлу у форматі `events.log`, викликаючи відповідні
+        колбеки підписників безпосередньо в потоці викликача.
+
+        Курсори та їхні зміщення не змінюються, а події не дописуються в журнал шини,
+        тож програвання не доставляється підписникам повторно після перезапуску.
+        Щоб повторно обробити власний журнал шини через курсор, видаліть файл
+        зміщення підписника (і використайте `start_from='beginning'`) до запуску шини.
+
+        :param filename: Шлях до лог-файлу (наприклад, 'events.log').
+        :type filename: str
+        """
+        logger.info("REPLAY: Починаємо програвання подій з файлу '%s'...", filename)
+        replay_count = 0
+
+        try:
+            with open(filename, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        log_entry = json.loads(line)
+                        event_name, data = log_entry["event"], log_entry["data"]
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("REPLAY ERROR: Некоректний рядок журналу: %s", line.strip())
+                        continue
+
+                    matching_callbacks = self._get_matching_callbacks(event_name, data)
+                    if not matching_callbacks:
+                        logger.debug("REPLAY: Проігноровано '%s' — немає активних слухачів.", event_name)
+                        continue
+
+                    for callback in matching_callbacks:
+                        try:
+                            callback(event_name, data)
+                        except Exception as ex:
+                            LISTENER_FAILURES.inc(event_name)
+                            logger.error("REPLAY ERROR: Слухач '%s' для '%s' впав. %s",
+                                         self._subscriber_ids.get(callback, callback.__name__), event_name, ex,
+                                         exc_info=True)
+                    replay_count += 1
+                    EVENTS_REPLAYED.inc()
+
+            logger.info("REPLAY: Завершено. Програно %d подій.", replay_count)
+
+        except FileNotFoundError:
+            logger.error("REPLAY ERROR: Файл '%s' не знайдено.", filename)
@@ -1,9 +1,18 @@
 import collections
+import logging
 import time
 import json
-from typing import Callable, Any, Dict, List, Tuple
+from typing import Callable, Any, Dict, List, Optional, Set, Tuple
 from queue import Queue
 
+from core.log_writer import EventLogWriter
+from core.metrics import EVENTS_EMITTED, EVENTS_REPLAYED, LOG_WRITE_SECONDS
+from core.scheduler import EventScheduler
+from core.subscription_filter import Atom, FilterIndex, Route, compile_filter
+from core.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
 
 class EventBus:
     """
@@ -12,43 +21,73 @@ class EventBus:
 
     Підтримує:
     1. Підписку/Відписку колбеків на події.
-    2. Шаблони підписки за допомогою вайлдкардів (наприклад, 'user.*').
+    2. Шаблони підписки за допомогою вайлдкардів (наприклад, 'user.*') та фільтри
+       за вмістом події, що перевіряються до постановки завдання в чергу.
     3. Асинхронну емісію подій через передачу завдань у чергу.
     4. Ведення історії подій у пам'яті та запис у файл ('events.log').
     5. Повторне програвання подій з лог-файлу.
+    6. Відкладену емісію подій (`emit_at`, `emit_after`) через `EventScheduler`.
     """
 
-    def __init__(self, queue: Queue):
+    def __init__(self, queue: Queue, log_file: Optional[str] = "events.log",
+                 log_writer: Optional[EventLogWriter] = None):
         """
         Ініціалізує шину подій.
 
         :param queue: Об'єкт черги (наприклад, `queue.Queue`),
                       який використовується для передачі завдань обробникам.
         :type queue: Queue
+        :param log_file: Файл журналу подій для синхронного запису. Якщо None
+                         (і не задано `log_writer`), події не записуються у файл.
+        :type log_file: Optional[str]
+        :param log_writer: Фоновий записувач журналу. Якщо задано, `emit` не виконує
+                           файловий I/O, а лише передає рядок цьому потоку.
+        :type log_writer: Optional[EventLogWriter]
         """
         self.queue = queue
         """Основна черга для передачі завдань обробникам"""
+        self.log_file = log_file
+        """Файл журналу подій для синхронного запису."""
+        self.log_writer = log_writer
+        """Фоновий записувач журналу (має пріоритет над `log_file`)."""
         self.subscribers: Dict[str, List[Callable]] = collections.defaultdict(list)
         """Словник для зберігання підписок: {event_name: [callback1, callback2, ...]}."""
+        self.subscription_filters: Dict[Tuple[str, Callable], List[Atom]] = {}
+        """Скомпільовані фільтри підписок: {(event_name, callback): [умова, ...]}."""
+        self._routes: Dict[str, Route] = {}
+        """Кеш маршрутів за назвою події. Скидається при зміні підписок."""
+        self.scheduler: Optional[EventScheduler] = None
+        """Планувальник відкладених подій. Підключається викликачем (`bus.scheduler = EventScheduler(bus)`)."""
         self.history: List[Dict[str, Any]] = []
         """Історія всіх емітованих подій (зберігається у пам'яті)."""
 
-    def subscribe(self, event_name: str, callback: Callable):
+    def subscribe(self, event_name: str, callback: Callable, where: Optional[Dict[str, Any]] = None):
         """
         Підписує колбек-функцію на конкретну назву події.
 
         Колбек повинен приймати два аргументи: `event_name` (str) та `data` (Any).
 
+        Якщо задано `where`, колбек отримує лише події, дані яких відповідають фільтру
+        (див. `core.subscription_filter.compile_filter`), наприклад
+        `where={"user_id": 101, "amount": {"gte": 100}}`. Фільтр перевіряється в `emit`,
+        тож для відфільтрованих подій завдання взагалі не потрапляє в чергу.
+
         :param event_name: Назва події (наприклад, 'user.created', 'order.paid' або 'user.*').
         :type event_name: str
         :param callback: Функція, яка буде викликана при емісії події.
         :type callback: Callable
+        :param where: Фільтр за полями даних події (рівність, `in`, `gt`/`gte`/`lt`/`lte`).
+        :type where: Optional[Dict[str, Any]]
+        :raises ValueError: Якщо фільтр некоректний.
         """
         if callback not in self.subscribers[event_name]:
+            if where:
+                self.subscription_filters[(event_name, callback)] = compile_filter(where)
             self.subscribers[event_name].append(callback)
-            print(f"Підписка: '{callback.__name__}' на подію '{event_name}'")
+            self._routes = {}
+            logger.info("Підписка: '%s' на подію '%s'", callback.__name__, event_name)
         else:
-            print(f"Підписка: '{callback.__name__}' вже існує для '{event_name}'")
+            logger.info("Підписка: '%s' вже існує для '%s'", callback.__name__, event_name)
 
     def unsubscribe(self, event_name: str, callback: Callable):
         """
@@ -63,68 +102,241 @@ class EventBus:
             self.subscribers[event_name].remove(callback)
             if not self.subscribers[event_name]:
                 del self.subscribers[event_name]
-            print(f"Відписка: '{callback.__name__}' від події '{event_name}' успішна")
+            self.subscription_filters.pop((event_name, callback), None)
+            self._routes = {}
+            logger.info("Відписка: '%s' від події '%s' успішна", callback.__name__, event_name)
         except (ValueError, KeyError):
-            print(f"Помилка відписки: '{callback.__name__}' не був підписаний на '{event_name}'")
+            logger.warning("Помилка відписки: '%s' не був підписаний на '%s'", callback.__name__, event_name)
 
-    def _get_matching_callbacks(self, event_name: str) -> List[Callable]:
+    def _build_route(self, event_name: str) -> Route:
+        """
+        Внутрішній метод. Збирає маршрут події з прямих підписок та вайлдкардів ('*') для
+        першої частини (наприклад, 'user.created' відповідає 'user.*').
+
+        Колбек без фільтра хоча б в одній з підписок викликається завжди; фільтри решти
+        підписок маршруту об'єднуються в спільний `FilterIndex`. Порядок виклику колбеків
+        відповідає порядку підписки.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :return: Маршрут події.
+        :rtype: Route
+        """
+        patterns = [event_name]
+        parts = event_name.split('.')
+        if len(parts) > 1:
+            patterns.append(f"{parts[0]}.*")
+
+        callbacks: Dict[Callable, None] = {}
+        unfiltered: Set[Callable] = set()
+        filter_index = FilterIndex()
+        for pattern in patterns:
+            for cb in self.subscribers.get(pattern, ()):
+                callbacks[cb] = None
+                atoms = self.subscription_filters.get((pattern, cb))
+                if atoms is None:
+                    unfiltered.add(cb)
+                else:
+                    filter_index.add(cb, atoms)
+
+        if len(unfiltered) == len(callbacks):
+            return list(callbacks), [], None
+        positions = {cb: position for position, cb in enumerate(callbacks)}
+        return list(callbacks), [cb for cb in callbacks if cb in unfiltered], (filter_index, positions)
+
+    def _get_matching_callbacks(self, event_name: str, data: Any = None) -> List[Callable]:
         """
         Внутрішній метод для пошуку всіх колбеків, що відповідають події.
 
-        Підтримує пряму відповідність та вайлдкарди ('*') для першої частини
-        (наприклад, 'user.created' відповідає 'user.*').
+        Маршрут події кешується; повернутий список може бути спільним для кількох
+        завдань, тому його не можна змінювати.
 
         :param event_name: Назва події, що емітується.
         :type event_name: str
+        :param data: Дані події для перевірки фільтрів підписок.
+        :type data: Any
         :return: Список унікальних колбек-функцій, які мають бути викликані.
         :rtype: List[Callable]
         """
-        matching_callbacks = []
-
-        if event_name in self.subscribers:
-            matching_callbacks.extend(self.subscribers[event_name])
-
-        parts = event_name.split('.')
-        if len(parts) > 1:
-            wildcard_event = f"{parts[0]}.*"
-            if wildcard_event in self.subscribers:
-                for cb in self.subscribers[wildcard_event]:
-                    if cb not in matching_callbacks:
-                        matching_callbacks.append(cb)
-        return matching_callbacks
-
-    def emit(self, event_name: str, data: Any = None):
+        routes = self._routes
+        route = routes.get(event_name)
+        if route is None:
+            route = routes[event_name] = self._build_route(event_name)
+
+        callbacks, unfiltered, filters = route
+        if filters is None:
+            return callbacks
+
+        filter_index, positions = filters
+        matched = filter_index.match(data).difference(unfiltered)
+        if not matched:
+            return unfiltered
+        return sorted(unfiltered + list(matched), key=positions.__getitem__)
+
+    def emit(self, event_name: str, data: Any = None, trace_id: Optional[str] = None):
         """
         Емітує подію. Записує її в історію та лог-файл, а потім додає завдання
         для обробки у внутрішню чергу.
 
-        Кожне завдання у черзі має вигляд: (event_name, data, matching_callbacks).
+        Кожне завдання у черзі має вигляд: (event_name, data, matching_callbacks, enqueued_at, trace_id),
+        де `enqueued_at` — значення `time.monotonic()` у момент постановки в чергу,
+        а `trace_id` — ідентифікатор трасування (None, якщо трасування вимкнене).
 
         :param event_name: Назва події, що емітується.
         :type event_name: str
         :param data: Корисне навантаження події (будь-який об'єкт, який можна серіалізувати).
         :type data: Any
+        :param trace_id: Ідентифікатор трасування. Якщо не задано, береться ідентифікатор
+                         поточного запиту або генерується новий (див. `core.tracing`).
+        :type trace_id: Optional[str]
         """
-        print(f"\nЕмісія події: '{event_name}' з даними: {data}")
+        logger.debug("Емісія події: '%s' з даними: %s", event_name, data)
+        EVENTS_EMITTED.inc(event_name)
+        trace_id = TRACER.resolve_trace_id(trace_id)
 
+        started = time.monotonic()
         self._log_event(event_name, data)
+        if trace_id:
+            TRACER.record("bus.log_write", trace_id, started, time.monotonic(), "bus", event=event_name)
 
-        matching_callbacks = self._get_matching_callbacks(event_name)
+        matching_callbacks = self._get_matching_callbacks(event_name, data)
 
         if not matching_callbacks:
-            print(f"PRODUCER: Немає слухачів для події '{event_name}'. Завдання не додано.")
+            logger.debug("PRODUCER: Немає слухачів для події '%s'. Завдання не додано.", event_name)
             return
 
-        task = (event_name, data, matching_callbacks)
+        enqueued_at = time.monotonic()
+        task = (event_name, data, matching_callbacks, enqueued_at, trace_id)
         self.queue.put(task)
-        print(f"PRODUCER: Завдання для {len(matching_callbacks)} слухачів додано до черги.")
+        if trace_id:
+            TRACER.record("bus.enqueue", trace_id, enqueued_at, time.monotonic(), "bus",
+                          event=event_name, listeners=len(matching_callbacks))
+        logger.debug("PRODUCER: Завдання для %d слухачів додано до черги.", len(matching_callbacks))
+
+    def emit_at(self, event_name: str, data: Any, due_at: float) -> str:
+        """
+        Планує емісію події на заданий момент (наприклад, "скасувати замовлення,
+        якщо його не оплатили до ..."). Подію емітує потік `EventScheduler`,
+        тож EventWorker не блокується очікуванням.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Дані події (мають серіалізуватися в JSON).
+        :type data: Any
+        :param due_at: Час емісії (unix-час, секунди).
+        :type due_at: float
+        :return: Ідентифікатор таймера для `cancel_scheduled`.
+        :rtype: str
+        :raises RuntimeError: Якщо планувальник не підключено.
+        """
+        if self.scheduler is None:
+            raise RuntimeError("EventScheduler не підключено до шини")
+        return self.scheduler.schedule(event_name, data, due_at)
+
+    def emit_after(self, event_name: str, data: Any, delay: float) -> str:
+        """
+        Планує емісію події через `delay` секунд (див. `emit_at`).
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Дані події (мають серіалізуватися в JSON).
+        :type data: Any
+        :param delay: Затримка в секундах.
+        :type delay: float
+        :return: Ідентифікатор таймера для `cancel_scheduled`.
+        :rtype: str
+        """
+        return self.emit_at(event_name, data, time.time() + delay)
+
+    def cancel_scheduled(self, timer_id: str) -> bool:
+        """
+        Скасовує заплановану подію.
+
+        :param timer_id: Ідентифікатор таймера, повернутий `emit_at`/`emit_after`.
+        :type timer_id: str
+        :return: True, якщо подію ще не було емітовано і її скасовано.
+        :rtype: bool
+        :raises RuntimeError: Якщо планувальник не підключено.
+        """
+        if self.scheduler is None:
+            raise RuntimeError("EventScheduler не підключено до шини")
+        return self.scheduler.cancel(timer_id)
+
+    def emit_batch(self, events: List[Tuple[str, Any]], trace_id: Optional[str] = None) -> int:
+        """
+        Емітує пакет подій. Усі події записуються в історію та лог-файл
+        одним записом, після чого для кожної з них додається завдання у чергу.
+
+        Якщо трасування ввімкнене, кожна подія отримує власний ідентифікатор
+        `{trace_id}.{index}`, тож події пакета можна розібрати окремо.
+
+        :param events: Список пар (event_name, data).
+        :type events: List[Tuple[str, Any]]
+        :param trace_id: Ідентифікатор трасування пакета (див. `emit`).
+        :type trace_id: Optional[str]
+        :return: Кількість подій, для яких знайшлися слухачі та були додані завдання.
+        :rtype: int
+        """
+        logger.debug("Емісія пакета з %d подій", len(events))
+        trace_id = TRACER.resolve_trace_id(trace_id)
+
+        started = time.monotonic()
+        self._log_events(events)
+        if trace_id:
+            TRACER.record("bus.log_write", trace_id, started, time.monotonic(), "bus", events=len(events))
+
+        queued = 0
+        for index, (event_name, data) in enumerate(events):
+            EVENTS_EMITTED.inc(event_name)
+            matching_callbacks = self._get_matching_callbacks(event_name, data)
+            if not matching_callbacks:
+                continue
+            enqueued_at = time.monotonic()
+            event_trace_id = f"{trace_id}.{index}" if trace_id else None
+            self.queue.put((event_name, data, matching_callbacks, enqueued_at, event_trace_id))
+            if event_trace_id:
+                TRACER.record("bus.enqueue", event_trace_id, enqueued_at, time.monotonic(), "bus",
+                              event=event_name, listeners=len(matching_callbacks))
+            queued += 1
+
+        logger.debug("PRODUCER: Завдання для %d подій пакета додано до черги.", queued)
+        return queued
+
+    def _log_events(self, events: List[Tuple[str, Any]]):
+        """
+        Внутрішній метод для логування пакета подій.
+
+        Аналог `_log_event`, але файл відкривається та записується один раз для всього пакета.
+
+        :param events: Список пар (event_name, data).
+        :type events: List[Tuple[str, Any]]
+        """
+        timestamp = time.strftime("%d-%m-%Y %H:%M:%S")
+        log_entries = [{"timestamp": timestamp, "event": event_name, "data": data} for event_name, data in events]
+        self.history.extend(log_entries)
+
+        if self.log_writer:
+            self.log_writer.write("".join(json.dumps(log_entry) + "\n" for log_entry in log_entries))
+            return
+        if not self.log_file:
+            return
+
+        try:
+            started = time.perf_counter()
+            with open(self.log_file, "a", encoding="utf-8") as file:
+                file.write("".join(json.dumps(log_entry) + "\n" for log_entry in log_entries))
+            LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+            logger.debug("Лог (файл): Пакет з %d подій записано у %s", len(log_entries), self.log_file)
+        except Exception as ex:
+            logger.error("Помилка запису логу подій у файл %s: %s", self.log_file, ex)
 
     def _log_event(self, event_name: str, data: Any):
         """
         Внутрішній метод для логування події.
 
         Зберігає запис в `self.history` (пам'ять) та записує його у файл `events.log`
-        у форматі JSON (Event Sourcing).
+        у форматі JSON (Event Sourcing). Якщо задано `log_writer`, запис у файл
+        виконує фоновий потік.
 
         :param event_name: Назва події.
         :type event_name: str
@@ -137,14 +349,22 @@ class EventBus:
             "data": data,
         }
         self.history.append(log_entry)
-        print(f"Лог (пам'ять): Подія '{event_name}' зафіксована в історії.")
+        logger.debug("Лог (пам'ять): Подія '%s' зафіксована в історії.", event_name)
+
+        if self.log_writer:
+            self.log_writer.write(json.dumps(log_entry) + "\n")
+            return
+        if not self.log_file:
+            return
 
         try:
-            with open("events.log", "a", encoding="utf-8") as file:
+            started = time.perf_counter()
+            with open(self.log_file, "a", encoding="utf-8") as file:
                 file.write(json.dumps(log_entry) + "\n")
-            print(f"Лог (файл): Подія '{event_name}' записана у events.log")
+            LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+            logger.debug("Лог (файл): Подія '%s' записана у %s", event_name, self.log_file)
         except Exception as ex:
-            print(f"⚠️ Помилка запису логу подій у файл: {ex}")
+            logger.error("Помилка запису логу подій у файл %s: %s", self.log_file, ex)
 
     def replay_from_file(self, filename: str):
         """
@@ -156,7 +376,7 @@ class EventBus:
         :param filename: Шлях до лог-файлу (наприклад, 'events.log').
         :type filename: str
         """
-        print(f"\nREPLAY: Починаємо програвання подій з файлу '{filename}'...")
+        logger.info("REPLAY: Починаємо програвання подій з файлу '%s'...", filename)
         replay_count = 0
 
         try:
@@ -167,30 +387,32 @@ class EventBus:
 
                         event_name = log_entry["event"]
                         data = log_entry["data"]
-                        print(f"REPLAY: Програємо подію '{event_name}'...")
+                        logger.debug("REPLAY: Програємо подію '%s'...", event_name)
 
-                        matching_callbacks = self._get_matching_callbacks(event_name)
+                        matching_callbacks = self._get_matching_callbacks(event_name, data)
 
                         if not matching_callbacks:
-                            print(f"REPLAY: Проігноровано '{event_name}' — немає активних слухачів.")
+                            logger.debug("REPLAY: Проігноровано '%s' — немає активних слухачів.", event_name)
                             continue
 
-                        task: Tuple[str, Any, List[Callable]] = (event_name, data, matching_callbacks)
+                        task: Tuple[str, Any, List[Callable], float, Optional[str]] = (
+                            event_name, data, matching_callbacks, time.monotonic(), None)
                         self.queue.put(task)
                         replay_count += 1
+                        EVENTS_REPLAYED.inc()
 
                     except json.JSONDecodeError:
-                        print(f"REPLAY ERROR: Некоректний JSON рядок: {line.strip()}")
+                        logger.warning("REPLAY ERROR: Некоректний JSON рядок: %s", line.strip())
 
-                print(f"REPLAY: Завершено. Додано {replay_count} подій у чергу для повторної обробки.")
+                logger.info("REPLAY: Завершено. Додано %d подій у чергу для повторної обробки.", replay_count)
 
         except FileNotFoundError:
-            print(f"REPLAY ERROR: Файл '{filename}' не знайдено.")
+            logger.error("REPLAY ERROR: Файл '%s' не знайдено.", filename)
 
         except Exception as ex:
-            print(f"REPLAY ERROR: Невідома помилка при читанні файлу: {ex}")
+            logger.exception("REPLAY ERROR: Невідома помилка при читанні файлу: %s", ex)
 
     def clear_subscriptions(self):
         """Очищає всі підписки з шини подій."""
         self._subscribers = {}
-        print("BUS: Усі підписки очищено.")
+        logger.info("BUS: Усі підписки очищено.")
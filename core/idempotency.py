@@ -0,0 +1,218 @@
+import collections
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from core.log_writer import EventLogWriter
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWriter(EventLogWriter):
+    """
+    Фоновий записувач персистентного індексу `IdempotencyCache`.
+
+    Як і `EventLogWriter`, приймає готові рядки в чергу й дописує їх у файл
+    пакетами, тож перевірка ключа у вебхуку не чекає на файловий I/O. Коли
+    кількість рядків удвічі перевищує `max_size` кешу, потік ущільнює індекс.
+    """
+
+    def __init__(self, cache: "IdempotencyCache", filename: str, lines: int = 0):
+        """
+        :param cache: Кеш, чиї актуальні ключі записуються під час ущільнення.
+        :type cache: IdempotencyCache
+        :param filename: Шлях до файлу індексу.
+        :type filename: str
+        :param lines: Кількість рядків, що вже є у файлі.
+        :type lines: int
+        """
+        super().__init__(filename)
+        self.name = "idempotency-index"
+        self.cache = cache
+        self.lines = lines
+
+    def _write_batch(self, batch: List[str]):
+        try:
+            self._file.write("".join(batch))
+            self._file.flush()
+        except Exception as ex:
+            logger.error("⚠️ Помилка запису індексу ідемпотентності: %s", ex)
+            return
+
+        self.lines += len(batch)
+        if self.lines > 2 * self.cache.max_size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Внутрішній метод. Переписує індекс лише з актуальними ключами
+        через тимчасовий файл та атомарне перейменування.
+
+        Рядки, поставлені в чергу після знімка ключів, буде дописано вже в новий файл.
+        """
+        entries = self.cache.snapshot()
+        tmp_path = self.filename + ".tmp"
+        now = time.time()
+        lines = 0
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for key, expires_at in entries:
+                if expires_at > now:
+                    file.write(f"{expires_at}\t{key}\n")
+                    lines += 1
+
+        self._file.close()
+        os.replace(tmp_path, self.filename)
+        self._file = self._open()
+        self.lines = lines
+
+
+class IdempotencyCache:
+    """
+    Обмежений кеш ключів ідемпотентності (LRU + TTL) з опціональним
+    персистентним індексом на диску.
+
+    Використовується для відсікання дублікатів вебхуків ще до `EventBus.emit`:
+    партнери повторюють запити, і кожен повтор інакше оброблявся б усіма слухачами.
+
+    Персистентний індекс — це append-only файл рядків `{expires_at}\\t{key}`.
+    Видалення ключа (`discard`) записується як надгробок — рядок з `expires_at = 0`.
+    Індекс завантажується при старті, а дописування та періодичне ущільнення
+    виконує фоновий `IndexWriter`, тож `add`/`discard` не блокуються на файловому I/O.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 24 * 3600, index_path: Optional[str] = None):
+        """
+        :param max_size: Максимальна кількість ключів у пам'яті. Найстаріші (LRU) витісняються.
+        :type max_size: int
+        :param ttl: Час життя ключа у секундах.
+        :type ttl: float
+        :param index_path: Шлях до файлу персистентного індексу. Якщо None — кеш лише в пам'яті.
+        :type index_path: Optional[str]
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.index_path = index_path
+        self._entries: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        """Ключі у порядку останнього використання: {key: expires_at}."""
+        self._lock = threading.Lock()
+        self._writer: Optional[IndexWriter] = None
+        self._index_lines = 0
+
+        if index_path:
+            self._load_index()
+            self._writer = IndexWriter(self, index_path, self._index_lines)
+            self._writer.start()
+
+    def _load_index(self):
+        """
+        Внутрішній метод. Відновлює кеш з персистентного індексу, пропускаючи
+        прострочені та пошкоджені записи.
+        """
+        if not os.path.exists(self.index_path):
+            return
+
+        now = time.time()
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._index_lines += 1
+                expires_at, _, key = line.rstrip("\n").partition("\t")
+                try:
+                    expires_at = float(expires_at)
+                except ValueError:
+                    continue
+                if not key:
+                    continue
+                if expires_at <= now:
+                    # Надгробок або прострочений ключ скасовує попередні записи цього ключа.
+                    self._entries.pop(key, None)
+                    continue
+                self._entries[key] = expires_at
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        logger.info("IDEMPOTENCY: Завантажено %d ключів з '%s'", len(self._entries), self.index_path)
+
+    def add(self, key: str) -> bool:
+        """
+        Атомарно перевіряє ключ та запам'ятовує його.
+
+        :param key: Ключ ідемпотентності.
+        :type key: str
+        :return: True, якщо ключ новий (запит потрібно обробити),
+                 False — якщо це дублікат.
+        :rtype: bool
+        """
+        now = time.time()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                self._entries.move_to_end(key)
+                return False
+
+            expires_at = now + self.ttl
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            if self._writer:
+                self._writer.write(f"{expires_at}\t{key}\n")
+            return True
+
+    def add_many(self, keys: List[str]) -> List[bool]:
+        """
+        Перевіряє та запам'ятовує пакет ключів (див. `add`). Повтор ключа в межах
+        пакета теж вважається дублікатом.
+
+        :param keys: Ключі ідемпотентності.
+        :type keys: List[str]
+        :return: Для кожного ключа True, якщо він новий, False — якщо це дублікат.
+        :rtype: List[bool]
+        """
+        return [self.add(key) for key in keys]
+
+    def discard(self, key: str):
+        """
+        Видаляє ключ з кешу (наприклад, якщо обробка запиту завершилась помилкою
+        і повтор від партнера має бути прийнятий).
+
+        У персистентний індекс дописується надгробок, тож після перезапуску ключ
+        також вважається необробленим.
+
+        :param key: Ключ ідемпотентності.
+        :type key: str
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None and self._writer:
+                self._writer.write(f"0\t{key}\n")
+
+    def __contains__(self, key: str) -> bool:
+        expires_at = self._entries.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def snapshot(self) -> List[Tuple[str, float]]:
+        """
+        Повертає знімок ключів кешу для ущільнення індексу.
+
+        :return: Список пар (key, expires_at).
+        :rtype: List[Tuple[str, float]]
+        """
+        with self._lock:
+            return list(self._entries.items())
+
+    def flush(self):
+        """Блокує викликача, доки всі зміни не будуть дописані в індекс."""
+        if self._writer:
+            self._writer.flush()
+
+    def close(self):
+        """Дописує залишок змін та закриває файл персистентного індексу."""
+        writer, self._writer = self._writer, None
+        if writer:
+            writer.stop()
@@ -0,0 +1,130 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Optional, TextIO, Union
+
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+"""Стандартні атрибути LogRecord; решта атрибутів запису — поля, передані через `extra`."""
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматує запис як один JSON-рядок: час, рівень, логер, потік, повідомлення
+    та поля з `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускає лише частку записів рівня `max_level` і нижче (за замовчуванням INFO).
+    Попередження та помилки проходять завжди.
+    """
+
+    def __init__(self, rate: float, max_level: int = logging.INFO):
+        """
+        :param rate: Частка записів, що проходять (від 0 до 1).
+        :type rate: float
+        :param max_level: Найвищий рівень, до якого застосовується вибірка.
+        :type max_level: int
+        """
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.max_level or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, що залишає фінальне форматування фоновому потоку.
+
+    Як і стандартний `QueueHandler.prepare`, підставляє аргументи в повідомлення
+    (та форматує traceback) ще в потоці викликача: аргументи можуть бути змінними
+    об'єктами, які інакше були б виведені вже у зміненому вигляді. Форматування
+    вихідного рядка (JSON, час тощо) виконує фоновий потік `QueueListener`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    """
+    Асинхронний конвеєр логування процесу.
+
+    Кореневий логер отримує `DeferredQueueHandler`: виклик `logger.debug(...)` у гарячому
+    шляху лише перевіряє рівень і (якщо запис проходить рівень та вибірку) кладе
+    `LogRecord` у чергу. Форматування та запис у потік виводу виконує фоновий
+    потік `QueueListener`. Модулі користуються звичайними `logging.getLogger(__name__)`
+    та лінивим форматуванням (`logger.debug("... %s", value)`).
+    """
+
+    def __init__(self, level: Union[int, str] = logging.INFO, json_format: bool = False,
+                 sample_rate: float = 1.0, stream: Optional[TextIO] = None):
+        """
+        :param level: Рівень кореневого логера (наприклад, 'DEBUG' для повної діагностики шини).
+        :type level: Union[int, str]
+        :param json_format: Якщо True, записи виводяться як JSON-рядки (`JsonFormatter`),
+                            інакше — лише текст повідомлення.
+        :type json_format: bool
+        :param sample_rate: Частка записів рівня INFO і нижче, що потрапляють у вивід.
+        :type sample_rate: float
+        :param stream: Потік виводу (за замовчуванням `sys.stderr`).
+        :type stream: Optional[TextIO]
+        """
+        self.level = level
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(message)s"))
+
+        self.handler = DeferredQueueHandler(self._queue)
+        if sample_rate < 1:
+            self.handler.addFilter(SamplingFilter(sample_rate))
+        self.listener = logging.handlers.QueueListener(self._queue, output)
+
+    def start(self) -> "LogPipeline":
+        """Підключає конвеєр до кореневого логера та запускає фоновий потік виводу."""
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, DeferredQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """Від'єднує конвеєр від кореневого логера та виводить залишок черги."""
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from queue import Queue, Empty
+from typing import List
+
+from core.metrics import LOG_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class EventLogWriter(threading.Thread):
+    """
+    Фоновий потік, що записує рядки журналу подій у файл пакетами.
+
+    `EventBus` передає сюди вже серіалізовані рядки, тому емісія події не чекає
+    на файловий I/O: запис лише додає рядок у чергу, а потік зливає всі
+    накопичені рядки одним `write` та тримає файл відкритим.
+    """
+
+    def __init__(self, filename: str = "events.log", batch_size: int = 1000):
+        """
+        :param filename: Шлях до файлу журналу подій.
+        :type filename: str
+        :param batch_size: Максимальна кількість рядків в одному записі у файл.
+        :type batch_size: int
+        """
+        super().__init__()
+        self.daemon = True
+        self.filename = filename
+        self.batch_size = batch_size
+        self._lines: Queue = Queue()
+        self._file = self._open()
+
+    def _open(self):
+        """Внутрішній метод. Відкриває файл журналу на дозапис."""
+        return open(self.filename, "a", encoding="utf-8")
+
+    def write(self, line: str):
+        """
+        Додає рядок (разом із символом нового рядка) у чергу на запис. Не блокує викликача.
+
+        :param line: Рядок журналу.
+        :type line: str
+        """
+        self._lines.put(line)
+
+    def run(self):
+        """Основний цикл: чекає на перший рядок, добирає решту з черги та записує пакетом."""
+        while True:
+            try:
+                line = self._lines.get(timeout=1)
+            except Empty:
+                continue
+
+            batch: List[str] = []
+            stop = line is _STOP
+            if not stop:
+                batch.append(line)
+
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    line = self._lines.get_nowait()
+                except Empty:
+                    break
+                if line is _STOP:
+                    stop = True
+                else:
+                    batch.append(line)
+
+            if batch:
+                self._write_batch(batch)
+
+            for _ in range(len(batch) + stop):
+                self._lines.task_done()
+
+            if stop:
+                break
+
+        self._close()
+
+    def _write_batch(self, batch: List[str]):
+        """
+        Внутрішній метод. Записує пакет рядків одним `write`.
+
+        :param batch: Рядки журналу.
+        :type batch: List[str]
+        """
+        try:
+            started = time.perf_counter()
+            self._file.write("".join(batch))
+            self._file.flush()
+            LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+        except Exception as ex:
+            logger.error("⚠️ Помилка запису логу подій у файл: %s", ex)
+
+    def _close(self):
+        """Внутрішній метод. Закриває файл журналу."""
+        self._file.close()
+
+    def flush(self):
+        """Блокує викликача, доки всі рядки з черги не будуть записані у файл."""
+        self._lines.join()
+
+    def stop(self):
+        """Записує залишок черги, закриває файл та зупиняє потік."""
+        self._lines.put(_STOP)
+        self.join()
@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Sample = Tuple[str, Dict[str, str], float]
+"""Одне значення метрики: (суфікс імені, мітки, значення)."""
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+"""Межі кошиків гістограм за замовчуванням (у секундах)."""
+
+
+def _escape(value: str) -> str:
+    """Екранує значення мітки відповідно до текстового формату Prometheus."""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """
+    Лічильник, що лише зростає. Може мати одну мітку (наприклад, назву події).
+
+    Інкремент — це одне оновлення словника під локом, тому запис достатньо
+    дешевий, щоб залишати метрики увімкненими в продакшені.
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values: Dict[Optional[str], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: Optional[str] = None, amount: float = 1):
+        """
+        Збільшує лічильник.
+
+        :param label_value: Значення мітки (None, якщо лічильник без мітки).
+        :type label_value: Optional[str]
+        :param amount: Величина збільшення.
+        :type amount: float
+        """
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: Optional[str] = None) -> float:
+        return self._values.get(label_value, 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and self.label is None:
+            items = [(None, 0)]
+        return [("", {self.label: key} if self.label else {}, value) for key, value in items]
+
+
+class Histogram:
+    """Гістограма з фіксованими кошиками (наприклад, для латентності запису журналу)."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Фіксує одне спостереження.
+
+        :param value: Значення (як правило, тривалість у секундах).
+        :type value: float
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        result: List[Sample] = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            result.append(("_bucket", {"le": repr(bound)}, cumulative))
+        cumulative += counts[-1]
+        result.append(("_bucket", {"le": "+Inf"}, cumulative))
+        result.append(("_sum", {}, total))
+        result.append(("_count", {}, cumulative))
+        return result
+
+
+class GaugeFunction:
+    """
+    Gauge, значення якого обчислюється лише під час збору метрик.
+    Не додає жодних витрат на гарячому шляху (наприклад, глибина черги).
+    """
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        """
+        :param collect: Функція, що повертає пари (мітки, значення).
+        :type collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]
+        """
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+
+    def samples(self) -> List[Sample]:
+        return [("", labels, value) for labels, value in self.collect()]
+
+
+class MetricsRegistry:
+    """
+    Реєстр метрик процесу та відображення їх у текстовому форматі Prometheus.
+
+    Окрім статичних лічильників і гістограм, реєстр стежить за чергами EventBus
+    та EventWorker'ами, і обчислює їхні показники (глибина черги, вік найстарішого
+    завдання, зайнятість та живучість воркерів) лише під час збору.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._queues: List[Any] = []
+        self._workers: List[Any] = []
+        self._lock = threading.Lock()
+
+        self.register(GaugeFunction("eventbus_queue_depth", "Кількість завдань у черзі EventBus.",
+                                    self._collect_queue_depth))
+        self.register(GaugeFunction("eventbus_queue_oldest_age_seconds",
+                                    "Вік найстарішого завдання в черзі EventBus.", self._collect_oldest_age))
+        self.register(GaugeFunction("eventbus_worker_alive", "1, якщо потік EventWorker живий.",
+                                    self._collect_worker_alive))
+        self.register(GaugeFunction("eventbus_worker_busy_ratio",
+                                    "Частка часу роботи EventWorker, витрачена на виклик слухачів.",
+                                    self._collect_worker_busy))
+        self.register(GaugeFunction("eventbus_worker_heartbeat_age_seconds",
+                                    "Час з останньої ітерації циклу EventWorker.",
+                                    self._collect_worker_heartbeat))
+
+    def register(self, metric):
+        """Реєструє метрику. Повертає її ж для зручного присвоєння."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label: Optional[str] = None) -> Counter:
+        return self.register(Counter(name, documentation, label))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def watch_queue(self, queue: Any):
+        """
+        Додає чергу EventBus (`Queue` або `ShardedQueue`) до збору показників.
+
+        :param queue: Черга завдань.
+        :type queue: Any
+        """
+        self._queues.append(queue)
+
+    def watch_workers(self, workers: Iterable[Any]):
+        """
+        Додає EventWorker'и до збору показників.
+
+        :param workers: Потоки EventWorker.
+        :type workers: Iterable[Any]
+        """
+        self._workers.extend(workers)
+
+    def _iter_queues(self):
+        for queue in self._queues:
+            yield from getattr(queue, "shards", [queue])
+
+    def _collect_queue_depth(self):
+        for index, queue in enumerate(self._iter_queues()):
+            yield {"queue": str(index)}, queue.qsize()
+
+    def _collect_oldest_age(self):
+        now = time.monotonic()
+        for index, queue in enumerate(self._iter_queues()):
+            # Голова черги (як для FIFO, так і для LIFO) — найстаріше завдання.
+            with queue.mutex:
+                head = queue.queue[0] if queue.queue else None
+            age = now - head[3] if isinstance(head, tuple) and len(head) > 3 else 0.0
+            yield {"queue": str(index)}, age
+
+    def _collect_worker_alive(self):
+        for worker in self._workers:
+            yield {"worker": worker.name}, 1.0 if worker.is_alive() else 0.0
+
+    def _collect_worker_busy(self):
+        now = time.monotonic()
+        for worker in self._workers:
+            lifetime = now - worker.started_at if worker.started_at else 0
+            yield {"worker": worker.name}, worker.busy_seconds / lifetime if lifetime > 0 else 0.0
+
+    def _collect_worker_heartbeat(self):
+        now = time.monotonic()
+        for worker in self._workers:
+            yield {"worker": worker.name}, now - worker.last_heartbeat if worker.last_heartbeat else 0.0
+
+    def render(self) -> str:
+        """
+        Формує текстове представлення всіх метрик у форматі Prometheus (версія 0.0.4).
+
+        :return: Текст для ендпоінта `/metrics`.
+        :rtype: str
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+"""Реєстр метрик процесу за замовчуванням."""
+
+EVENTS_EMITTED = REGISTRY.counter("eventbus_events_emitted_total", "Кількість емітованих подій.", "event")
+EVENTS_REPLAYED = REGISTRY.counter("eventbus_events_replayed_total", "Кількість подій, доданих у чергу під час replay.")
+EVENTS_DISPATCHED = REGISTRY.counter("eventbus_events_dispatched_total",
+                                     "Кількість подій, оброблених EventWorker'ом.", "event")
+LISTENER_FAILURES = REGISTRY.counter("eventbus_listener_failures_total", "Кількість падінь слухачів.", "event")
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("eventbus_queue_wait_seconds", "Час очікування завдання в черзі.")
+LOG_WRITE_SECONDS = REGISTRY.histogram("eventbus_log_write_seconds", "Латентність запису журналу подій у файл.")
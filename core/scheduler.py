@@ -0,0 +1,217 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPACT_MIN_LINES = 10_000
+"""Мінімальна кількість рядків журналу, після якої розглядається ущільнення."""
+
+
+class EventScheduler(threading.Thread):
+    """
+    Планувальник відкладених подій (`EventBus.emit_at` / `emit_after`).
+
+    Таймери зберігаються в бінарній купі за часом спрацювання, тож додавання та
+    спрацювання коштують O(log n) навіть для мільйонів таймерів. Один потік спить
+    на `Condition` рівно до найближчого таймера (без опитування та без потоку на таймер),
+    і в момент спрацювання емітує подію в шину.
+
+    Таймери переживають перезапуск: кожне додавання, спрацювання та скасування
+    дописується в журнал (JSON-рядки), який відтворюється при старті. Подія
+    позначається виконаною після емісії, тож після аварійного завершення
+    вона може бути емітована повторно (at-least-once). Час спрацювання —
+    unix-час (`time.time()`); таймери, що прострочились під час простою,
+    спрацьовують одразу після старту в порядку часу.
+    """
+
+    def __init__(self, bus: Any, journal_path: Optional[str] = "timers.journal"):
+        """
+        :param bus: Шина, у яку емітуються події (`EventBus`).
+        :type bus: Any
+        :param journal_path: Шлях до журналу таймерів. Якщо None — таймери лише в пам'яті.
+        :type journal_path: Optional[str]
+        """
+        super().__init__()
+        self.daemon = True
+        self.bus = bus
+        self.journal_path = journal_path
+        self._heap: List[Tuple[float, int, str]] = []
+        """Купа (due_at, seq, timer_id). Скасовані таймери видаляються ліниво."""
+        self._pending: Dict[str, Tuple[float, str, Any]] = {}
+        """Активні таймери: {timer_id: (due_at, event_name, data)}."""
+        self._in_flight: Dict[str, Tuple[float, str, Any]] = {}
+        """
+        Таймери, що спрацювали, але ще не позначені в журналі як виконані. Ущільнення
+        зберігає їх у журналі, тож аварія до запису "done" не втрачає подію.
+        """
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._journal = None
+        self._journal_lines = 0
+
+        if journal_path:
+            self._load_journal()
+            self._journal = open(journal_path, "a", encoding="utf-8")
+
+    def _load_journal(self):
+        """Внутрішній метод. Відновлює активні таймери з журналу, пропускаючи пошкоджені рядки."""
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._journal_lines += 1
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        self._pending[record["id"]] = (float(record["due"]), record["event"], record.get("data"))
+                    else:
+                        self._pending.pop(record["id"], None)
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("SCHEDULER: Пропущено пошкоджений рядок журналу: %r", line)
+
+        for timer_id, (due_at, _, _) in self._pending.items():
+            self._heap.append((due_at, self._next_seq(), timer_id))
+        heapq.heapify(self._heap)
+        logger.info("SCHEDULER: Відновлено %d таймерів з '%s'", len(self._pending), self.journal_path)
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def schedule(self, event_name: str, data: Any, due_at: float) -> str:
+        """
+        Додає таймер, який емітує подію в момент `due_at`.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Дані події (мають серіалізуватися в JSON для журналу).
+        :type data: Any
+        :param due_at: Час спрацювання (unix-час, секунди).
+        :type due_at: float
+        :return: Ідентифікатор таймера (для `cancel`).
+        :rtype: str
+        """
+        timer_id = os.urandom(8).hex()
+        line = json.dumps({"op": "add", "id": timer_id, "due": due_at, "event": event_name, "data": data})
+        with self._condition:
+            self._pending[timer_id] = (due_at, event_name, data)
+            heapq.heappush(self._heap, (due_at, self._next_seq(), timer_id))
+            self._append_to_journal(line + "\n", 1)
+            if self._heap[0][2] == timer_id:
+                self._condition.notify()
+        logger.debug("SCHEDULER: Подію '%s' заплановано на %s (таймер %s)", event_name, due_at, timer_id)
+        return timer_id
+
+    def cancel(self, timer_id: str) -> bool:
+        """
+        Скасовує таймер.
+
+        :param timer_id: Ідентифікатор таймера, повернутий `schedule`.
+        :type timer_id: str
+        :return: True, якщо таймер був активним.
+        :rtype: bool
+        """
+        with self._condition:
+            if self._pending.pop(timer_id, None) is None:
+                return False
+            self._append_to_journal(json.dumps({"op": "cancel", "id": timer_id}) + "\n", 1)
+        logger.debug("SCHEDULER: Таймер %s скасовано", timer_id)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def run(self):
+        """Основний цикл: чекає на найближчий таймер та емітує всі події, час яких настав."""
+        while True:
+            with self._condition:
+                due = self._pop_due()
+                while not due and not self._stopped:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                    due = self._pop_due()
+                if not due:
+                    break
+
+            for timer_id, event_name, data in due:
+                try:
+                    self.bus.emit(event_name, data)
+                except Exception:
+                    logger.exception("SCHEDULER ERROR: Не вдалося емітувати подію '%s' (таймер %s)",
+                                     event_name, timer_id)
+
+            with self._condition:
+                for timer_id, _, _ in due:
+                    del self._in_flight[timer_id]
+                self._append_to_journal(
+                    "".join(json.dumps({"op": "done", "id": timer_id}) + "\n" for timer_id, _, _ in due), len(due))
+
+    def _pop_due(self) -> List[Tuple[str, str, Any]]:
+        """
+        Внутрішній метод (під локом). Знімає з купи всі таймери, час яких настав,
+        пропускаючи скасовані, і переносить їх у `_in_flight` до запису "done".
+        """
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, timer_id = heapq.heappop(self._heap)
+            timer = self._pending.pop(timer_id, None)
+            if timer is not None:
+                self._in_flight[timer_id] = timer
+                due.append((timer_id, timer[1], timer[2]))
+        return due
+
+    def _append_to_journal(self, lines: str, count: int):
+        """
+        Внутрішній метод (під локом). Дописує рядки в журнал і ущільнює його, коли
+        кількість рядків удвічі перевищує кількість активних таймерів.
+        """
+        if not self._journal:
+            return
+        self._journal.write(lines)
+        self._journal.flush()
+        self._journal_lines += count
+
+        if self._journal_lines > max(2 * (len(self._pending) + len(self._in_flight)), COMPACT_MIN_LINES):
+            self._compact_journal()
+
+    def _compact_journal(self):
+        """
+        Внутрішній метод (під локом). Переписує журнал лише з активними таймерами
+        та таймерами, що саме емітуються (`_in_flight`), через тимчасовий файл та
+        атомарне перейменування. Купа також очищається від скасованих таймерів.
+        """
+        tmp_path = self.journal_path + ".tmp"
+        timers = list(self._in_flight.items()) + list(self._pending.items())
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for timer_id, (due_at, event_name, data) in timers:
+                file.write(json.dumps({"op": "add", "id": timer_id, "due": due_at, "event": event_name,
+                                       "data": data}) + "\n")
+
+        self._journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_lines = len(timers)
+
+        if len(self._heap) > 2 * len(self._pending):
+            self._heap = [entry for entry in self._heap if entry[2] in self._pending]
+            heapq.heapify(self._heap)
+
+    def stop(self):
+        """Зупиняє потік планувальника та закриває журнал. Активні таймери залишаються в журналі."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
+        with self._condition:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,74 @@
+import itertools
+from queue import Queue
+from typing import Any, Callable, List, Optional
+
+
+def order_key(task: Any) -> Optional[Any]:
+    """
+    Ключ шардування за замовчуванням: `order_id` з даних події.
+
+    :param task: Завдання EventBus (event_name, data, callbacks, enqueued_at, trace_id).
+    :type task: Any
+    :return: Ключ або None, якщо подія не належить конкретному замовленню.
+    :rtype: Optional[Any]
+    """
+    data = task[1]
+    if isinstance(data, dict):
+        return data.get("order_id")
+    return None
+
+
+class ShardedQueue:
+    """
+    Набір незалежних черг (шардів), між якими завдання розподіляються за ключем.
+
+    Для `EventBus` поводиться як звичайна черга (`put`, `qsize`), але кожен шард
+    обробляється окремим EventWorker'ом. Усі завдання з однаковим ключем (наприклад,
+    `order_id`) потрапляють в один шард, тому порядок подій одного замовлення
+    зберігається навіть при кількох паралельних воркерах.
+    """
+
+    def __init__(self, shards: int, key_func: Callable[[Any], Optional[Any]] = order_key):
+        """
+        :param shards: Кількість шардів (та відповідних воркерів).
+        :type shards: int
+        :param key_func: Функція, що повертає ключ шардування для завдання.
+                         Завдання без ключа розподіляються по колу.
+        :type key_func: Callable[[Any], Optional[Any]]
+        """
+        if shards < 1:
+            raise ValueError("Кількість шардів має бути не менше 1")
+        self.shards: List[Queue] = [Queue() for _ in range(shards)]
+        """Черги-шарди. Кожну обробляє власний EventWorker."""
+        self.key_func = key_func
+        self._round_robin = itertools.cycle(range(shards))
+
+    def shard_for(self, task: Any) -> Queue:
+        """
+        Повертає шард для завдання.
+
+        :param task: Завдання EventBus.
+        :type task: Any
+        :return: Черга-шард.
+        :rtype: Queue
+        """
+        key = self.key_func(task)
+        if key is None:
+            return self.shards[next(self._round_robin)]
+        return self.shards[hash(key) % len(self.shards)]
+
+    def put(self, task: Any, block: bool = True, timeout: Optional[float] = None):
+        """Додає завдання у шард, визначений ключем завдання."""
+        self.shard_for(task).put(task, block, timeout)
+
+    def qsize(self) -> int:
+        """Сумарна кількість завдань у всіх шардах."""
+        return sum(shard.qsize() for shard in self.shards)
+
+    def empty(self) -> bool:
+        return all(shard.empty() for shard in self.shards)
+
+    def join(self):
+        """Чекає, поки всі шарди будуть оброблені."""
+        for shard in self.shards:
+            shard.join()
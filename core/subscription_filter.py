@@ -0,0 +1,209 @@
+import bisect
+import collections
+from numbers import Real
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+Atom = Tuple[str, str, Hashable]
+"""
+Елементарна умова фільтра: (поле, оператор, операнд). Значення рівності (`eq` та
+члени `in`) зберігаються як ключі `_equality_key`.
+"""
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+OPERATORS = ("eq", "in") + RANGE_OPERATORS
+
+_BOOL_KEYS = {False: object(), True: object()}
+"""Окремі ключі рівності для булевих значень: інакше True == 1 і False == 0 в словнику."""
+
+
+def _equality_key(value: Hashable) -> Hashable:
+    """Повертає ключ рівності значення, що не плутає булеві значення з числами 0 та 1."""
+    return _BOOL_KEYS[value] if value is True or value is False else value
+
+
+def compile_filter(where: Dict[str, Any]) -> List[Atom]:
+    """
+    Перетворює декларативний фільтр підписки на список елементарних умов (кон'юнкція).
+
+    Формат фільтра — словник {поле: умова}, де умова — це або значення (рівність),
+    або словник операторів:
+
+    - `{"user_id": 101}` — рівність;
+    - `{"status": {"in": ["paid", "shipped"]}}` — належність до множини;
+    - `{"amount": {"gte": 100, "lt": 1000}}` — діапазон (лише числові межі).
+
+    :param where: Декларативний фільтр.
+    :type where: Dict[str, Any]
+    :return: Список умов.
+    :rtype: List[Atom]
+    :raises ValueError: Якщо фільтр порожній, оператор невідомий або операнд некоректний.
+    """
+    atoms: List[Atom] = []
+    for field, condition in where.items():
+        if not isinstance(condition, dict):
+            condition = {"eq": condition}
+        for operator, operand in condition.items():
+            if operator not in OPERATORS:
+                raise ValueError(f"Невідомий оператор фільтра '{operator}' для поля '{field}'")
+            if operator in RANGE_OPERATORS and (isinstance(operand, bool) or not isinstance(operand, Real)):
+                raise ValueError(f"Межа '{operator}' для поля '{field}' має бути числом")
+            try:
+                if operator == "in":
+                    operand = frozenset(_equality_key(value) for value in operand)
+                elif operator == "eq":
+                    operand = _equality_key(operand)
+                hash(operand)
+            except TypeError:
+                if operator == "in":
+                    raise ValueError(f"Оператор 'in' для поля '{field}' потребує набору хешованих значень") from None
+                raise ValueError(f"Значення фільтра для поля '{field}' має бути хешованим") from None
+            atoms.append((field, operator, operand))
+    if not atoms:
+        raise ValueError("Фільтр підписки не містить жодної умови")
+    return atoms
+
+
+class _Bounds:
+    """Відсортовані межі діапазонних умов одного поля та одного напрямку (нижні або верхні)."""
+
+    def __init__(self):
+        self.values: List[Real] = []
+        self.atoms: List[Tuple[int, bool]] = []
+        """Пари (atom_id, strict) у порядку `values`."""
+
+    def add(self, bound: Real, atom_id: int, strict: bool):
+        index = bisect.bisect_right(self.values, bound)
+        self.values.insert(index, bound)
+        self.atoms.insert(index, (atom_id, strict))
+
+
+class FilterIndex:
+    """
+    Спільний індекс фільтрів підписок для одного маршруту (назви події).
+
+    Однакові умови різних підписок зберігаються та перевіряються один раз. Під час
+    збігу для кожного поля події виконується один пошук у словнику рівностей (`eq`
+    та `in`) та бінарний пошук по відсортованих межах діапазонів. Кожна підписка
+    проіндексована за однією "ключовою" умовою (рівність, якщо вона є), тож решта
+    умов перевіряється лише для підписок, ключова умова яких виконалась. Вартість
+    збігу залежить від кількості полів події та кандидатів, а не від кількості підписок.
+    """
+
+    def __init__(self):
+        self._atom_ids: Dict[Atom, int] = {}
+        self._access: List[List[int]] = []
+        """Для кожної умови — підписки, для яких вона є ключовою."""
+        self._subscription_atoms: List[Tuple[int, ...]] = []
+        """Для кожної підписки — ідентифікатори всіх її умов."""
+        self._callbacks: List[Callable] = []
+        self._equality: Dict[str, Dict[Hashable, List[int]]] = collections.defaultdict(dict)
+        self._lower: Dict[str, _Bounds] = collections.defaultdict(_Bounds)
+        self._upper: Dict[str, _Bounds] = collections.defaultdict(_Bounds)
+        self._fields: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._callbacks)
+
+    def add(self, callback: Callable, atoms: Iterable[Atom]):
+        """
+        Додає підписку з фільтром до індексу.
+
+        :param callback: Колбек підписки.
+        :type callback: Callable
+        :param atoms: Умови фільтра (див. `compile_filter`).
+        :type atoms: Iterable[Atom]
+        """
+        atoms = sorted(atoms, key=lambda atom: atom[1] not in ("eq", "in"))
+        subscription_id = len(self._callbacks)
+        self._callbacks.append(callback)
+        atom_ids = tuple(dict.fromkeys(self._atom_id(atom) for atom in atoms))
+        self._subscription_atoms.append(atom_ids)
+        self._access[atom_ids[0]].append(subscription_id)
+
+    def _atom_id(self, atom: Atom) -> int:
+        """Внутрішній метод. Повертає ідентифікатор умови, реєструючи нову умову в індексах."""
+        atom_id = self._atom_ids.get(atom)
+        if atom_id is not None:
+            return atom_id
+
+        atom_id = self._atom_ids[atom] = len(self._access)
+        self._access.append([])
+        field, operator, operand = atom
+        self._fields.add(field)
+        if operator == "eq":
+            self._equality[field].setdefault(operand, []).append(atom_id)
+        elif operator == "in":
+            for value in operand:
+                self._equality[field].setdefault(value, []).append(atom_id)
+        elif operator in ("gt", "gte"):
+            self._lower[field].add(operand, atom_id, operator == "gt")
+        else:
+            self._upper[field].add(operand, atom_id, operator == "lt")
+        return atom_id
+
+    def _satisfied_atoms(self, data: Dict[str, Any]) -> List[int]:
+        """Внутрішній метод. Повертає ідентифікатори умов, виконаних для даних події."""
+        satisfied: List[int] = []
+        for field in self._fields:
+            if field not in data:
+                continue
+            value = data[field]
+
+            equality = self._equality.get(field)
+            if equality:
+                try:
+                    satisfied.extend(equality.get(_equality_key(value), ()))
+                except TypeError:
+                    pass
+
+            if isinstance(value, bool) or not isinstance(value, Real):
+                continue
+
+            lower = self._lower.get(field)
+            if lower:
+                index = bisect.bisect_left(lower.values, value)
+                satisfied.extend(atom_id for atom_id, _ in lower.atoms[:index])
+                while index < len(lower.values) and lower.values[index] == value:
+                    atom_id, strict = lower.atoms[index]
+                    if not strict:
+                        satisfied.append(atom_id)
+                    index += 1
+
+            upper = self._upper.get(field)
+            if upper:
+                index = bisect.bisect_right(upper.values, value)
+                satisfied.extend(atom_id for atom_id, _ in upper.atoms[index:])
+                while index > 0 and upper.values[index - 1] == value:
+                    index -= 1
+                    atom_id, strict = upper.atoms[index]
+                    if not strict:
+                        satisfied.append(atom_id)
+        return satisfied
+
+    def match(self, data: Any) -> Set[Callable]:
+        """
+        Повертає колбеки, фільтр хоча б однієї підписки яких виконується для даних події.
+
+        :param data: Корисне навантаження події. Дані, що не є словником, не проходять жоден фільтр.
+        :type data: Any
+        :return: Множина колбеків.
+        :rtype: Set[Callable]
+        """
+        if not isinstance(data, dict):
+            return set()
+
+        satisfied = set(self._satisfied_atoms(data))
+        matched: Set[Callable] = set()
+        for atom_id in satisfied:
+            for subscription_id in self._access[atom_id]:
+                atom_ids = self._subscription_atoms[subscription_id]
+                if len(atom_ids) == 1 or satisfied.issuperset(atom_ids):
+                    matched.add(self._callbacks[subscription_id])
+        return matched
+
+
+Route = Tuple[List[Callable], List[Callable], Optional[Tuple[FilterIndex, Dict[Callable, int]]]]
+"""
+Маршрут події: (усі колбеки у порядку підписки, колбеки без фільтра, (індекс фільтрів,
+позиції колбеків) або None, якщо фільтрованих підписок немає).
+"""
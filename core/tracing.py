@@ -0,0 +1,205 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from core.log_writer import EventLogWriter
+
+logger = logging.getLogger(__name__)
+
+current_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_trace_id", default=None)
+"""Ідентифікатор трасування поточного запиту (встановлюється в `app.TracingMiddleware`)."""
+
+
+def new_trace_id() -> str:
+    """Генерує новий випадковий ідентифікатор трасування (16 hex-символів)."""
+    return os.urandom(8).hex()
+
+
+class TraceWriter(EventLogWriter):
+    """
+    Фоновий записувач спанів у файл формату Chrome Trace Event (JSON Array Format),
+    який відкривають chrome://tracing, Perfetto UI та speedscope.
+
+    Пакетний запис успадковано від `EventLogWriter`. Файл починається з `[` і
+    поповнюється подіями через кому; закриваюча `]` за специфікацією формату
+    необов'язкова, тож навіть файл процесу, що впав, лишається придатним.
+    При перевищенні `max_bytes` файл закривається та ротується
+    (`traces.json` -> `traces.json.1` -> ... -> `traces.json.{backup_count}`).
+    """
+
+    def __init__(self, filename: str = "traces.json", max_bytes: int = 50 * 1024 * 1024,
+                 backup_count: int = 3, batch_size: int = 1000):
+        """
+        :param filename: Шлях до файлу трасування.
+        :type filename: str
+        :param max_bytes: Розмір файлу, після якого виконується ротація.
+        :type max_bytes: int
+        :param backup_count: Кількість збережених ротованих файлів.
+        :type backup_count: int
+        :param batch_size: Максимальна кількість спанів в одному записі у файл.
+        :type batch_size: int
+        """
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._size = 0
+        self._has_events = False
+        self._metadata: Dict[Any, Dict[str, Any]] = {}
+        """Метадані (назви потоків), що повторюються на початку кожного нового файлу."""
+        super().__init__(filename, batch_size)
+
+    def write(self, event: Dict[str, Any]):
+        """
+        Додає подію трасування у чергу на запис. Не блокує викликача.
+
+        :param event: Подія у форматі Chrome Trace Event.
+        :type event: Dict[str, Any]
+        """
+        self._lines.put(event)
+
+    def _open(self):
+        """
+        Внутрішній метод. Ротує непорожній файл попереднього запуску та починає новий масив.
+        Після ротації на початок файлу знову записуються назви потоків.
+        """
+        if os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
+            self._shift_backups()
+        file = open(self.filename, "w", encoding="utf-8")
+        header = "[\n" + ",\n".join(json.dumps(event, separators=(",", ":")) for event in self._metadata.values())
+        file.write(header)
+        self._size = len(header)
+        self._has_events = bool(self._metadata)
+        return file
+
+    def _shift_backups(self):
+        """Внутрішній метод. Зсуває ротовані файли на одну позицію, найстаріший видаляється."""
+        if self.backup_count <= 0:
+            os.remove(self.filename)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.filename}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.filename}.{index + 1}")
+        os.replace(self.filename, f"{self.filename}.1")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Внутрішній метод. Серіалізує пакет спанів, дописує його у файл та ротує файл за потреби.
+
+        :param batch: Події трасування.
+        :type batch: List[Dict[str, Any]]
+        """
+        for event in batch:
+            if event["ph"] == "M":
+                self._metadata[(event["pid"], event["tid"])] = event
+
+        try:
+            chunk = ",\n".join(json.dumps(event, separators=(",", ":")) for event in batch)
+            if self._has_events:
+                chunk = ",\n" + chunk
+            self._file.write(chunk)
+            self._file.flush()
+            self._size += len(chunk)
+            self._has_events = True
+
+            if self._size >= self.max_bytes:
+                self._close()
+                self._file = self._open()
+        except Exception as ex:
+            logger.error("⚠️ Помилка запису трасування у файл: %s", ex)
+
+    def _close(self):
+        """Внутрішній метод. Закриває масив подій, щоб файл був повноцінним JSON."""
+        self._file.write("\n]\n")
+        self._file.close()
+
+
+class Tracer:
+    """
+    Збирає спани етапів обробки події: прийом вебхука, запис журналу, постановка
+    в чергу, очікування в черзі та виклик кожного слухача.
+
+    Спани однієї події мають спільний `trace_id` (в `args`), тож у переглядачі
+    трасувань подію можна знайти пошуком за ним. Без записувача (`configure(None)`)
+    трасування вимкнене: `resolve_trace_id` повертає None, і шина та воркери
+    пропускають запис спанів.
+    """
+
+    def __init__(self):
+        self.writer: Optional[TraceWriter] = None
+        self._named_threads: Set[int] = set()
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return self.writer is not None
+
+    def configure(self, writer: Optional[TraceWriter]):
+        """
+        Вмикає трасування із заданим записувачем (або вимикає, якщо передано None).
+        Запуск і зупинку потоку записувача виконує викликач.
+
+        :param writer: Записувач спанів.
+        :type writer: Optional[TraceWriter]
+        """
+        self.writer = writer
+        self._named_threads = set()
+        self._pid = os.getpid()
+
+    def resolve_trace_id(self, trace_id: Optional[str] = None) -> Optional[str]:
+        """
+        Визначає ідентифікатор трасування для нової події: переданий явно, ідентифікатор
+        поточного запиту або новий.
+
+        :param trace_id: Явно переданий ідентифікатор (наприклад, отриманий від `RemoteEventBus`).
+        :type trace_id: Optional[str]
+        :return: Ідентифікатор або None, якщо трасування вимкнене.
+        :rtype: Optional[str]
+        """
+        if self.writer is None:
+            return None
+        return trace_id or current_trace_id.get() or new_trace_id()
+
+    def record(self, name: str, trace_id: str, start: float, end: float, category: str = "event", **args):
+        """
+        Записує завершений спан (подія 'X' формату Chrome Trace Event).
+
+        :param name: Назва етапу (наприклад, 'bus.enqueue' або ім'я слухача).
+        :type name: str
+        :param trace_id: Ідентифікатор трасування події.
+        :type trace_id: str
+        :param start: Початок спану (`time.monotonic()`).
+        :type start: float
+        :param end: Кінець спану (`time.monotonic()`).
+        :type end: float
+        :param category: Категорія спану ('http', 'bus', 'worker', 'listener').
+        :type category: str
+        :param args: Додаткові атрибути спану.
+        """
+        writer = self.writer
+        if writer is None:
+            return
+
+        tid = threading.get_native_id()
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            writer.write({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                          "args": {"name": threading.current_thread().name}})
+
+        args["trace_id"] = trace_id
+        writer.write({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": self._pid,
+            "tid": tid,
+            "args": args,
+        })
+
+
+TRACER = Tracer()
+"""Трасувальник процесу за замовчуванням (вимкнений, доки не викликано `configure`)."""
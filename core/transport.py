@@ -0,0 +1,383 @@
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.event_bus import EventBus
+from core.idempotency import IdempotencyCache
+from core.metrics import REGISTRY
+from core.tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+"""Заголовок кадру: довжина JSON-повідомлення (4 байти, big-endian)."""
+
+PROJECTION_METHODS = ("get", "get_by_user")
+"""Методи проєкції замовлень, доступні процесам uvicorn через брокер."""
+
+SCHEDULER_METHODS = ("emit_at", "cancel_scheduled")
+"""Методи відкладеної емісії шини, доступні процесам uvicorn через брокер."""
+
+IDEMPOTENCY_METHODS = ("add", "add_many", "discard")
+"""Методи кешу ідемпотентності брокера, доступні процесам uvicorn (операція 'dedup')."""
+
+DEFAULT_POOL_SIZE = 16
+"""Кількість з'єднань `RemoteEventBus` з брокером, що можуть одночасно чекати на відповідь."""
+
+
+def _send_frame(sock: socket.socket, message: dict):
+    """Серіалізує повідомлення та відправляє його одним кадром."""
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Читає рівно `size` байтів. Повертає None, якщо з'єднання закрито."""
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv_frame(sock: socket.socket) -> Optional[dict]:
+    """Читає один кадр і повертає розібране повідомлення (або None при закритті з'єднання)."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+class EventBroker(threading.Thread):
+    """
+    Брокер подій на Unix-domain сокеті.
+
+    Працює в процесі, що володіє справжньою шиною (`EventBus`), підписками та
+    воркерами. Процеси uvicorn (`--workers N`) публікують події через
+    `RemoteEventBus`, а брокер передає їх у локальну шину та відповідає
+    підтвердженням або помилкою емісії. Кожне клієнтське з'єднання обробляється
+    окремим потоком у порядку надходження, а клієнт чекає на підтвердження перед
+    наступною емісією, тому разом із `ShardedQueue` порядок подій одного ключа
+    зберігається.
+
+    Ключі ідемпотентності всіх процесів перевіряє єдиний кеш брокера (операція
+    'dedup'), тож повтор вебхука, що потрапив в інший процес uvicorn, теж
+    відсікається.
+    """
+
+    def __init__(self, bus: EventBus, socket_path: str, projection: Optional[Any] = None,
+                 idempotency: Optional[IdempotencyCache] = None):
+        """
+        :param bus: Локальна шина, у яку передаються отримані події.
+        :type bus: EventBus
+        :param socket_path: Шлях до Unix-domain сокета.
+        :type socket_path: str
+        :param projection: Проєкція замовлень (OrderProjection), запити до якої
+                           обслуговуються брокером для процесів uvicorn.
+        :type projection: Optional[Any]
+        :param idempotency: Спільний кеш ідемпотентності процесів uvicorn.
+        :type idempotency: Optional[IdempotencyCache]
+        """
+        super().__init__()
+        self.daemon = True
+        self.bus = bus
+        self.projection = projection
+        self.idempotency = idempotency
+        self.socket_path = socket_path
+        self._server: Optional[socket.socket] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Створює сокет (видаляючи застарілий файл сокета) та запускає потік прийому з'єднань."""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(128)
+        logger.info("BROKER: Очікування публікацій на '%s'", self.socket_path)
+        super().start()
+
+    def run(self):
+        """Основний цикл: приймає з'єднання та запускає для кожного окремий потік."""
+        while not self._stopped.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: socket.socket):
+        """
+        Внутрішній метод. Читає кадри з'єднання, емітує події у локальну шину
+        (або виконує запит) та відповідає на кожен кадр.
+        """
+        with connection:
+            while True:
+                try:
+                    message = _recv_frame(connection)
+                except (OSError, ValueError) as ex:
+                    logger.error("BROKER ERROR: Помилка читання з'єднання: %s", ex)
+                    return
+                if message is None:
+                    return
+
+                if not isinstance(message, dict) or not isinstance(message.get("op"), str):
+                    logger.warning("BROKER WARNING: Некоректний кадр: %r", message)
+                    response = {"error": "Некоректний кадр: очікується об'єкт з полем 'op'"}
+                elif message["op"] in ("query", "dedup"):
+                    response = self._answer_query(message)
+                else:
+                    response = self._emit(message)
+                try:
+                    _send_frame(connection, response)
+                except OSError as ex:
+                    logger.error("BROKER ERROR: Не вдалося відправити відповідь: %s", ex)
+                    return
+
+    def _emit(self, message: dict) -> Dict[str, Any]:
+        """Внутрішній метод. Емітує подію (або пакет) у локальну шину та формує підтвердження."""
+        try:
+            if message["op"] == "emit":
+                self.bus.emit(message["event"], message["data"], message.get("trace_id"))
+            elif message["op"] == "emit_batch":
+                self.bus.emit_batch([tuple(event) for event in message["events"]], message.get("trace_id"))
+            else:
+                logger.warning("BROKER WARNING: Невідома операція '%s'", message["op"])
+                return {"error": f"Операція '{message['op']}' не підтримується"}
+        except Exception as ex:
+            logger.error("BROKER ERROR: Не вдалося емітувати подію: %s", ex)
+            return {"error": str(ex)}
+        return {"result": None}
+
+    def _answer_query(self, message: dict) -> Dict[str, Any]:
+        """
+        Внутрішній метод. Виконує запит до проєкції, планувальника шини, кешу
+        ідемпотентності (операція 'dedup') або збір метрик та формує відповідь.
+        """
+        method = message.get("method")
+        if message["op"] == "dedup":
+            target = self.idempotency if method in IDEMPOTENCY_METHODS else None
+        elif method in SCHEDULER_METHODS:
+            target = self.bus
+        elif method in PROJECTION_METHODS:
+            target = self.projection
+        else:
+            target = None
+
+        if method == "metrics" and message["op"] == "query":
+            return {"result": REGISTRY.render()}
+        if target is None:
+            return {"error": f"Запит '{method}' не підтримується"}
+        try:
+            return {"result": getattr(target, method)(*message.get("args", []))}
+        except Exception as ex:
+            return {"error": str(ex)}
+
+    def stop(self):
+        """Зупиняє прийом з'єднань та видаляє файл сокета."""
+        self._stopped.set()
+        if self._server:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        logger.info("BROKER: Зупинено.")
+
+
+class RemoteEventBus:
+    """
+    Клієнт `EventBroker` з тим самим інтерфейсом емісії, що й `EventBus`
+    (`emit`, `emit_batch`). Використовується процесами uvicorn-воркерів.
+
+    Тримає пул постійних з'єднань (до `pool_size`): кожен запит займає вільне
+    з'єднання на час відправки та очікування відповіді, тож запити різних потоків
+    процесу виконуються одночасно, а не в черзі за одним сокетом. Кожен кадр
+    отримує відповідь брокера, тож `emit` повертається лише після того, як подію
+    прийнято локальною шиною, і кидає виняток, якщо емісія не вдалася. Якщо кадр
+    не вдалося відправити, виконується одна спроба перепідключення; обрив після
+    відправки не повторюється, щоб не емітувати подію двічі.
+    """
+
+    def __init__(self, socket_path: str, pool_size: int = DEFAULT_POOL_SIZE):
+        """
+        :param socket_path: Шлях до Unix-domain сокета брокера.
+        :type socket_path: str
+        :param pool_size: Найбільша кількість одночасних запитів (і з'єднань) процесу.
+        :type pool_size: int
+        """
+        self.socket_path = socket_path
+        self._idle: List[socket.socket] = []
+        """Вільні з'єднання пулу."""
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> socket.socket:
+        """Внутрішній метод. Встановлює з'єднання з брокером."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _request(self, message: dict) -> Any:
+        """
+        Внутрішній метод. Відправляє кадр і чекає на відповідь брокера.
+
+        :param message: Повідомлення для брокера.
+        :type message: dict
+        :return: Результат операції.
+        :rtype: Any
+        :raises RuntimeError: Якщо брокер повернув помилку або закрив з'єднання до відповіді.
+        :raises OSError: Якщо брокер недоступний.
+        """
+        with self._slots:
+            with self._lock:
+                sock = self._idle.pop() if self._idle else None
+            for attempt in (1, 2):
+                try:
+                    if sock is None:
+                        sock = self._connect()
+                    _send_frame(sock, message)
+                    break
+                except OSError:
+                    if sock is not None:
+                        sock.close()
+                        sock = None
+                    if attempt == 2:
+                        raise
+            try:
+                response = _recv_frame(sock)
+            except OSError:
+                response = None
+            if response is None:
+                sock.close()
+                raise RuntimeError("Брокер закрив з'єднання до відповіді")
+            with self._lock:
+                self._idle.append(sock)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def query(self, method: str, *args) -> Any:
+        """
+        Виконує запит до проєкції замовлень (або збір метрик) у процесі брокера та чекає на відповідь.
+
+        :param method: Назва методу (див. `PROJECTION_METHODS`, `SCHEDULER_METHODS`) або 'metrics'.
+        :type method: str
+        :return: Результат методу.
+        :rtype: Any
+        :raises RuntimeError: Якщо брокер повернув помилку або закрив з'єднання.
+        """
+        return self._request({"op": "query", "method": method, "args": list(args)})
+
+    def emit(self, event_name: str, data: Any = None, trace_id: Optional[str] = None):
+        """
+        Публікує подію у брокер.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Корисне навантаження події (має серіалізуватися в JSON).
+        :type data: Any
+        :param trace_id: Ідентифікатор трасування (за замовчуванням — ідентифікатор поточного запиту).
+        :type trace_id: Optional[str]
+        :raises RuntimeError: Якщо брокер не зміг емітувати подію.
+        """
+        self._request({"op": "emit", "event": event_name, "data": data,
+                       "trace_id": trace_id or current_trace_id.get()})
+
+    def emit_batch(self, events: List[Tuple[str, Any]], trace_id: Optional[str] = None):
+        """
+        Публікує пакет подій у брокер одним кадром.
+
+        :param events: Список пар (event_name, data).
+        :type events: List[Tuple[str, Any]]
+        :param trace_id: Ідентифікатор трасування (за замовчуванням — ідентифікатор поточного запиту).
+        :type trace_id: Optional[str]
+        :raises RuntimeError: Якщо брокер не зміг емітувати пакет.
+        """
+        self._request({"op": "emit_batch", "events": [list(event) for event in events],
+                       "trace_id": trace_id or current_trace_id.get()})
+
+    def emit_at(self, event_name: str, data: Any, due_at: float) -> str:
+        """
+        Планує емісію події в процесі брокера (див. `EventBus.emit_at`).
+
+        :return: Ідентифікатор таймера.
+        :rtype: str
+        """
+        return self.query("emit_at", event_name, data, due_at)
+
+    def emit_after(self, event_name: str, data: Any, delay: float) -> str:
+        """
+        Планує емісію події через `delay` секунд (див. `EventBus.emit_after`).
+
+        :return: Ідентифікатор таймера.
+        :rtype: str
+        """
+        return self.emit_at(event_name, data, time.time() + delay)
+
+    def cancel_scheduled(self, timer_id: str) -> bool:
+        """Скасовує заплановану подію в процесі брокера (див. `EventBus.cancel_scheduled`)."""
+        return self.query("cancel_scheduled", timer_id)
+
+    def close(self):
+        """Закриває вільні з'єднання з брокером."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+class RemoteOrderProjection:
+    """
+    Проксі до `OrderProjection`, що живе в процесі брокера.
+    Надає ті самі методи запитів (`get`, `get_by_user`) для процесів uvicorn.
+    """
+
+    def __init__(self, remote_bus: RemoteEventBus):
+        """
+        :param remote_bus: Клієнт брокера, через з'єднання якого виконуються запити.
+        :type remote_bus: RemoteEventBus
+        """
+        self.remote_bus = remote_bus
+
+    def get(self, order_id: int) -> Optional[Dict[str, Any]]:
+        return self.remote_bus.query("get", order_id)
+
+    def get_by_user(self, user_id: Any) -> List[Dict[str, Any]]:
+        return self.remote_bus.query("get_by_user", user_id)
+
+
+class RemoteIdempotencyCache:
+    """
+    Проксі до спільного `IdempotencyCache` процесу брокера (операція 'dedup').
+    Надає методи перевірки ключів (`add`, `add_many`, `discard`) для процесів uvicorn,
+    тож дублікат відсікається незалежно від того, який процес прийняв повтор.
+    """
+
+    def __init__(self, remote_bus: RemoteEventBus):
+        """
+        :param remote_bus: Клієнт брокера, через з'єднання якого виконуються запити.
+        :type remote_bus: RemoteEventBus
+        """
+        self.remote_bus = remote_bus
+
+    def add(self, key: str) -> bool:
+        return self.remote_bus._request({"op": "dedup", "method": "add", "args": [key]})
+
+    def add_many(self, keys: List[str]) -> List[bool]:
+        return self.remote_bus._request({"op": "dedup", "method": "add_many", "args": [keys]})
+
+    def discard(self, key: str):
+        self.remote_bus._request({"op": "dedup", "method": "discard", "args": [key]})
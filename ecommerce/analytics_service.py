@@ -1,5 +1,8 @@
+import logging
 from typing import Any
 
+logger = logging.getLogger(__name__)
+
 order_count = 0
 paid_count = 0
 replay_count = 0
@@ -24,11 +27,11 @@ def analytics_counter(event_name: str, data: Any):
 
     if event_name == "order.created":
         order_count += 1
-        print(f"ANALYTICS: Зафіксовано нове замовлення. Всього замовлень: {order_count}")
+        logger.debug("ANALYTICS: Зафіксовано нове замовлення. Всього замовлень: %d", order_count)
 
     elif event_name == "order.paid":
         paid_count += 1
-        print(f"ANALYTICS: Зафіксовано нову оплату. Всього оплат: {paid_count}")
+        logger.debug("ANALYTICS: Зафіксовано нову оплату. Всього оплат: %d", paid_count)
 
 
 def get_analytics_total():
@@ -55,7 +58,7 @@ def analytics_replay_listener(event_name: str, data: Any):
     """
     global replay_count
     replay_count += 1
-    print(f"🔄 ANALYTICS REPLAY: Повторна обробка події {event_name}. Всього перепрограно: {replay_count}")
+    logger.debug("🔄 ANALYTICS REPLAY: Повторна обробка події %s. Всього перепрограно: %d", event_name, replay_count)
 
 
 def reset_analytics_total():
@@ -68,4 +71,4 @@ def reset_analytics_total():
     order_count = 0
     paid_count = 0
     replay_count = 0
-    print("ANALYTICS: Лічильники успішно скинуто для Replay.")
+    logger.info("ANALYTICS: Лічильники успішно скинуто для Replay.")
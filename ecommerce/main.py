@@ -1,7 +1,9 @@
+import sys
 from queue import Queue
 from time import sleep
 
 from core.event_bus import EventBus
+from core.log_pipeline import LogPipeline
 from .notification_service import email_sender, sms_sender
 from .analytics_service import analytics_counter, get_analytics_total, analytics_replay_listener, reset_analytics_total
 from .order_service import create_order, pay_order
@@ -9,6 +11,8 @@ from .worker import start_worker, stop_worker
 import os
 
 if __name__ == "__main__":
+    log_pipeline = LogPipeline(level="DEBUG", stream=sys.stdout).start()
+
     if os.path.exists("events.log"):
         os.remove("events.log")
 
@@ -79,3 +83,4 @@ if __name__ == "__main__":
     print("==============================================")
 
     stop_worker(event_queue, worker_thread)
+    log_pipeline.stop()
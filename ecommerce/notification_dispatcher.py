@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Класичний алгоритм Token Bucket для обмеження частоти звернень до провайдера.
+
+    Токени поповнюються зі швидкістю `rate` за секунду до максимуму `capacity`.
+    Кожна відправка споживає один токен; якщо токенів немає, повертається час,
+    який потрібно зачекати.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        :param rate: Кількість дозволених відправок за секунду.
+        :type rate: float
+        :param capacity: Максимальний розмір "сплеску" (burst). За замовчуванням дорівнює `rate`.
+        :type capacity: Optional[float]
+        """
+        if rate <= 0:
+            raise ValueError("rate має бути більше 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Резервує один токен і повертає затримку (у секундах), після якої його можна використати.
+
+        Токен списується одразу (баланс може стати від'ємним), тому послідовні
+        виклики отримують рівномірно зростаючі затримки без повторних перевірок.
+
+        :return: Час очікування у секундах (0, якщо токен доступний негайно).
+        :rtype: float
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+
+class NotificationChannel:
+    """
+    Канал вихідних сповіщень (наприклад, email або SMS) з власним буфером,
+    обмеженням частоти (Token Bucket) та лімітом одночасних відправок.
+
+    Канал працює в event loop `NotificationDispatcher`. Слухач, отриманий через
+    `as_listener()`, лише кладе сповіщення у буфер, тому EventWorker не чекає
+    на повільного провайдера. Синхронний провайдер виконується у власному пулі
+    потоків каналу розміром `max_in_flight`, тож повільний провайдер не займає
+    потоки інших каналів.
+    """
+
+    def __init__(self, name: str, sender: Callable, rate: float, burst: Optional[float] = None,
+                 max_in_flight: int = 4, buffer_size: int = 1000):
+        """
+        :param name: Назва каналу (використовується в логах).
+        :type name: str
+        :param sender: Функція провайдера з сигнатурою `(event_name, data)`.
+                       Може бути як звичайною, так і `async` функцією.
+        :type sender: Callable
+        :param rate: Ліміт провайдера — відправок за секунду.
+        :type rate: float
+        :param burst: Максимальний сплеск відправок понад середню частоту.
+        :type burst: Optional[float]
+        :param max_in_flight: Максимальна кількість одночасних відправок.
+        :type max_in_flight: int
+        :param buffer_size: Розмір буфера каналу. При переповненні нові сповіщення відкидаються.
+        :type buffer_size: int
+        """
+        self.name = name
+        self.sender = sender
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.buffer_size = buffer_size
+
+        self.sent = 0
+        """Кількість успішних відправок."""
+        self.failed = 0
+        """Кількість відправок, що завершились помилкою."""
+        self.dropped = 0
+        """Кількість сповіщень, відкинутих через переповнений буфер."""
+
+        self._pending = 0
+        self._in_flight = 0
+        self._deliveries = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._is_async = asyncio.iscoroutinefunction(sender)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if not self._is_async:
+            self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"notify-{name}")
+
+    def submit(self, event_name: str, data: Any) -> bool:
+        """
+        Потокобезпечно додає сповіщення до буфера каналу. Не блокує викликача.
+
+        :param event_name: Назва події.
+        :type event_name: str
+        :param data: Дані події.
+        :type data: Any
+        :return: True, якщо сповіщення прийнято, False — якщо буфер переповнений
+                 або канал ще не запущено.
+        :rtype: bool
+        """
+        if self._loop is None:
+            logger.error("NOTIFY ERROR: Канал '%s' не запущено. Сповіщення '%s' відкинуто.", self.name, event_name)
+            return False
+
+        with self._lock:
+            if self._pending >= self.buffer_size:
+                self.dropped += 1
+                logger.warning("NOTIFY WARNING: Буфер каналу '%s' переповнений. Сповіщення '%s' відкинуто.",
+                               self.name, event_name)
+                return False
+            self._pending += 1
+
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event_name, data))
+        return True
+
+    def as_listener(self) -> Callable:
+        """
+        Повертає слухача для `EventBus.subscribe`, який передає подію у канал.
+
+        :return: Функція `(event_name, data)` з іменем провайдера.
+        :rtype: Callable
+        """
+
+        def listener(event_name: str, data: Any):
+            self.submit(event_name, data)
+
+        listener.__name__ = f"{self.sender.__name__}@{self.name}"
+        return listener
+
+    def pending(self) -> int:
+        """Кількість сповіщень у буфері, що ще не передані провайдеру."""
+        return self._pending
+
+    async def _run(self):
+        """
+        Внутрішній цикл каналу: бере сповіщення з буфера, чекає на токен
+        та запускає відправку, не перевищуючи `max_in_flight`.
+        """
+        while True:
+            event_name, data = await self._queue.get()
+
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+            await self._semaphore.acquire()
+            self._in_flight += 1
+            with self._lock:
+                self._pending -= 1
+            delivery = asyncio.ensure_future(self._deliver(event_name, data))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, event_name: str, data: Any):
+        """Внутрішній метод. Виконує одну відправку та звільняє слот in-flight."""
+        try:
+            if self._is_async:
+                await self.sender(event_name, data)
+            else:
+                await self._loop.run_in_executor(self._executor, self.sender, event_name, data)
+            self.sent += 1
+        except Exception as ex:
+            self.failed += 1
+            logger.error("NOTIFY ERROR: Провайдер '%s' каналу '%s' впав. %s", self.sender.__name__, self.name, ex,
+                         exc_info=True)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def _drain(self):
+        """Внутрішній метод. Чекає, поки буфер спорожніє та завершаться всі відправки."""
+        while self._pending or self._in_flight:
+            await asyncio.sleep(0.01)
+
+
+class NotificationDispatcher(threading.Thread):
+    """
+    Фоновий потік з власним asyncio event loop, у якому працюють канали сповіщень.
+
+    Відокремлює відправку сповіщень від основної черги EventBus: кожен канал має
+    окремий буфер, ліміт частоти та ліміт одночасних відправок, тож затримки
+    провайдера не впливають на інших слухачів.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.daemon = True
+        self.channels: Dict[str, NotificationChannel] = {}
+        """Зареєстровані канали: {name: NotificationChannel}."""
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._tasks = []
+
+    def add_channel(self, name: str, sender: Callable, rate: float, burst: Optional[float] = None,
+                    max_in_flight: int = 4, buffer_size: int = 1000) -> NotificationChannel:
+        """
+        Реєструє новий канал. Канали потрібно додати до виклику `start()`.
+
+        Параметри відповідають конструктору `NotificationChannel`.
+
+        :return: Створений канал.
+        :rtype: NotificationChannel
+        """
+        if self._ready.is_set():
+            raise RuntimeError("Канали потрібно реєструвати до запуску NotificationDispatcher")
+        channel = NotificationChannel(name, sender, rate, burst, max_in_flight, buffer_size)
+        self.channels[name] = channel
+        return channel
+
+    def run(self):
+        """Основний цикл потоку: ініціалізує канали та запускає event loop."""
+        asyncio.set_event_loop(self.loop)
+        for channel in self.channels.values():
+            channel._queue = asyncio.Queue()
+            channel._semaphore = asyncio.Semaphore(channel.max_in_flight)
+            channel._loop = self.loop
+            self._tasks.append(self.loop.create_task(channel._run()))
+        logger.info("NOTIFY: Диспетчер сповіщень запущено. Канали: %s", list(self.channels))
+        self._ready.set()
+        self.loop.run_forever()
+
+    def start(self):
+        """Запускає потік та чекає, поки канали будуть готові приймати сповіщення."""
+        super().start()
+        self._ready.wait()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Чекає на відправку сповіщень з буферів (не довше `timeout`) та зупиняє event loop.
+
+        :param timeout: Максимальний час очікування у секундах.
+        :type timeout: float
+        """
+        asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+        self.loop.close()
+        logger.info("NOTIFY: Диспетчер сповіщень зупинено.")
+
+    async def _shutdown(self, timeout: float):
+        """Внутрішній метод. Чекає на спорожнення всіх каналів та скасовує їхні цикли."""
+        drain = asyncio.gather(*(channel._drain() for channel in self.channels.values()))
+        try:
+            await asyncio.wait_for(drain, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("NOTIFY WARNING: Не всі сповіщення встигли відправитись до зупинки.")
+
+        tasks = list(self._tasks)
+        for channel in self.channels.values():
+            tasks.extend(channel._deliveries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for channel in self.channels.values():
+            if channel._executor is not None:
+                channel._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,8 @@
+import logging
 from typing import Any
 
+logger = logging.getLogger(__name__)
+
 
 def email_sender(event_name: str, data: Any):
     """
@@ -21,9 +24,9 @@ def email_sender(event_name: str, data: Any):
     order_id = data.get("order_id", "N/A")
 
     if user_id == 501:
-        print(f"EMAIL ERROR: Не вдалося відправити лист користувачу {user_id}. Кидаємо виняток.")
+        logger.warning("EMAIL ERROR: Не вдалося відправити лист користувачу %s. Кидаємо виняток.", user_id)
         raise ValueError("Simulated Email Sending Failure")
-    print(f"NOTIFICATION (Email): Замовлення #{order_id} створено. Відправлено лист користувачу {user_id}.")
+    logger.debug("NOTIFICATION (Email): Замовлення #%s створено. Відправлено лист користувачу %s.", order_id, user_id)
 
 
 def sms_sender(event_name: str, data: Any):
@@ -38,4 +41,4 @@ def sms_sender(event_name: str, data: Any):
     :type data: Any
     """
     order_id = data.get("order_id", "N/A")
-    print(f"NOTIFICATION (SMS): Замовлення #{order_id} успішно ОПЛАЧЕНО.")
+    logger.debug("NOTIFICATION (SMS): Замовлення #%s успішно ОПЛАЧЕНО.", order_id)
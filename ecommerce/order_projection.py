@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"shipped"}
+"""Статуси, після яких замовлення більше не змінюється і може бути перенесене в архів."""
+
+LOG_TIMESTAMP_FORMAT = "%d-%m-%Y %H:%M:%S"
+"""Формат поля `timestamp` у журналі подій (див. `EventBus._log_event`)."""
+
+
+class OrderProjection:
+    """
+    Проєкція стану замовлень, побудована з потоку подій 'order.*'.
+
+    Підтримує:
+    1. Основний індекс у пам'яті за `order_id` (статус, сума, користувач, часові мітки).
+    2. Вторинний індекс за `user_id`.
+    3. Періодичне ущільнення: завершені замовлення переносяться у файл-архів,
+       а в пам'яті залишається лише їхній байтовий офсет в архіві. Застарілі рядки
+       архіву (замовлення, повернуті з архіву новою подією) прибираються
+       переписуванням архіву, коли їх стає більше, ніж актуальних.
+
+    Усі запити (`get`, `get_by_user`) виконуються за O(1) без сканування 'events.log'.
+    Метод `apply` підписується на шину як звичайний слухач. Активні замовлення
+    живуть лише в пам'яті, тому при старті проєкцію відновлює `rebuild` з журналу подій.
+    """
+
+    def __init__(self, archive_path: str = "orders_archive.log", compact_every: int = 1000):
+        """
+        :param archive_path: Шлях до файлу-архіву завершених замовлень (JSON Lines).
+        :type archive_path: str
+        :param compact_every: Кількість оброблених подій між автоматичними ущільненнями.
+        :type compact_every: int
+        """
+        self.archive_path = archive_path
+        self.compact_every = compact_every
+
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        """Активні замовлення: {order_id: record}."""
+        self.by_user: Dict[Any, Set[int]] = {}
+        """Вторинний індекс: {user_id: {order_id, ...}}."""
+        self.archived: Dict[int, int] = {}
+        """Індекс архіву: {order_id: byte_offset у файлі-архіві}."""
+
+        self._lock = threading.RLock()
+        self._applied_since_compaction = 0
+        self._archive_stale = 0
+        """Кількість застарілих рядків в архіві (замовлення має новіший рядок або повернуте в пам'ять)."""
+        self._load_archive_index()
+
+    def _load_archive_index(self):
+        """
+        Внутрішній метод. Будує індекс архіву (і вторинний індекс за користувачем)
+        одним проходом по файлу-архіву при старті.
+        """
+        if not os.path.exists(self.archive_path):
+            return
+
+        offset = 0
+        with open(self.archive_path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    if record["order_id"] in self.archived:
+                        self._archive_stale += 1
+                    self.archived[record["order_id"]] = offset
+                    self._index_user(record)
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning("PROJECTION WARNING: Пропущено некоректний рядок в архіві на офсеті %d", offset)
+                offset += len(line)
+
+        logger.info("PROJECTION: Завантажено індекс архіву: %d замовлень.", len(self.archived))
+
+    def _index_user(self, record: Dict[str, Any]):
+        """Внутрішній метод. Додає замовлення до вторинного індексу за користувачем."""
+        user_id = record.get("user_id")
+        if user_id is not None:
+            self.by_user.setdefault(user_id, set()).add(record["order_id"])
+
+    def apply(self, event_name: str, data: Any):
+        """
+        Слухач подій 'order.*'. Оновлює запис замовлення відповідно до події.
+
+        Статус береться з назви події ('order.paid' -> 'paid'), а поля `user_id` та
+        `amount` — з даних, якщо вони присутні. Сума з подій, відмінних від
+        'order.created', не перезаписує вже відому суму.
+
+        :param event_name: Назва події (наприклад, 'order.created').
+        :type event_name: str
+        :param data: Дані події, що містять щонайменше 'order_id'.
+        :type data: Any
+        """
+        self._apply(event_name, data, time.time())
+
+    def _apply(self, event_name: str, data: Any, now: float):
+        """Внутрішній метод. Застосовує подію, що сталася в момент `now`."""
+        order_id = data.get("order_id") if isinstance(data, dict) else None
+        if order_id is None:
+            return
+
+        status = event_name.split(".", 1)[1]
+
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is None:
+                record = self._restore_from_archive(order_id) or {
+                    "order_id": order_id, "status": None, "amount": None, "user_id": None,
+                    "created_at": now,
+                }
+                self.orders[order_id] = record
+
+            record["status"] = status
+            record["updated_at"] = now
+            record[f"{status}_at"] = now
+
+            if data.get("user_id") is not None and record["user_id"] is None:
+                record["user_id"] = data["user_id"]
+                self._index_user(record)
+            if "amount" in data and (status == "created" or record["amount"] is None):
+                record["amount"] = data["amount"]
+
+            self._applied_since_compaction += 1
+            if self._applied_since_compaction >= self.compact_every:
+                self.compact()
+
+    def _restore_from_archive(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Внутрішній метод. Повертає замовлення з архіву в активний індекс,
+        якщо для нього надійшла нова подія.
+        """
+        offset = self.archived.pop(order_id, None)
+        if offset is None:
+            return None
+        self._archive_stale += 1
+        return self._read_archived(offset)
+
+    def _read_archived(self, offset: int) -> Dict[str, Any]:
+        """Внутрішній метод. Читає один запис з архіву за байтовим офсетом."""
+        with open(self.archive_path, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+
+    def compact(self) -> int:
+        """
+        Переносить завершені замовлення (див. `TERMINAL_STATUSES`) з пам'яті у файл-архів.
+        У пам'яті залишається лише офсет запису в архіві.
+
+        :return: Кількість перенесених замовлень.
+        :rtype: int
+        """
+        with self._lock:
+            self._applied_since_compaction = 0
+            terminal = [record for record in self.orders.values() if record["status"] in TERMINAL_STATUSES]
+            if not terminal:
+                return 0
+
+            with open(self.archive_path, "ab") as file:
+                offset = file.tell()
+                for record in terminal:
+                    line = (json.dumps(record) + "\n").encode("utf-8")
+                    file.write(line)
+                    self.archived[record["order_id"]] = offset
+                    del self.orders[record["order_id"]]
+                    offset += len(line)
+
+            if self._archive_stale > len(self.archived):
+                self._rewrite_archive()
+
+        logger.info("PROJECTION: Ущільнення завершено. Перенесено в архів %d замовлень.", len(terminal))
+        return len(terminal)
+
+    def _rewrite_archive(self):
+        """
+        Внутрішній метод. Переписує архів лише з актуальними рядками через тимчасовий
+        файл та атомарне перейменування, оновлюючи офсети індексу.
+        """
+        tmp_path = self.archive_path + ".tmp"
+        archived: Dict[int, int] = {}
+        with open(self.archive_path, "rb") as source, open(tmp_path, "wb") as target:
+            for order_id, offset in sorted(self.archived.items(), key=lambda item: item[1]):
+                source.seek(offset)
+                archived[order_id] = target.tell()
+                target.write(source.readline())
+        os.replace(tmp_path, self.archive_path)
+        logger.info("PROJECTION: Архів переписано, прибрано %d застарілих рядків.", self._archive_stale)
+        self.archived = archived
+        self._archive_stale = 0
+
+    def rebuild(self, log_path: str = "events.log", end_offset: Optional[int] = None) -> int:
+        """
+        Відновлює проєкцію з журналу подій (викликається при старті, до підписки на шину).
+
+        Активні замовлення зберігаються лише в пам'яті, тому після перезапуску їх
+        потрібно відтворити: архів і індекси будуються заново з усіх подій 'order.*'
+        журналу (з часом події з поля `timestamp`). Завершені замовлення під час
+        програвання переносяться в архів звичним ущільненням, тож пам'ять обмежена.
+        Якщо журналу немає, наявний архів залишається без змін.
+
+        Коли проєкцію живить курсор `DurableEventBus`, передайте його зміщення як
+        `end_offset`: решту журналу курсор доставить сам, тож жодна подія не
+        застосовується двічі.
+
+        :param log_path: Шлях до журналу подій.
+        :type log_path: str
+        :param end_offset: Байтове зміщення журналу, до якого програються події.
+                           None — увесь журнал.
+        :type end_offset: Optional[int]
+        :return: Кількість застосованих подій.
+        :rtype: int
+        """
+        if not os.path.exists(log_path):
+            return 0
+
+        parsed_at: Dict[str, float] = {}
+        applied = 0
+        position = 0
+        with self._lock:
+            self.orders, self.by_user, self.archived = {}, {}, {}
+            self._archive_stale = 0
+            open(self.archive_path, "wb").close()
+
+            with open(log_path, "rb") as file:
+                for line in file:
+                    if end_offset is not None and position >= end_offset:
+                        break
+                    position += len(line)
+                    try:
+                        entry = json.loads(line)
+                        event_name = entry["event"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if not event_name.startswith("order."):
+                        continue
+
+                    timestamp = entry.get("timestamp", "")
+                    now = parsed_at.get(timestamp)
+                    if now is None:
+                        try:
+                            now = time.mktime(time.strptime(timestamp, LOG_TIMESTAMP_FORMAT))
+                        except (TypeError, ValueError):
+                            now = time.time()
+                        parsed_at = {timestamp: now}
+                    self._apply(event_name, entry.get("data"), now)
+                    applied += 1
+            self.compact()
+
+        logger.info("PROJECTION: Відновлено з '%s': %d подій, активних замовлень: %d, в архіві: %d.",
+                    log_path, applied, len(self.orders), len(self.archived))
+        return applied
+
+    def get(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Повертає поточний стан замовлення.
+
+        :param order_id: ID замовлення.
+        :type order_id: int
+        :return: Копія запису замовлення або None, якщо замовлення невідоме.
+        :rtype: Optional[Dict[str, Any]]
+        """
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is not None:
+                return dict(record)
+            offset = self.archived.get(order_id)
+            if offset is None:
+                return None
+            return self._read_archived(offset)
+
+    def get_by_user(self, user_id: Any) -> List[Dict[str, Any]]:
+        """
+        Повертає всі замовлення користувача (активні та архівні).
+
+        :param user_id: ID користувача.
+        :type user_id: Any
+        :return: Список записів замовлень.
+        :rtype: List[Dict[str, Any]]
+        """
+        with self._lock:
+            order_ids = sorted(self.by_user.get(user_id, ()))
+            return [record for record in map(self.get, order_ids) if record is not None]
@@ -1,7 +1,14 @@
+import logging
 import threading
-import traceback
 from queue import Queue, Empty
-from time import sleep
+from time import sleep, monotonic
+from typing import List
+
+from core.metrics import EVENTS_DISPATCHED, LISTENER_FAILURES, QUEUE_WAIT_SECONDS
+from core.sharded_queue import ShardedQueue
+from core.tracing import TRACER
+
+logger = logging.getLogger(__name__)
 
 STOP_SIGNAL = object()
 
@@ -11,7 +18,9 @@ class EventWorker(threading.Thread):
     Фоновий потік-споживач, який безперервно бере завдання з черги (`Queue`)
     та викликає відповідні колбеки.
 
-    Завданням є кортеж: (event_name: str, data: Any, callbacks: List[Callable]).
+    Завданням є кортеж: (event_name: str, data: Any, callbacks: List[Callable], enqueued_at: float,
+    trace_id: Optional[str]). Для завдань із `trace_id` записуються спани очікування
+    в черзі та виклику кожного слухача.
 
     Потік демон: Завершиться автоматично, якщо основна програма виходить.
     """
@@ -26,19 +35,27 @@ class EventWorker(threading.Thread):
         super().__init__()
         self.queue = queue
         self.daemon = True
-        print("WORKER: Ініціалізовано. Готовий обробляти завдання.")
+        self.started_at = 0.0
+        """Момент запуску потоку (`time.monotonic()`)."""
+        self.busy_seconds = 0.0
+        """Сумарний час, витрачений на виклик слухачів."""
+        self.last_heartbeat = 0.0
+        """Момент останньої ітерації основного циклу (для перевірки живучості)."""
+        logger.info("WORKER: Ініціалізовано. Готовий обробляти завдання.")
 
     def run(self):
         """
         Основний цикл роботи Worker'а.
         """
+        self.started_at = self.last_heartbeat = monotonic()
         while True:
             try:
                 task = self.queue.get(timeout=1)
             except Empty:
+                self.last_heartbeat = monotonic()
                 continue
             except Exception as ex:
-                print(f"WORKER FATAL ERROR (Queue Get): {ex.__class__.__name__}: {ex}")
+                logger.exception("WORKER FATAL ERROR (Queue Get): %s: %s", ex.__class__.__name__, ex)
                 sleep(2)
                 continue
 
@@ -46,24 +63,38 @@ class EventWorker(threading.Thread):
                 self.queue.task_done()
                 break
 
-            event_name, data, callbacks = task
-            print(f"\nWORKER: Отримано завдання для '{event_name}'. Викликаємо {len(callbacks)} слухачів...")
+            event_name, data, callbacks, enqueued_at, trace_id = task
+            started = self.last_heartbeat = monotonic()
+            QUEUE_WAIT_SECONDS.observe(started - enqueued_at)
+            if trace_id:
+                TRACER.record("queue.wait", trace_id, enqueued_at, started, "worker", event=event_name)
+            logger.debug("WORKER: Отримано завдання для '%s'. Викликаємо %d слухачів...", event_name, len(callbacks))
 
             try:
                 for callback in callbacks:
+                    callback_started = monotonic()
+                    failed = False
                     try:
                         callback(event_name, data)
 
                     except Exception as ex:
-                        print(f"WORKER ERROR: Слухач '{callback.__name__}' для '{event_name}' впав. {ex}")
-                        traceback.print_exc(limit=1)
+                        failed = True
+                        LISTENER_FAILURES.inc(event_name)
+                        logger.error("WORKER ERROR: Слухач '%s' для '%s' впав. %s", callback.__name__, event_name, ex,
+                                     exc_info=True)
 
+                    if trace_id:
+                        TRACER.record(callback.__name__, trace_id, callback_started, monotonic(), "listener",
+                                      event=event_name, failed=failed)
+
+                EVENTS_DISPATCHED.inc(event_name)
+                self.busy_seconds += monotonic() - started
                 self.queue.task_done()
 
             except Exception as ex:
-                print(f"WORKER ERROR (Task Processing) для '{event_name}': {ex.__class__.__name__}: {ex}")
+                logger.exception("WORKER ERROR (Task Processing) для '%s': %s: %s", event_name, ex.__class__.__name__, ex)
                 sleep(2)
-        print("WORKER: Отримано STOP_SIGNAL. Завершення потоку.")
+        logger.info("WORKER: Отримано STOP_SIGNAL. Завершення потоку.")
 
 
 def start_worker(queue: Queue) -> EventWorker:
@@ -94,8 +125,33 @@ def stop_worker(queue: Queue, worker: EventWorker):
     :param worker: Об'єкт Worker, який потрібно зупинити.
     :type worker: EventWorker
     """
-    print("\n--- Зупинка Worker ---")
+    logger.info("--- Зупинка Worker ---")
     queue.put(STOP_SIGNAL)
     worker.join()
     queue.join()
-    print("Worker завершив роботу")
+    logger.info("Worker завершив роботу")
+
+
+def start_sharded_workers(queue: ShardedQueue) -> List[EventWorker]:
+    """
+    Запускає окремий EventWorker для кожного шарду `ShardedQueue`.
+
+    :param queue: Шардована черга EventBus.
+    :type queue: ShardedQueue
+    :return: Список запущених воркерів (у порядку шардів).
+    :rtype: List[EventWorker]
+    """
+    return [start_worker(shard) for shard in queue.shards]
+
+
+def stop_sharded_workers(queue: ShardedQueue, workers: List[EventWorker]):
+    """
+    Зупиняє воркери шардованої черги: кожен шард отримує власний `STOP_SIGNAL`.
+
+    :param queue: Шардована черга EventBus.
+    :type queue: ShardedQueue
+    :param workers: Воркери, повернуті `start_sharded_workers`.
+    :type workers: List[EventWorker]
+    """
+    for shard, worker in zip(queue.shards, workers):
+        stop_worker(shard, worker)
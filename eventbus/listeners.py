@@ -1,5 +1,9 @@
+import logging
 from typing import Any
 
+# Не `logger`: це ім'я має публічний слухач `logger` нижче.
+log = logging.getLogger(__name__)
+
 
 def email_sender(event_name: str, data: Any):
     """
@@ -13,7 +17,7 @@ def email_sender(event_name: str, data: Any):
     :type data: Any
     """
     if event_name == "user.registered":
-        print(f"EMAIL_SENDER: Відправлено вітальний лист користувачу {data.get('user_id')}.")
+        log.debug("EMAIL_SENDER: Відправлено вітальний лист користувачу %s.", data.get('user_id'))
 
 
 def logger(event_name: str, data: Any):
@@ -29,11 +33,11 @@ def logger(event_name: str, data: Any):
     :type data: Any
     """
     if 'user' in event_name:
-        print(f"LOGGER (Wildcard): Зафіксована подія користувача '{event_name}' за даними: {data}")
+        log.debug("LOGGER (Wildcard): Зафіксована подія користувача '%s' за даними: %s", event_name, data)
     elif 'order' in event_name:
-        print(f"LOGGER (Wildcard): Зафіксована подія замовлення '{event_name}' за даними: {data}")
+        log.debug("LOGGER (Wildcard): Зафіксована подія замовлення '%s' за даними: %s", event_name, data)
     else:
-        print(f"LOGGER (Wildcard): невідома подія '{event_name}'")
+        log.debug("LOGGER (Wildcard): невідома подія '%s'", event_name)
 
 
 def analytics(event_name: str, data: Any):
@@ -48,4 +52,4 @@ def analytics(event_name: str, data: Any):
     :type data: Any
     """
     if event_name in ["user.registered", "order.created"]:
-        print(f"ANALYTICS: Відправлено метрику '{event_name}' до системи аналітики.")
+        log.debug("ANALYTICS: Відправлено метрику '%s' до системи аналітики.", event_name)
@@ -1,7 +1,12 @@
+import sys
+
 from core.event_bus import EventBus
+from core.log_pipeline import LogPipeline
 from .listeners import *
 from queue import Queue
 
+log_pipeline = LogPipeline(level="DEBUG", stream=sys.stdout).start()
+
 event_queue = Queue()
 bus = EventBus(event_queue)
 
@@ -10,10 +15,13 @@ bus.subscribe("order.created", analytics)
 
 bus.subscribe("user.*", logger)
 bus.subscribe("user.*", analytics)
+# Фільтр за вмістом: лог фіксує лише замовлення від 100 (перевіряється до постановки в чергу)
+bus.subscribe("order.*", logger, where={"amount": {"gte": 100}})
 
 bus.emit("user.registered", {"user_id": 101, "username": "Alice"})
 bus.emit("user.deleted", {"user_id": 101, "reason": "Spam"})
 bus.emit("order.created", {"order_id": 500, "amount": 150.00})
+bus.emit("order.created", {"order_id": 501, "amount": 20.00})
 
 print("\n Історія всіх подій (history)")
 for entry in bus.history:
@@ -43,3 +51,5 @@ for event_name, callbacks in wildcard_subscriptions.items():
 # Додатковий вивід для підтвердження, якщо словник порожній
 if not bus.subscribers:
     print("Словник підписок порожній")
+
+log_pipeline.stop()
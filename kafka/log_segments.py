@@ -0,0 +1,636 @@
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".index"
+INDEX_INTERVAL_BYTES = 4096
+"""Щонайменше стільки байтів сегмента між сусідніми записами розрідженого індексу."""
+
+INDEX_ENTRY = struct.Struct("<qqd")
+"""Запис індексу: (логічний офсет, позиція в сегменті у байтах, час запису)."""
+
+IndexEntry = Tuple[int, int, float]
+
+_decode_json = json.JSONDecoder().decode
+"""Розбір JSON-рядка без накладних витрат `json.loads` (визначення кодування тощо) на кожен запис."""
+
+
+def segment_path(directory: str, base: int) -> str:
+    """Повертає шлях до сегмента партиції: `{directory}/{base:020d}.log`."""
+    return os.path.join(directory, f"{base:020d}{SEGMENT_SUFFIX}")
+
+
+def index_path(directory: str, base: int) -> str:
+    """Повертає шлях до розрідженого індексу сегмента: `{directory}/{base:020d}.index`."""
+    return os.path.join(directory, f"{base:020d}{INDEX_SUFFIX}")
+
+
+def list_segments(directory: str) -> List[int]:
+    """
+    Повертає відсортовані базові офсети сегментів партиції.
+
+    Базовий офсет сегмента — логічний офсет його першого запису (після ущільнення —
+    не більший за нього), тож офсет споживача однозначно визначає сегмент навіть
+    після видалення старих сегментів.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :rtype: List[int]
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in names
+                  if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+
+
+def stamp_record(line: str, offset: int, timestamp: float) -> str:
+    """
+    Додає до серіалізованого JSON-об'єкта (рядка запису) поля `__offset__` та `__timestamp__`
+    без повторної серіалізації.
+
+    :param line: Рядок JSON-об'єкта з символом нового рядка.
+    :type line: str
+    :param offset: Логічний офсет запису.
+    :type offset: int
+    :param timestamp: Час запису в журнал (unix-час).
+    :type timestamp: float
+    :rtype: str
+    """
+    prefix = f'{{"__offset__": {offset}, "__timestamp__": {timestamp!r}'
+    return prefix + ("}\n" if line == "{}\n" else ", " + line[1:])
+
+
+def _search(count: int, predicate: Callable[[int], bool]) -> int:
+    """
+    Внутрішній метод. Бінарний пошук: кількість початкових елементів послідовності,
+    для яких `predicate(номер)` істинний (предикат має бути монотонним).
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if predicate(middle):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def lookup_index(directory: str, base: int, target: float, column: int = 0) -> Optional[IndexEntry]:
+    """
+    Бінарний пошук в індексі сегмента (через `mmap`, без читання всього файлу).
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param base: Базовий офсет сегмента.
+    :type base: int
+    :param target: Шуканий офсет (column=0) або час (column=2).
+    :type target: float
+    :param column: Колонка пошуку: 0 — офсет, 2 — час запису.
+    :type column: int
+    :return: Останній запис індексу зі значенням колонки <= target (для часу — < target)
+             або None, якщо такого немає чи індекс порожній.
+    :rtype: Optional[IndexEntry]
+    """
+    try:
+        file = open(index_path(directory, base), "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        count = os.fstat(file.fileno()).st_size // INDEX_ENTRY.size
+        if not count:
+            return None
+        with mmap.mmap(file.fileno(), count * INDEX_ENTRY.size, access=mmap.ACCESS_READ) as view:
+            def precedes(number: int) -> bool:
+                value = INDEX_ENTRY.unpack_from(view, number * INDEX_ENTRY.size)[column]
+                # Для часу шукаємо останній запис, строго раніший за target.
+                return value <= target if column == 0 else value < target
+            found = _search(count, precedes)
+            if not found:
+                return None
+            return INDEX_ENTRY.unpack_from(view, (found - 1) * INDEX_ENTRY.size)
+
+
+def _iter_lines(file, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Внутрішній метод. Перебирає повні рядки файлу з позиції `start` разом з їхніми позиціями."""
+    file.seek(start)
+    position = start
+    for line in iter(file.readline, b""):
+        if not line.endswith(b"\n"):
+            break
+        yield position, line
+        position += len(line)
+
+
+def _seek_entry(file, entry: Optional[IndexEntry]) -> int:
+    """
+    Внутрішній метод. Повертає позицію, з якої слід сканувати сегмент. Якщо рядок за
+    позицією індексу не має очікуваного офсету (індекс і сегмент щойно замінено
+    ущільненням), сканування починається з початку сегмента.
+    """
+    if entry is None:
+        return 0
+    file.seek(entry[1])
+    try:
+        if json.loads(file.readline())["__offset__"] == entry[0]:
+            return entry[1]
+    except (ValueError, KeyError, TypeError):
+        pass
+    return 0
+
+
+class SegmentWriter:
+    """
+    Дописувач в активний (останній) сегмент партиції.
+
+    Присвоює записам послідовні логічні офсети та час запису, веде розріджений
+    індекс сегмента (запис щонайменше через `INDEX_INTERVAL_BYTES`) і переходить до
+    нового сегмента, коли поточний перевищив би `segment_bytes` або старший за
+    `segment_ms`. Тримає файли відкритими. Очікується один процес-записувач на партицію.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, segment_ms: Optional[float] = None):
+        """
+        :param directory: Каталог партиції.
+        :type directory: str
+        :param segment_bytes: Максимальний розмір сегмента в байтах.
+        :type segment_bytes: int
+        :param segment_ms: Максимальний вік активного сегмента (мс). None — без обмеження.
+        :type segment_ms: Optional[float]
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_ms = segment_ms
+        os.makedirs(directory, exist_ok=True)
+        segments = list_segments(directory)
+        base = segments[-1] if segments else 0
+        self._truncate_partial_tail(base)
+        self.next_offset = segment_end_offset(directory, base)
+        """Офсет наступного запису партиції."""
+        self._open(base)
+
+    def _truncate_partial_tail(self, base: int):
+        """
+        Внутрішній метод. Обрізає недописаний останній рядок сегмента (залишок аварійного
+        завершення), щоб наступний запис не злився з ним.
+        """
+        path = segment_path(self.directory, base)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as file:
+            last_entry = lookup_index(self.directory, base, float("inf"))
+            start = last_entry[1] if last_entry else 0
+            file.seek(start)
+            tail = file.read()
+            if tail and not tail.endswith(b"\n"):
+                file.truncate(start + tail.rfind(b"\n") + 1)
+                logger.warning("SEGMENT: Обрізано недописаний запис у кінці сегмента %d у '%s'", base, self.directory)
+
+    def _open(self, base: int):
+        """Внутрішній метод. Відкриває сегмент та його індекс на дозапис."""
+        self.base = base
+        self._file = open(segment_path(self.directory, base), "ab")
+        self._index = open(index_path(self.directory, base), "ab")
+        self.size = self._file.tell()
+        last_entry = lookup_index(self.directory, base, float("inf"))
+        self._indexed_at = last_entry[1] if last_entry else -INDEX_INTERVAL_BYTES
+        self.opened_at = time.monotonic()
+
+    def append(self, lines: List[str], fsync: bool = False) -> int:
+        """
+        Дописує записи (JSON-об'єкти з символом нового рядка) в активний сегмент,
+        за потреби перейшовши до нового.
+
+        :param lines: Серіалізовані записи.
+        :type lines: List[str]
+        :param fsync: Синхронізувати сегмент на диск після запису.
+        :type fsync: bool
+        :return: Офсет наступного запису партиції (кінець партиції) після запису.
+        :rtype: int
+        """
+        timestamp = time.time()
+        stamped = []
+        entries = []
+        position = self.size
+        for line in lines:
+            line = stamp_record(line, self.next_offset, timestamp).encode("utf-8")
+            if position - self._indexed_at >= INDEX_INTERVAL_BYTES:
+                entries.append(INDEX_ENTRY.pack(self.next_offset, position, timestamp))
+                self._indexed_at = position
+            stamped.append(line)
+            position += len(line)
+            self.next_offset += 1
+        data = b"".join(stamped)
+
+        if self.size and (self.size + len(data) > self.segment_bytes or
+                          self.segment_ms and time.monotonic() - self.opened_at > self.segment_ms / 1000):
+            self.next_offset -= len(lines)
+            self.close()
+            self._open(self.next_offset)
+            logger.debug("SEGMENT: Новий сегмент %s у '%s'", self.base, self.directory)
+            return self.append(lines, fsync)
+
+        self._file.write(data)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        # Індекс пишеться після даних, тож він ніколи не вказує за кінець сегмента.
+        self._index.write(b"".join(entries))
+        self._index.flush()
+        self.size += len(data)
+        return self.next_offset
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+
+def segment_end_offset(directory: str, base: int) -> int:
+    """
+    Повертає офсет, наступний за останнім повним записом сегмента. Сканується лише
+    хвіст сегмента після останнього запису індексу.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param base: Базовий офсет сегмента.
+    :type base: int
+    :rtype: int
+    """
+    end = base
+    try:
+        file = open(segment_path(directory, base), "rb")
+    except FileNotFoundError:
+        return end
+    with file:
+        start = _seek_entry(file, lookup_index(directory, base, float("inf")))
+        for _, line in _iter_lines(file, start):
+            try:
+                end = json.loads(line)["__offset__"] + 1
+            except (ValueError, KeyError, TypeError):
+                continue
+    return end
+
+
+def _segment_last_timestamp(directory: str, base: int) -> Optional[float]:
+    """
+    Внутрішній метод. Повертає час останнього повного запису сегмента (None, якщо
+    сегмент порожній або відсутній). Як і `segment_end_offset`, сканує лише хвіст
+    сегмента після останнього запису індексу.
+    """
+    timestamp = None
+    try:
+        file = open(segment_path(directory, base), "rb")
+    except FileNotFoundError:
+        return timestamp
+    with file:
+        start = _seek_entry(file, lookup_index(directory, base, float("inf")))
+        for _, line in _iter_lines(file, start):
+            try:
+                timestamp = json.loads(line)["__timestamp__"]
+            except (ValueError, KeyError, TypeError):
+                continue
+    return timestamp
+
+
+def end_offset(directory: str) -> int:
+    """
+    Повертає офсет кінця партиції (офсет наступного запису) за O(log n).
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :rtype: int
+    """
+    segments = list_segments(directory)
+    return segment_end_offset(directory, segments[-1]) if segments else 0
+
+
+def _mapped_lines(file, start: int) -> Iterator[Tuple[int, bytes]]:
+    """
+    Внутрішній метод. Перебирає повні рядки закритого сегмента через `mmap` з позиції
+    `start`. Активний сегмент так не читається: його недописаний хвіст може бути
+    обрізаний записувачем, а звернення до обрізаної сторінки відображення завершує процес.
+    """
+    size = os.fstat(file.fileno()).st_size
+    if size <= start:
+        return
+    with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as view:
+        position = start
+        while True:
+            newline = view.find(b"\n", position)
+            if newline < 0:
+                break
+            yield position, view[position:newline + 1]
+            position = newline + 1
+
+
+def iter_partition(directory: str, offset: int) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    Потоково перебирає повні записи партиції, починаючи з логічного офсета `offset`.
+    У пам'яті одночасно знаходиться лише поточний запис, тож наздоганяння великого
+    відставання не залежить від його розміру.
+
+    Сегмент обирається бінарним пошуком за базовими офсетами, позиція в ньому — за
+    розрідженим індексом, тож перед першим потрібним записом сканується не більше
+    `INDEX_INTERVAL_BYTES`. Закриті сегменти читаються через `mmap`, активний — буферизованим
+    двійковим читанням; рядки розбираються з байтів без перекодування. Якщо сегменти з
+    офсетом споживача вже видалені політикою зберігання, читання починається з
+    найстарішого доступного сегмента. Після ущільнення частини офсетів немає — читання
+    продовжується з наступного наявного. Недописаний останній рядок активного сегмента
+    не читається. Офсет наступного запису — `record["__offset__"] + 1`.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param offset: Офсет споживача (наступний запис для читання).
+    :type offset: int
+    :return: Генератор пар (запис, розмір запису в журналі у байтах).
+    :rtype: Iterator[Tuple[Dict[str, Any], int]]
+    """
+    segments = list_segments(directory)
+    if not segments:
+        return
+    if offset < segments[0]:
+        logger.warning("SEGMENT: Офсет %d у '%s' вже видалено, читаємо з %d", offset, directory, segments[0])
+        offset = segments[0]
+
+    first = bisect.bisect_right(segments, offset) - 1
+    for number in range(first, len(segments)):
+        base = segments[number]
+        try:
+            file = open(segment_path(directory, base), "rb")
+        except FileNotFoundError:
+            # Сегмент видалено або об'єднано під час читання; продовжимо з наступного читання.
+            return
+        with file:
+            start = _seek_entry(file, lookup_index(directory, base, offset))
+            sealed = number < len(segments) - 1
+            for _, line in (_mapped_lines if sealed else _iter_lines)(file, start):
+                try:
+                    record = _decode_json(line.decode("utf-8"))
+                    record_offset = record["__offset__"]
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("SEGMENT: Пропущено некоректний запис у сегменті %d: %r", base, line)
+                    continue
+                if record_offset < offset:
+                    continue
+                offset = record_offset + 1
+                yield record, len(line)
+
+
+def read_partition(directory: str, offset: int, max_records: Optional[int] = None,
+                   max_bytes: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Читає повні записи партиції, починаючи з логічного офсета `offset` (див. `iter_partition`),
+    до вичерпання лімітів. Перший запис повертається навіть тоді, коли він більший за
+    `max_bytes`, тож споживач не застрягає на великому записі.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param offset: Офсет споживача (наступний запис для читання).
+    :type offset: int
+    :param max_records: Найбільша кількість записів. Якщо None — без обмеження.
+    :type max_records: Optional[int]
+    :param max_bytes: Найбільший сумарний розмір записів у журналі. Якщо None — без обмеження.
+    :type max_bytes: Optional[int]
+    :return: Записи, новий офсет споживача та сумарний розмір записів у байтах.
+    :rtype: Tuple[List[Dict[str, Any]], int, int]
+    """
+    records: List[Dict[str, Any]] = []
+    total_bytes = 0
+    if max_records is not None and max_records <= 0:
+        return records, offset, total_bytes
+
+    for record, size in iter_partition(directory, offset):
+        if max_bytes is not None and records and total_bytes + size > max_bytes:
+            break
+        records.append(record)
+        total_bytes += size
+        offset = record["__offset__"] + 1
+        if max_records is not None and len(records) >= max_records:
+            break
+    return records, offset, total_bytes
+
+
+def offset_for_time(directory: str, timestamp: float) -> int:
+    """
+    Повертає офсет першого запису, записаного не раніше `timestamp`, або кінець
+    партиції, якщо таких немає. Час запису в межах партиції не спадає, тож пошук
+    виконується бінарно — спочатку по сегментах (за першим записом індексу), потім
+    по індексу сегмента.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param timestamp: Unix-час.
+    :type timestamp: float
+    :rtype: int
+    """
+    segments = list_segments(directory)
+    if not segments:
+        return 0
+
+    def first_timestamp(number: int) -> float:
+        entry = lookup_index(directory, segments[number], segments[number])
+        return entry[2] if entry else float("inf")
+
+    # Останній сегмент, перший запис якого строго раніший за timestamp (або перший сегмент).
+    number = max(_search(len(segments), lambda n: first_timestamp(n) < timestamp) - 1, 0)
+    for base in segments[number:]:
+        try:
+            file = open(segment_path(directory, base), "rb")
+        except FileNotFoundError:
+            continue
+        with file:
+            start = _seek_entry(file, lookup_index(directory, base, timestamp, column=2))
+            for _, line in _iter_lines(file, start):
+                try:
+                    record = json.loads(line)
+                    if record["__timestamp__"] >= timestamp:
+                        return record["__offset__"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return end_offset(directory)
+
+
+def delete_old_segments(directory: str, retention_bytes: Optional[int] = None,
+                        retention_ms: Optional[float] = None) -> int:
+    """
+    Видаляє найстаріші закриті сегменти партиції (разом з індексами), доки її розмір
+    перевищує `retention_bytes` або поки останній запис сегмента старший за `retention_ms`.
+    Вік визначається за `__timestamp__` останнього запису, а не за `mtime` файлу, який
+    оновлюється під час ущільнення. Видаляються лише цілі файли; активний сегмент не
+    видаляється ніколи.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param retention_bytes: Максимальний розмір партиції (байти). None — без обмеження.
+    :type retention_bytes: Optional[int]
+    :param retention_ms: Максимальний вік записів (мс). None — без обмеження.
+    :type retention_ms: Optional[float]
+    :return: Кількість видалених сегментів.
+    :rtype: int
+    """
+    segments = list_segments(directory)
+    stats = {}
+    for base in segments:
+        try:
+            stats[base] = os.stat(segment_path(directory, base))
+        except FileNotFoundError:
+            pass
+    total = sum(stat.st_size for stat in stats.values())
+    now = time.time()
+
+    deleted = 0
+    for base in segments[:-1]:
+        stat = stats.get(base)
+        if stat is None:
+            continue
+        over_size = retention_bytes is not None and total > retention_bytes
+        expired = False
+        if retention_ms is not None and not over_size:
+            last_timestamp = _segment_last_timestamp(directory, base)
+            if last_timestamp is None:
+                last_timestamp = stat.st_mtime
+            expired = now - last_timestamp > retention_ms / 1000
+        if not (over_size or expired):
+            break
+        _remove_segment(directory, base)
+        total -= stat.st_size
+        deleted += 1
+    if deleted:
+        logger.info("SEGMENT: Видалено %d старих сегментів у '%s'", deleted, directory)
+    return deleted
+
+
+def _remove_segment(directory: str, base: int):
+    """Внутрішній метод. Видаляє сегмент і його індекс."""
+    os.unlink(segment_path(directory, base))
+    try:
+        os.unlink(index_path(directory, base))
+    except FileNotFoundError:
+        pass
+
+
+def _scan_segment(directory: str, base: int) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+    """Внутрішній метод. Перебирає повні записи сегмента разом з їхніми рядками."""
+    with open(segment_path(directory, base), "rb") as file:
+        for _, line in _iter_lines(file):
+            try:
+                yield json.loads(line), line
+            except ValueError:
+                continue
+
+
+def compact_segments(directory: str, segment_bytes: int) -> int:
+    """
+    Ущільнює закриті сегменти партиції: для кожного ключа (`__key__`) залишається лише
+    останній запис (з урахуванням активного сегмента), записи без ключа зберігаються.
+
+    Записи зберігають свої офсети, тож офсети споживачів залишаються дійсними. Сусідні
+    ущільнені сегменти об'єднуються (до `segment_bytes`), щоб кількість файлів не
+    росла. Новий вміст та індекс записуються у тимчасові файли і атомарно замінюють
+    перший сегмент групи, після чого решта сегментів групи видаляються; активний
+    сегмент не змінюється, тож виробники та споживачі можуть працювати одночасно.
+
+    :param directory: Каталог партиції.
+    :type directory: str
+    :param segment_bytes: Цільовий максимальний розмір ущільненого сегмента.
+    :type segment_bytes: int
+    :return: Кількість видалених записів.
+    :rtype: int
+    """
+    segments = list_segments(directory)
+    if len(segments) < 2:
+        return 0
+
+    latest: Dict[str, int] = {}
+    for base in segments:
+        for record, _ in _scan_segment(directory, base):
+            if record.get("__key__") is not None:
+                latest[json.dumps(record["__key__"])] = record["__offset__"]
+
+    dropped = 0
+    group: List[int] = []
+    group_records: List[Tuple[Dict[str, Any], bytes]] = []
+    group_size = 0
+    group_dirty = False
+    for base in segments[:-1]:
+        kept = []
+        dirty = False
+        for record, line in _scan_segment(directory, base):
+            key = record.get("__key__")
+            if key is not None and latest.get(json.dumps(key)) != record["__offset__"]:
+                dropped += 1
+                dirty = True
+                continue
+            kept.append((record, line))
+        size = sum(len(line) for _, line in kept)
+
+        if group and group_size + size > segment_bytes:
+            _replace_group(directory, group, group_records, group_dirty)
+            group, group_records, group_size, group_dirty = [], [], 0, False
+        group.append(base)
+        group_records.extend(kept)
+        group_size += size
+        group_dirty = group_dirty or dirty
+    if group:
+        _replace_group(directory, group, group_records, group_dirty)
+
+    if dropped:
+        logger.info("SEGMENT: Ущільнення '%s' видалило %d застарілих записів", directory, dropped)
+    return dropped
+
+
+def _replace_group(directory: str, group: List[int], records: List[Tuple[Dict[str, Any], bytes]], dirty: bool):
+    """Внутрішній метод. Записує ущільнену групу сегментів (з новим індексом) на місце першого з них."""
+    if len(group) == 1 and not dirty:
+        return
+    entries = []
+    position, indexed_at = 0, -INDEX_INTERVAL_BYTES
+    for record, line in records:
+        if position - indexed_at >= INDEX_INTERVAL_BYTES:
+            entries.append(INDEX_ENTRY.pack(record["__offset__"], position, record.get("__timestamp__", 0.0)))
+            indexed_at = position
+        position += len(line)
+
+    base = group[0]
+    with open(segment_path(directory, base) + ".cleaning", "wb") as file:
+        file.write(b"".join(line for _, line in records))
+    with open(index_path(directory, base) + ".cleaning", "wb") as file:
+        file.write(b"".join(entries))
+    os.replace(segment_path(directory, base) + ".cleaning", segment_path(directory, base))
+    os.replace(index_path(directory, base) + ".cleaning", index_path(directory, base))
+    for base in group[1:]:
+        _remove_segment(directory, base)
+
+
+class CleanerLock:
+    """
+    Неблокуючий `flock` каталогу партиції: лише один процес очищує партицію одночасно.
+    Використовується як контекстний менеджер; атрибут `acquired` показує, чи взято блокування.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, ".cleaner.lock")
+        self.acquired = False
+        self._fd = -1
+
+    def __enter__(self) -> "CleanerLock":
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.acquired = True
+        except BlockingIOError:
+            self.acquired = False
+        return self
+
+    def __exit__(self, *exc_info):
+        os.close(self._fd)
@@ -1,40 +1,378 @@
+import fcntl
+import itertools
 import json
+import logging
 import os
 import collections
-from typing import Dict, Any, List
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Hashable, Iterator, List, Optional, Set, Tuple
+
+from log_segments import (CleanerLock, SegmentWriter, compact_segments, delete_old_segments, end_offset,
+                          iter_partition, offset_for_time, read_partition)
+from log_watch import LogWatcher, create_watcher
+
+logger = logging.getLogger(__name__)
 
 LOG_DIR = "kafka_logs"
 OFFSET_DIR = "kafka_offsets"
+FSYNC_POLICIES = ("never", "batch")
+CLEANUP_POLICIES = ("delete", "compact", "compact,delete")
+COMMIT_POLICIES = ("interval", "records", "manual")
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+REBALANCE_INTERVAL = 1.0
+"""Як часто (у секундах) споживач перевіряє склад своєї групи під час `poll`."""
+MAX_POLL_RECORDS = 500
+"""Типова найбільша кількість записів, що повертає один `FileConsumer.poll`."""
+MAX_POLL_BYTES = 50 * 1024 * 1024
+"""Типовий найбільший сумарний розмір записів (у байтах журналу) одного `FileConsumer.poll`."""
+
+TopicPartition = Tuple[str, int]
+"""Пара (топік, номер партиції)."""
 
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(OFFSET_DIR, exist_ok=True)
 
 
+def create_topic(topic: str, partitions: int = 1, segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 segment_ms: Optional[float] = None, retention_bytes: Optional[int] = None,
+                 retention_ms: Optional[float] = None, cleanup_policy: str = "delete"):
+    """
+    Створює (або змінює) топік. Конфігурація зберігається у файлі `kafka_logs/{topic}.json`.
+
+    Кожна партиція — це каталог `kafka_logs/{topic}-{partition}/` із сегментами
+    фіксованого розміру. Старі сегменти видаляються цілими файлами (політика 'delete')
+    або ущільнюються до останнього запису за ключем (політика 'compact'); очищення
+    виконує `clean_topic` / `LogCleaner`.
+
+    Зменшувати кількість партицій не можна. Збільшення змінює партицію для
+    частини ключів, тож порядок за ключем гарантується лише в межах однієї конфігурації.
+
+    :param topic: Назва топіка.
+    :type topic: str
+    :param partitions: Кількість партицій.
+    :type partitions: int
+    :param segment_bytes: Розмір сегмента, після якого виробник переходить до нового.
+    :type segment_bytes: int
+    :param segment_ms: Максимальний вік активного сегмента (мс). None — без обмеження.
+    :type segment_ms: Optional[float]
+    :param retention_bytes: Максимальний розмір однієї партиції (політика 'delete').
+    :type retention_bytes: Optional[int]
+    :param retention_ms: Максимальний вік сегментів (мс, політика 'delete').
+    :type retention_ms: Optional[float]
+    :param cleanup_policy: 'delete', 'compact' або 'compact,delete'.
+    :type cleanup_policy: str
+    :raises ValueError: Якщо кількість партицій менша за 1 або за поточну, чи політика невідома.
+    """
+    current = topic_partitions(topic)
+    if partitions < 1 or (os.path.exists(_topic_config_path(topic)) and partitions < current):
+        raise ValueError(f"Топік '{topic}' має {current} партицій; зменшення до {partitions} неможливе")
+    if cleanup_policy not in CLEANUP_POLICIES:
+        raise ValueError(f"Невідома політика очищення: '{cleanup_policy}'")
+    config = {"partitions": partitions, "segment_bytes": segment_bytes, "segment_ms": segment_ms,
+              "retention_bytes": retention_bytes, "retention_ms": retention_ms, "cleanup_policy": cleanup_policy}
+    with open(_topic_config_path(topic), "w", encoding="utf-8") as file:
+        json.dump(config, file)
+
+
+def _topic_config_path(topic: str) -> str:
+    return os.path.join(LOG_DIR, f"{topic}.json")
+
+
+def topic_config(topic: str) -> Dict[str, Any]:
+    """
+    Повертає конфігурацію топіка. Топік без конфігурації має одну партицію,
+    сегменти `DEFAULT_SEGMENT_BYTES` і не очищується.
+
+    :param topic: Назва топіка.
+    :type topic: str
+    :rtype: Dict[str, Any]
+    """
+    config = {"partitions": 1, "segment_bytes": DEFAULT_SEGMENT_BYTES, "segment_ms": None,
+              "retention_bytes": None, "retention_ms": None, "cleanup_policy": "delete"}
+    try:
+        with open(_topic_config_path(topic), "r", encoding="utf-8") as file:
+            config.update(json.load(file))
+    except (FileNotFoundError, ValueError):
+        pass
+    return config
+
+
+def topic_partitions(topic: str) -> int:
+    """
+    Повертає кількість партицій топіка.
+
+    :param topic: Назва топіка.
+    :type topic: str
+    :rtype: int
+    """
+    return topic_config(topic)["partitions"]
+
+
+def partition_dir(topic: str, partition: int) -> str:
+    """Повертає каталог сегментів партиції: `kafka_logs/{topic}-{partition}/`."""
+    return os.path.join(LOG_DIR, f"{topic}-{partition}")
+
+
+def clean_topic(topic: str) -> Tuple[int, int]:
+    """
+    Застосовує до всіх партицій топіка його політику очищення: ущільнення за ключем
+    та/або видалення старих сегментів за розміром і віком. Партиція, яку вже очищує
+    інший процес, пропускається.
+
+    :param topic: Назва топіка.
+    :type topic: str
+    :return: (кількість видалених сегментів, кількість видалених ущільненням записів).
+    :rtype: Tuple[int, int]
+    """
+    config = topic_config(topic)
+    policy = config["cleanup_policy"].split(",")
+    deleted_segments = dropped_records = 0
+    for partition in range(config["partitions"]):
+        directory = partition_dir(topic, partition)
+        if not os.path.isdir(directory):
+            continue
+        with CleanerLock(directory) as lock:
+            if not lock.acquired:
+                continue
+            if "compact" in policy:
+                dropped_records += compact_segments(directory, config["segment_bytes"])
+            if "delete" in policy:
+                deleted_segments += delete_old_segments(directory, config["retention_bytes"], config["retention_ms"])
+    return deleted_segments, dropped_records
+
+
+class LogCleaner(threading.Thread):
+    """
+    Фоновий потік, що періодично очищує всі топіки з `kafka_logs` (`clean_topic`),
+    тож диск та час холодного старту залишаються обмеженими на довгоживучому брокері.
+    """
+
+    def __init__(self, interval: float = 30.0):
+        """
+        :param interval: Інтервал між проходами очищення (секунди).
+        :type interval: float
+        """
+        super().__init__(name="log-cleaner", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for filename in os.listdir(LOG_DIR):
+                if not filename.endswith(".json"):
+                    continue
+                try:
+                    clean_topic(filename[:-len(".json")])
+                except Exception as ex:
+                    logger.error("CLEANER ERROR: Не вдалося очистити топік %s: %s", filename, ex)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def partition_for_key(key: Hashable, partitions: int) -> int:
+    """
+    Стабільний партиціонер: однаковий ключ потрапляє в ту саму партицію в будь-якому
+    процесі (на відміну від вбудованого `hash`, що рандомізується для рядків).
+
+    :param key: Ключ повідомлення (наприклад, ID замовлення).
+    :type key: Hashable
+    :param partitions: Кількість партицій топіка.
+    :type partitions: int
+    :rtype: int
+    """
+    return zlib.crc32(str(key).encode("utf-8")) % partitions
+
+
+class _Batch:
+    """Накопичувальний пакет повідомлень однієї партиції топіка."""
+
+    __slots__ = ("lines", "size", "created", "future")
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.size = 0
+        self.created = time.monotonic()
+        self.future: Future = Future()
+
+
 class FileProducer:
     """
     Імітує виробника Kafka. Відправляє повідомлення до топіка,
     записуючи їх у відповідний лог-файл у директорії 'kafka_logs'.
+
+    Топік складається з партицій (`create_topic`); партиція обирається за ключем
+    повідомлення (`partition_for_key`), тож повідомлення з однаковим ключем
+    зберігають порядок. Повідомлення без ключа розподіляються по колу.
+
+    Як і в Kafka, повідомлення накопичуються в пакети по партиціях: пакет
+    записується у файл, коли його розмір досягає `batch_size` байтів або коли
+    він чекає довше за `linger_ms`. Запис виконує фоновий потік, файли партицій
+    залишаються відкритими, тож `send` лише серіалізує повідомлення та додає
+    його до пакета.
+
+    Після роботи викличте `flush()` (дочекатися запису) або `close()`: повідомлення
+    з незаписаних пакетів втрачаються при завершенні процесу.
     """
 
-    def send(self, topic: str, message: Dict[str, Any]):
+    def __init__(self, linger_ms: float = 5, batch_size: int = 16384, fsync_policy: str = "never"):
         """
-        Відправляє повідомлення до топіка, записуючи його як рядок JSON у файл {topic}.log.
+        :param linger_ms: Максимальний час (мс), який пакет чекає на інші повідомлення перед записом.
+        :type linger_ms: float
+        :param batch_size: Розмір пакета (у байтах), після якого він записується негайно.
+        :type batch_size: int
+        :param fsync_policy: Коли ф'ючерси `send` вважаються виконаними: 'never' — після запису
+                             пакета у файл (дані переживають падіння процесу), 'batch' — після
+                             `fsync` кожного пакета (дані переживають збій ОС чи живлення).
+        :type fsync_policy: str
+        :raises ValueError: Якщо `fsync_policy` невідома.
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Невідома політика fsync: '{fsync_policy}'")
+        self.linger = linger_ms / 1000
+        self.batch_size = batch_size
+        self.fsync_policy = fsync_policy
+        self._batches: Dict[TopicPartition, _Batch] = {}
+        """Відкриті пакети: {(topic, partition): _Batch}."""
+        self._ready: List[Tuple[TopicPartition, _Batch]] = []
+        """Заповнені пакети, що чекають на запис."""
+        self._in_flight: List[Future] = []
+        """Ф'ючерси пакетів, які фоновий потік уже забрав і зараз записує."""
+        self._writers: Dict[TopicPartition, SegmentWriter] = {}
+        """Дописувачі в активні сегменти партицій."""
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        """Кеш конфігурацій топіків."""
+        self._round_robin: Dict[str, itertools.count] = collections.defaultdict(itertools.count)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name="file-producer-flusher", daemon=True)
+        self._flusher.start()
+
+    def send(self, topic: str, message: Dict[str, Any], key: Optional[Hashable] = None) -> Future:
+        """
+        Відправляє повідомлення до топіка, додаючи його як рядок JSON до пакета
+        партиції. Ключ зберігається в записі як поле `__key__` (для ущільнення).
 
         :param topic: Назва топіка, до якого потрібно відправити повідомлення.
         :type topic: str
         :param message: Повідомлення для відправки (має бути серіалізовано в JSON).
         :type message: Dict[str, Any]
+        :param key: Ключ партиціонування (наприклад, ID замовлення). Повідомлення з однаковим
+                    ключем потрапляють в одну партицію і читаються в порядку відправки.
+        :type key: Optional[Hashable]
+        :return: Ф'ючерс пакета (спільний для всіх його повідомлень). Результат — офсет кінця
+                 партиції (наступного запису) після запису пакета; при помилці запису — виняток.
+        :rtype: Future
+        :raises RuntimeError: Якщо виробника закрито.
+        """
+        log_entry = json.dumps(message if key is None else dict(message, __key__=key)) + "\n"
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("FileProducer закрито")
+            config = self._configs.get(topic)
+            if config is None:
+                config = self._configs[topic] = topic_config(topic)
+            partitions = config["partitions"]
+            if key is None:
+                partition = next(self._round_robin[topic]) % partitions
+            else:
+                partition = partition_for_key(key, partitions)
+
+            topic_partition = (topic, partition)
+            batch = self._batches.get(topic_partition)
+            if batch is None:
+                batch = self._batches[topic_partition] = _Batch()
+                self._condition.notify()
+            batch.lines.append(log_entry)
+            batch.size += len(log_entry)
+            if batch.size >= self.batch_size:
+                del self._batches[topic_partition]
+                self._ready.append((topic_partition, batch))
+                self._condition.notify()
+
+        logger.debug("PRODUCER: надіслано до '%s' (партиція %d). Повідомлення: %s", topic, partition, message)
+        return batch.future
+
+    def _run(self):
+        """Основний цикл фонового потоку: записує заповнені пакети та пакети, час очікування яких минув."""
+        while True:
+            with self._condition:
+                while True:
+                    ready = self._take_ready()
+                    self._in_flight = [batch.future for _, batch in ready]
+                    if ready or self._closed:
+                        break
+                    deadline = min((batch.created for batch in self._batches.values()), default=None)
+                    self._condition.wait(None if deadline is None else deadline + self.linger - time.monotonic())
+
+            for topic_partition, batch in ready:
+                self._write_batch(topic_partition, batch)
+
+            if self._closed and not ready:
+                break
+
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def _take_ready(self) -> List[Tuple[TopicPartition, _Batch]]:
+        """
+        Внутрішній метод (під локом). Забирає заповнені пакети та пакети, що чекають
+        довше за `linger_ms` (або всі пакети, якщо виробник закривається).
+        """
+        ready, self._ready = self._ready, []
+        expired_before = time.monotonic() - self.linger
+        for topic_partition, batch in list(self._batches.items()):
+            if self._closed or batch.created <= expired_before:
+                del self._batches[topic_partition]
+                ready.append((topic_partition, batch))
+        return ready
+
+    def _write_batch(self, topic_partition: TopicPartition, batch: _Batch):
+        """
+        Внутрішній метод. Записує пакет одним `write` в активний сегмент партиції та
+        завершує ф'ючерс пакета відповідно до політики fsync.
         """
-        log_file_path = os.path.join(LOG_DIR, f"{topic}.log")
-
-        log_entry = json.dumps(message) + "\n"
-
         try:
-            with open(log_file_path, "a", encoding='utf-8') as file:
-                file.write(log_entry)
-            print(f"PRODUCER: надіслано до '{topic}'. Повідомлення: {message}")
+            writer = self._writers.get(topic_partition)
+            if writer is None:
+                config = self._configs[topic_partition[0]]
+                writer = self._writers[topic_partition] = SegmentWriter(
+                    partition_dir(*topic_partition), config["segment_bytes"], config["segment_ms"])
+            end = writer.append(batch.lines, fsync=self.fsync_policy == "batch")
+            batch.future.set_result(end)
         except Exception as ex:
-            print(f"PRODUCER ERROR: Не вдалося звписати у файл {log_file_path}: {ex}")
+            logger.error("PRODUCER ERROR: Не вдалося записати пакет з %d повідомлень у партицію %s-%d: %s",
+                         len(batch.lines), *topic_partition, ex)
+            batch.future.set_exception(ex)
+
+    def flush(self):
+        """
+        Записує всі накопичені пакети та блокує викликача, доки запис не завершиться,
+        включно з пакетами, які фоновий потік записує в цей момент.
+        """
+        with self._condition:
+            futures = list(self._in_flight)
+            futures.extend(batch.future for _, batch in self._ready)
+            for topic_partition, batch in self._batches.items():
+                self._ready.append((topic_partition, batch))
+                futures.append(batch.future)
+            self._batches.clear()
+            self._condition.notify()
+        wait(futures)
+
+    def close(self):
+        """Записує залишок пакетів, зупиняє фоновий потік і закриває сегменти партицій."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
 
 
 class FileConsumer:
@@ -42,128 +380,482 @@ class FileConsumer:
     Імітує споживача Kafka. Читає події з лог-файлів, використовуючи офсети,
     зберігаючи їх у директорії 'kafka_offsets' для забезпечення 'at least once'
     семантики.
+
+    Кожен споживач є учасником своєї групи (`group_id`). Партиції підписаних
+    топіків розподіляються між живими учасниками групи без перетину (партиція `p`
+    дістається учаснику з номером `p % кількість_учасників` у відсортованому списку),
+    тож групу можна масштабувати запуском додаткових процесів, а порядок у межах
+    ключа зберігається. Учасник тримає `flock` на своєму файлі в
+    `kafka_offsets/{group_id}.members/`: блокування знімається ОС, щойно процес
+    завершується, тож решта учасників помічає вихід (або приєднання) і
+    перебалансовує партиції під час наступного `poll`. Офсети зберігаються для
+    кожної партиції окремо і спільні для групи, тож новий власник партиції
+    продовжує з позиції попереднього. Під час перебалансування кілька подій можуть
+    бути прочитані повторно.
+
+    Як і в Kafka, позиція читання (`offsets`) живе в пам'яті, а фіксація офсетів у
+    файли виконується за політикою `commit_policy`: 'interval' — не частіше ніж раз
+    на `auto_commit_interval_ms`, 'records' — щойно оброблено `commit_every` записів,
+    'manual' — лише явними `commit()` / `commit_async()`. Автоматична фіксація
+    виконується на початку наступного `poll` (або під час запиту наступного запису з
+    `iter_records`), тобто лише для вже оброблених записів (at-least-once); після
+    аварії повторно прочитаються записи з моменту останньої фіксації. Позиції
+    партицій, що переходять іншому учаснику, та всі позиції під час `close()`
+    фіксуються (крім політики 'manual').
     """
 
-    def __init__(self, group_id: str):
+    def __init__(self, group_id: str, commit_policy: str = "interval", auto_commit_interval_ms: float = 5000,
+                 commit_every: int = 1000):
         """
-        Ініціалізує споживача. Завантажує останній збережений офсет для
-        кожного топіка.
+        Ініціалізує споживача та реєструє його як учасника групи.
 
         :param group_id: Унікальний ідентифікатор групи споживачів (Consumer Group ID).
                          Використовується для ізоляції офсетів між різними групами.
         :type group_id: str
+        :param commit_policy: Політика фіксації офсетів: 'interval', 'records' або 'manual'.
+        :type commit_policy: str
+        :param auto_commit_interval_ms: Інтервал автоматичної фіксації для політики 'interval'.
+        :type auto_commit_interval_ms: float
+        :param commit_every: Кількість оброблених записів між фіксаціями для політики 'records'.
+        :type commit_every: int
+        :raises ValueError: Якщо `commit_policy` невідома.
         """
+        if commit_policy not in COMMIT_POLICIES:
+            raise ValueError(f"Невідома політика фіксації офсетів: '{commit_policy}'")
+        self.commit_policy = commit_policy
+        self.auto_commit_interval = auto_commit_interval_ms / 1000
+        self.commit_every = commit_every
+
         self.group_id = group_id
         """ Ідентифікатор групи споживачів. """
 
-        self.offsets: Dict[str, int] = collections.defaultdict(int)
-        """ Словник для зберігання поточних офсетів: {topic_name: byte_offset}. """
+        self.member_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        """ Ідентифікатор учасника групи. """
+
+        self.topics: List[str] = []
+        """ Підписані топіки. """
+
+        self.assignment: Set[TopicPartition] = set()
+        """ Партиції, призначені цьому учаснику. """
 
-        self._load_offsets()
-        """ Завантажує офсети з файлів при ініціалізації. """
+        self.offsets: Dict[TopicPartition, int] = {}
+        """ Поточні позиції читання: {(topic, partition): офсет наступного запису}. """
 
-    def _get_offset_file_path(self, topic: str) -> str:
+        self.committed: Dict[TopicPartition, int] = {}
+        """ Останні зафіксовані (збережені у файли) офсети призначених партицій. """
+
+        self._uncommitted_records = 0
+        self._last_commit = time.monotonic()
+        self._committer: Optional[ThreadPoolExecutor] = None
+        self._watcher: Optional[LogWatcher] = None
+
+        self._members: List[str] = []
+        self._poll_start = -1
+        self._last_rebalance = 0.0
+        self._members_mtime = 0
+        self._members_dir = os.path.join(OFFSET_DIR, f"{group_id}.members")
+        self._member_fd = self._join_group()
+
+    def _join_group(self) -> int:
+        """
+        Внутрішній метод. Створює файл учасника та бере на нього ексклюзивний `flock`.
+        Файл створюється під тимчасовою назвою і перейменовується вже заблокованим,
+        щоб інші учасники не прийняли його за файл завершеного процесу.
+        """
+        os.makedirs(self._members_dir, exist_ok=True)
+        tmp_path = os.path.join(self._members_dir, f"{self.member_id}.joining")
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(tmp_path, os.path.join(self._members_dir, f"{self.member_id}.member"))
+        return fd
+
+    def _alive_members(self) -> List[str]:
+        """
+        Внутрішній метод. Повертає відсортований список живих учасників групи.
+        Файли учасників, блокування яких вдалося взяти (процес завершився), видаляються.
+        """
+        members = []
+        for filename in os.listdir(self._members_dir):
+            if not filename.endswith(".member"):
+                continue
+            member_id = filename[:-len(".member")]
+            if member_id == self.member_id:
+                members.append(member_id)
+                continue
+
+            path = os.path.join(self._members_dir, filename)
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                members.append(member_id)
+            else:
+                logger.info("CONSUMER %s: Учасник %s покинув групу", self.group_id, member_id)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # Файл уже видалив інший учасник, що одночасно перевіряв склад групи.
+                    pass
+            finally:
+                os.close(fd)
+        return sorted(members)
+
+    def _rebalance(self, force: bool = False):
+        """
+        Внутрішній метод. Перевіряє склад групи і перераховує призначення партицій.
+        Приєднання та коректний вихід учасників змінюють каталог учасників і помічаються
+        одразу (за `mtime` каталогу); завершені процеси — не пізніше ніж за `REBALANCE_INTERVAL`.
+        Кожен учасник обчислює однакове призначення самостійно, тож координатор не потрібен.
         """
-        Внутрішній метод для формування шляху до файлу офсетів для конкретного топіка.
-        Формат: {group_id}_{topic}.offsets
+        now = time.monotonic()
+        members_mtime = os.stat(self._members_dir).st_mtime_ns
+        if not force and members_mtime == self._members_mtime and now - self._last_rebalance < REBALANCE_INTERVAL:
+            return
+        self._last_rebalance = now
+        self._members_mtime = members_mtime
+
+        members = self._alive_members()
+        index = members.index(self.member_id)
+        assignment = {(topic, partition) for topic in self.topics for partition in range(topic_partitions(topic))
+                      if partition % len(members) == index}
+        if members == self._members and assignment == self.assignment:
+            return
+
+        revoked = self.assignment - assignment
+        if revoked and self.commit_policy != "manual":
+            self.commit({topic_partition: self.offsets[topic_partition] for topic_partition in revoked})
+        for topic_partition in revoked:
+            self.offsets.pop(topic_partition, None)
+            self.committed.pop(topic_partition, None)
+        for topic_partition in assignment - self.assignment:
+            self.offsets[topic_partition] = self.committed[topic_partition] = self._read_offset(topic_partition)
+        self._members = members
+        self.assignment = assignment
+        logger.info("CONSUMER %s: Учасників у групі: %d. Призначено партиції: %s", self.group_id, len(members),
+                    sorted(f"{topic}-{partition}" for topic, partition in assignment))
+
+    def _get_offset_file_path(self, topic_partition: TopicPartition) -> str:
         """
-        return os.path.join(OFFSET_DIR, f"{self.group_id}_{topic}.offsets")
+        Внутрішній метод для формування шляху до файлу офсетів для конкретної партиції.
+        Формат: {group_id}_{topic}-{partition}.offsets
+        """
+        topic, partition = topic_partition
+        return os.path.join(OFFSET_DIR, f"{self.group_id}_{topic}-{partition}.offsets")
 
-    def _load_offsets(self):
+    def _read_offset(self, topic_partition: TopicPartition) -> int:
         """
-        Внутрішній метод. Завантажує офсети для цієї групи споживачів з директорії 'kafka_offsets'.
+        Внутрішній метод. Читає збережений офсет групи для партиції.
         Якщо файл не знайдено або він пошкоджений, офсет встановлюється на 0.
         """
-        for filename in os.listdir(OFFSET_DIR):
-            if filename.startswith(f"{self.group_id}_") and filename.endswith(".offset"):
-                topic = filename.replace(f"{self.group_id}_", "").replace(".offset", "")
-                path = os.path.join(OFFSET_DIR, filename)
-                try:
-                    with open(path, 'r', encoding='utf-8') as file:
-                        self.offsets[topic] = int(file.read().strip())
-                except (FileNotFoundError, ValueError, IndexError):
-                    self.offsets[topic] = 0
+        try:
+            with open(self._get_offset_file_path(topic_partition), 'r', encoding='utf-8') as file:
+                return int(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
 
-    def _save_offset(self, topic: str, new_offset: int):
+    def _write_offset(self, topic_partition: TopicPartition, offset: int):
         """
-        Внутрішній метод. Зберігає новий офсет для топіка у файл.
+        Внутрішній метод. Атомарно записує офсет партиції у файл: через тимчасовий файл
+        і `os.replace`, тож після аварії файл містить або старий, або новий офсет.
 
-        :param topic: Топік.
-        :type topic: str
-        :param new_offset: Новий офсет (позиція в байтах), з якого слід почати читання наступного разу.
-        :type new_offset: int
+        :param topic_partition: Топік і партиція.
+        :type topic_partition: TopicPartition
+        :param offset: Офсет (логічний номер запису), з якого слід почати читання наступного разу.
+        :type offset: int
+        """
+        path = self._get_offset_file_path(topic_partition)
+        tmp_path = f"{path}.{self.member_id}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(str(offset))
+        os.replace(tmp_path, path)
+
+    def _commit_offsets(self, offsets: Dict[TopicPartition, int]) -> Dict[TopicPartition, int]:
+        """Внутрішній метод (у потоці фіксації). Записує змінені офсети та повертає записані."""
+        written = {}
+        for topic_partition, offset in offsets.items():
+            if self.committed.get(topic_partition) == offset:
+                continue
+            self._write_offset(topic_partition, offset)
+            self.committed[topic_partition] = offset
+            written[topic_partition] = offset
+        if written:
+            logger.debug("CONSUMER %s: Зафіксовано офсети %s", self.group_id, written)
+        return written
+
+    def commit_async(self, offsets: Optional[Dict[TopicPartition, int]] = None) -> Future:
+        """
+        Фіксує офсети у фоновому потоці, не блокуючи обробку. Фіксації (зокрема
+        синхронні) виконуються строго в порядку викликів, тож старіший знімок
+        офсетів не перезапише новіший.
+
+        :param offsets: Офсети для фіксації. Якщо None — поточні позиції всіх призначених партицій.
+        :type offsets: Optional[Dict[TopicPartition, int]]
+        :return: Ф'ючерс, результат якого — фактично записані (змінені) офсети.
+        :rtype: Future
+        """
+        if offsets is None:
+            offsets = dict(self.offsets)
+            self._uncommitted_records = 0
+            self._last_commit = time.monotonic()
+        if self._committer is None:
+            self._committer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-consumer-commit")
+        return self._committer.submit(self._commit_offsets, offsets)
+
+    def commit(self, offsets: Optional[Dict[TopicPartition, int]] = None) -> Dict[TopicPartition, int]:
         """
-        path = self._get_offset_file_path(topic)
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(str(new_offset))
-        self.offsets[topic] = new_offset
+        Синхронно фіксує офсети (див. `commit_async`).
+
+        :param offsets: Офсети для фіксації. Якщо None — поточні позиції всіх призначених партицій.
+        :type offsets: Optional[Dict[TopicPartition, int]]
+        :return: Фактично записані (змінені) офсети.
+        :rtype: Dict[TopicPartition, int]
+        """
+        return self.commit_async(offsets).result()
+
+    def _maybe_commit(self):
+        """Внутрішній метод. Фіксує позиції, якщо цього вимагає політика фіксації."""
+        if self.commit_policy == "interval":
+            due = time.monotonic() - self._last_commit >= self.auto_commit_interval
+        elif self.commit_policy == "records":
+            due = self._uncommitted_records >= self.commit_every
+        else:
+            due = False
+        if due and self.offsets != self.committed:
+            self.commit_async()
 
     def subscribe(self, topic: str):
         """
-        Підписує споживача на топік, ініціалізуючи його офсет, якщо це необхідно.
+        Підписує споживача на топік і перераховує призначення партицій.
 
         :param topic: Назва топіка для підписки.
         :type topic: str
         """
-        if topic not in self.offsets:
-            self.offsets[topic] = 0
+        if topic not in self.topics:
+            self.topics.append(topic)
+        self._rebalance(force=True)
 
-        print(f"CONSUMER {self.group_id}: Підписано на '{topic}'. Початковий офсет: {self.offsets[topic]}")
+        logger.info("CONSUMER %s: Підписано на '%s'. Початкові офсети: %s", self.group_id, topic,
+                    {partition: offset for (name, partition), offset in sorted(self.offsets.items()) if name == topic})
 
-    def poll(self, topics: List[str] = None) -> List[Dict[str, Any]]:
+    def close(self):
+        """
+        Фіксує позиції (крім політики 'manual'), дочікується фонових фіксацій і покидає
+        групу: видаляє файл учасника та знімає блокування, тож його партиції перейдуть іншим.
+        """
+        if self.commit_policy != "manual":
+            self.commit()
+        if self._committer is not None:
+            self._committer.shutdown(wait=True)
+            self._committer = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        os.unlink(os.path.join(self._members_dir, f"{self.member_id}.member"))
+        os.close(self._member_fd)
+        self.assignment = set()
+        self.offsets = {}
+        self.committed = {}
+        logger.info("CONSUMER %s: Учасника %s зупинено", self.group_id, self.member_id)
+
+    def _topic_partitions(self, topic: str, partition: Optional[int]) -> List[TopicPartition]:
+        """Внутрішній метод. Призначені цьому учаснику партиції топіка (або одна задана партиція)."""
+        return sorted(topic_partition for topic_partition in self.assignment
+                      if topic_partition[0] == topic and partition in (None, topic_partition[1]))
+
+    def seek(self, topic: str, offset: int, partition: Optional[int] = None):
         """
-        Запитує нові повідомлення з підписаних топіків.
+        Переміщує (і фіксує) офсет групи: наступний `poll` почне читання із запису `offset`.
+        Офсет, що вже видалений політикою зберігання, замінюється найстарішим доступним.
 
-        1. Використовує збережений офсет (`file.seek(current_offset)`) для початку читання.
-        2. Читає всі нові рядки (повідомлення).
-        3. Обчислює новий офсет (сума байтової довжини всіх прочитаних рядків).
-        4. Зберігає новий офсет (`_save_offset`).
+        :param topic: Назва топіка.
+        :type topic: str
+        :param offset: Логічний офсет запису.
+        :type offset: int
+        :param partition: Партиція. Якщо None — усі призначені цьому учаснику партиції топіка.
+        :type partition: Optional[int]
+        """
+        self._rebalance()
+        for topic_partition in self._topic_partitions(topic, partition):
+            self.offsets[topic_partition] = offset
+            self.commit({topic_partition: offset})
+            logger.info("CONSUMER %s: Офсет '%s-%d' переміщено на %d", self.group_id, *topic_partition, offset)
 
-        Це імітує читання та збереження офсету в один цикл, забезпечуючи,
-        що наступний poll почнеться з кінця поточного.
+    def seek_to_time(self, topic: str, timestamp: float, partition: Optional[int] = None):
+        """
+        Переміщує офсет групи на перший запис, записаний не раніше `timestamp`
+        (наприклад, для повторної обробки подій з 09:00). Пошук — бінарний за
+        розрідженим індексом часу, без сканування партиції.
+
+        :param topic: Назва топіка.
+        :type topic: str
+        :param timestamp: Unix-час.
+        :type timestamp: float
+        :param partition: Партиція. Якщо None — усі призначені цьому учаснику партиції топіка.
+        :type partition: Optional[int]
+        """
+        self._rebalance()
+        for topic_partition in self._topic_partitions(topic, partition):
+            offset = offset_for_time(partition_dir(*topic_partition), timestamp)
+            self.offsets[topic_partition] = offset
+            self.commit({topic_partition: offset})
+            logger.info("CONSUMER %s: Офсет '%s-%d' переміщено на %d (час %s)", self.group_id, *topic_partition,
+                        offset, timestamp)
+
+    def lag(self) -> Dict[TopicPartition, int]:
+        """
+        Відставання споживача по призначених партиціях: офсет кінця партиції мінус
+        поточна позиція читання (кількість непрочитаних записів).
+
+        :return: {(topic, partition): кількість записів}.
+        :rtype: Dict[TopicPartition, int]
+        """
+        return {topic_partition: max(end_offset(partition_dir(*topic_partition)) - offset, 0)
+                for topic_partition, offset in self.offsets.items()}
+
+    def poll(self, topics: List[str] = None, max_records: Optional[int] = MAX_POLL_RECORDS,
+             max_bytes: Optional[int] = MAX_POLL_BYTES, timeout: float = 0) -> List[Dict[str, Any]]:
+        """
+        Запитує нові повідомлення з призначених цьому учаснику партицій підписаних топіків.
+
+        1. Перевіряє склад групи та за потреби перебалансовує партиції.
+        2. Знаходить за збереженим офсетом сегмент і позицію в ньому (розріджений індекс).
+        3. Читає нові повні записи (повідомлення), доки не вичерпано `max_records` / `max_bytes`.
+        4. Переміщує позицію читання на наступний за останнім прочитаним записом.
+
+        Перед читанням фіксуються позиції, повернуті попередніми викликами, якщо цього
+        вимагає `commit_policy` (виклик `poll` означає, що попередні записи оброблено).
+        Ліміти спільні для всіх партицій; опитування щоразу починається з наступної
+        партиції, тож велике відставання однієї партиції не затримує решту. Для
+        потокової обробки великого відставання див. `iter_records`.
+
+        Якщо нових записів немає і `timeout > 0`, виклик блокується, доки виробник не
+        допише дані в будь-яку з опитуваних партицій (або до спливу `timeout`). На Linux
+        очікування виконується через inotify і завершується за мілісекунди після запису,
+        не витрачаючи CPU; на інших платформах — з адаптивною паузою (див. `log_watch`).
+        Під час очікування склад групи перевіряється щонайменше раз на `REBALANCE_INTERVAL`.
 
         :param topics: Список топіків для опитування. Якщо None, опитуються всі підписані топіки.
         :type topics: Optional[List[str]]
-        :return: Список нових подій/повідомлень. До кожного додається ключ '__topic__'.
+        :param max_records: Найбільша кількість записів. Якщо None — без обмеження.
+        :type max_records: Optional[int]
+        :param max_bytes: Найбільший сумарний розмір записів у журналі. Якщо None — без обмеження.
+                          Перший запис повертається навіть тоді, коли він більший за ліміт.
+        :type max_bytes: Optional[int]
+        :param timeout: Найбільший час очікування нових записів у секундах. 0 — не чекати.
+        :type timeout: float
+        :return: Список нових подій/повідомлень. Кожне містить '__offset__' та '__timestamp__' (час запису
+                 в журнал), до нього додаються ключі '__topic__' та '__partition__'.
         :rtype: List[Dict[str, Any]]
         """
+        self._maybe_commit()
+        if timeout <= 0:
+            return self._poll_once(topics, max_records, max_bytes)
+
+        if self._watcher is None:
+            self._watcher = create_watcher()
+        self._watcher.reset()
+        deadline = time.monotonic() + timeout
+        while True:
+            self._rebalance()
+            self._watcher.watch(self._watched_directories(topics))
+            new_events = self._poll_once(topics, max_records, max_bytes)
+            remaining = deadline - time.monotonic()
+            if new_events or remaining <= 0:
+                return new_events
+            self._watcher.wait(min(remaining, REBALANCE_INTERVAL))
+
+    def _watched_directories(self, topics: Optional[List[str]]) -> List[str]:
+        """
+        Внутрішній метод. Каталоги, зміни в яких мають перервати очікування: партиції
+        опитуваних топіків, `LOG_DIR` (створення каталогу партиції) та каталог учасників
+        групи (приєднання чи вихід учасника).
+        """
         if topics is None:
-            topics = list(self.offsets.keys())
-
+            topics = self.topics
+        directories = [partition_dir(*topic_partition) for topic_partition in self.assignment
+                       if topic_partition[0] in topics]
+        return directories + [LOG_DIR, self._members_dir]
+
+    def _poll_once(self, topics: Optional[List[str]], max_records: Optional[int],
+                   max_bytes: Optional[int]) -> List[Dict[str, Any]]:
+        """Внутрішній метод. Одне неблокуюче читання нових записів (див. `poll`)."""
         new_events = []
+        new_bytes = 0
 
-        for topic in topics:
-            log_file_path = os.path.join(LOG_DIR, f"{topic}.log")
+        for topic_partition in self._poll_order(topics):
+            topic, partition = topic_partition
+            if max_records is not None and len(new_events) >= max_records:
+                break
+            if max_bytes is not None and new_events and new_bytes >= max_bytes:
+                break
 
-            if not os.path.exists(log_file_path):
-                continue
-
-            current_offset = self.offsets.get(topic, 0)
+            current_offset = self.offsets.get(topic_partition, 0)
 
             try:
-                with open(log_file_path, 'r', encoding='utf-8') as file:
-                    file.seek(current_offset)
-
-                    new_lines = file.readlines()
+                records, new_offset, size = read_partition(
+                    partition_dir(topic, partition), current_offset,
+                    None if max_records is None else max_records - len(new_events),
+                    None if max_bytes is None else max_bytes - new_bytes)
+                if new_offset == current_offset:
+                    continue
+
+                for event in records:
+                    event['__topic__'] = topic
+                    event['__partition__'] = partition
+                new_events.extend(records)
+                new_bytes += size
+
+                self.offsets[topic_partition] = new_offset
+                self._uncommitted_records += len(records)
+                logger.info("CONSUMER %s: Прочитано %d подій з '%s-%d'. Новий офсет: %d",
+                            self.group_id, len(records), topic, partition, new_offset)
 
-                    if not new_lines:
-                        continue
-
-                    new_offset = current_offset + sum(len(line.encode('utf-8')) for line in new_lines)
+            except Exception as ex:
+                logger.error("CONSUMER ERROR: Помилка читання партиції %s-%d: %s", topic, partition, ex)
 
-                    for line in new_lines:
-                        try:
-                            event = json.loads(line.strip())
-                            event['__topic__'] = topic
-                            new_events.append(event)
-                        except json.decoder.JSONDecodeError:
-                            print(f"CONSUMEr WARNING: Пропущено некоректний JSON у {topic}.log")
+        return new_events
 
-                    self._save_offset(topic, new_offset)
-                    print(
-                        f"CONSUMER {self.group_id}: Прочитано {len(new_lines)} подій з '{topic}'. Новий офсет: {new_offset}")
+    def _poll_order(self, topics: Optional[List[str]]) -> List[TopicPartition]:
+        """
+        Внутрішній метод. Перебалансовує групу за потреби і повертає призначені партиції
+        заданих топіків, починаючи з наступної після тієї, з якої почалось попереднє опитування.
+        """
+        self._rebalance()
+        if topics is None:
+            topics = self.topics
+        order = [topic_partition for topic_partition in sorted(self.assignment) if topic_partition[0] in topics]
+        if not order:
+            return order
+        self._poll_start = (self._poll_start + 1) % len(order)
+        return order[self._poll_start:] + order[:self._poll_start]
+
+    def iter_records(self, topics: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Потоково перебирає всі наявні нові записи призначених партицій, по одному, з
+        постійним використанням пам'яті незалежно від розміру відставання.
 
-            except Exception as ex:
-                print(f"CONSUMER ERROR: Помилка читання топіка {topic}: {ex}")
+        Запис вважається обробленим, коли споживач запитує наступний запис: тоді
+        переміщується позиція читання і за потреби виконується фіксація за `commit_policy`.
+        Генератор завершується, дійшовши до кінця партицій.
 
-        return new_events
+        :param topics: Список топіків для читання. Якщо None — усі підписані топіки.
+        :type topics: Optional[List[str]]
+        :return: Генератор подій з ключами '__offset__', '__timestamp__', '__topic__' та '__partition__'.
+        :rtype: Iterator[Dict[str, Any]]
+        """
+        for topic_partition in self._poll_order(topics):
+            topic, partition = topic_partition
+            if topic_partition not in self.offsets:
+                # Партицію передано іншому учаснику під час перебору.
+                continue
+            offset = self.offsets[topic_partition]
+            for record, _ in iter_partition(partition_dir(topic, partition), offset):
+                record['__topic__'] = topic
+                record['__partition__'] = partition
+                yield record
+                self.offsets[topic_partition] = record['__offset__'] + 1
+                self._uncommitted_records += 1
+                self._maybe_commit()
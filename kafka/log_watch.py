@@ -0,0 +1,151 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+MIN_BACKOFF = 0.001
+"""Перша пауза (у секундах) резервного спостерігача після порожнього читання."""
+MAX_BACKOFF = 0.1
+"""Найбільша пауза резервного спостерігача: верхня межа затримки доставки без inotify."""
+
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_IGNORED = 0x00008000
+WATCH_MASK = IN_MODIFY | IN_MOVED_TO | IN_CREATE
+"""Події каталогу партиції, що можуть означати нові записи: дописування, новий сегмент, заміна сегмента."""
+
+_EVENT_HEADER = struct.Struct("iIII")
+"""Заголовок `struct inotify_event`: (wd, mask, cookie, len), за яким іде назва файлу довжиною len."""
+
+
+class LogWatcher:
+    """
+    Очікування змін у каталогах партицій для блокуючого `FileConsumer.poll(timeout=...)`.
+
+    Базова реалізація не отримує сповіщень від ОС і просто чекає з адаптивною
+    паузою: від `MIN_BACKOFF`, подвоюючи її після кожного порожнього очікування до
+    `MAX_BACKOFF`. Пауза скидається на початку кожного опитування (`reset`), тож
+    активний потік подій доставляється з мілісекундною затримкою, а простій коштує
+    не більше `1 / MAX_BACKOFF` пробуджень на секунду.
+    """
+
+    def __init__(self):
+        self._delay = MIN_BACKOFF
+
+    def watch(self, directories: Iterable[str]):
+        """
+        Задає множину каталогів для спостереження. Викликається перед кожним читанням,
+        щоб зміна, що сталася після читання, гарантовано перервала наступне `wait`.
+
+        :param directories: Каталоги партицій (та інші каталоги, зміни яких мають будити споживача).
+        :type directories: Iterable[str]
+        """
+
+    def reset(self):
+        """Скидає адаптивну паузу (початок нового опитування)."""
+        self._delay = MIN_BACKOFF
+
+    def wait(self, timeout: float):
+        """
+        Чекає на зміну в каталогах, але не довше за `timeout` секунд.
+        Хибні пробудження допустимі: після них споживач просто читає ще раз.
+
+        :param timeout: Найбільший час очікування у секундах.
+        :type timeout: float
+        """
+        time.sleep(max(min(self._delay, timeout), 0))
+        self._delay = min(self._delay * 2, MAX_BACKOFF)
+
+    def close(self):
+        """Звільняє ресурси спостерігача."""
+
+
+class InotifyWatcher(LogWatcher):
+    """
+    Спостерігач на основі inotify (Linux): потік спить у `select` на дескрипторі
+    inotify і прокидається одразу після запису виробника в сегмент, створення нового
+    сегмента чи його заміни ущільненням. Події, що надійшли між читанням та
+    очікуванням, залишаються в черзі дескриптора, тож не губляться.
+    """
+
+    def __init__(self):
+        """:raises OSError: Якщо inotify недоступний."""
+        super().__init__()
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._watches: Dict[str, int] = {}
+        """{каталог: дескриптор спостереження}."""
+
+    def watch(self, directories: Iterable[str]):
+        directories = set(directories)
+        for directory in set(self._watches) - directories:
+            self._libc.inotify_rm_watch(self._fd, self._watches.pop(directory))
+        for directory in directories - set(self._watches):
+            descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if descriptor >= 0:
+                self._watches[directory] = descriptor
+            elif ctypes.get_errno() != errno.ENOENT:
+                # Каталогу ще немає — його створення помітить спостереження за батьківським каталогом.
+                logger.warning("WATCH: Не вдалося спостерігати за '%s': %s", directory,
+                               os.strerror(ctypes.get_errno()))
+
+    def reset(self):
+        pass
+
+    def wait(self, timeout: float):
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if readable:
+            self._drain()
+
+    def _drain(self):
+        """
+        Внутрішній метод. Вичитує всі події з черги. Спостереження за видаленими
+        каталогами (IN_IGNORED) забуваються, щоб `watch` додав їх знову після
+        повторного створення каталогу.
+        """
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            position = 0
+            while position < len(data):
+                descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(data, position)
+                position += _EVENT_HEADER.size + name_length
+                if mask & IN_IGNORED:
+                    self._watches = {directory: watched for directory, watched in self._watches.items()
+                                     if watched != descriptor}
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._watches = {}
+
+
+def create_watcher() -> LogWatcher:
+    """
+    Створює найкращий доступний спостерігач: inotify на Linux, інакше — очікування
+    з адаптивною паузою.
+
+    :rtype: LogWatcher
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError) as ex:
+            logger.warning("WATCH: inotify недоступний (%s), використовується очікування з паузами", ex)
+    return LogWatcher()
@@ -1,14 +1,17 @@
-from log_storage import FileProducer, FileConsumer
+from log_storage import FileProducer, FileConsumer, create_topic, clean_topic
+import logging
+import shutil
+import sys
 import os
+import time
+
+logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
 
 
 # Очищення старих логів та офсетів для чистої демонстрації
 def cleanup():
     for d in ["kafka_logs", "kafka_offsets"]:
-        if os.path.exists(d):
-            for f in os.listdir(d):
-                os.remove(os.path.join(d, f))
-            os.rmdir(d)
+        shutil.rmtree(d, ignore_errors=True)
     os.makedirs("kafka_logs", exist_ok=True)
     os.makedirs("kafka_offsets", exist_ok=True)
 
@@ -31,6 +34,7 @@ print("\n--- ЕТАП 1: Producer відправляє 3 події ---")
 producer.send("orders", {"type": "ORDER_CREATED", "id": 101, "amount": 50})
 producer.send("payments", {"type": "PAYMENT_REQUEST", "order_id": 101})
 producer.send("orders", {"type": "ORDER_UPDATED", "id": 102, "amount": 100})
+producer.flush()  # Виробник пакетує повідомлення; дочікуємося запису перед читанням
 
 print("\n--- ЕТАП 2: Consumer A (Email) опитує ---")
 events_a = consumer_a.poll()
@@ -46,6 +50,7 @@ print(f"Оброблено Consumer B: {len(events_b)} подій")
 
 print("\n--- ЕТАП 4: Producer відправляє ще 1 подію ---")
 producer.send("orders", {"type": "ORDER_SHIPPED", "id": 102})
+producer.flush()
 
 print("\n--- ЕТАП 5: Consumer A опитує знову ---")
 # Consumer A повинен прочитати ТІЛЬКИ нову подію (завдяки збереженому офсету)
@@ -55,7 +60,8 @@ print(f"Оброблено Consumer A (2): {len(events_a_2)} подій")
 
 
 print("\n--- ЕТАП 6: Перезапуск Consumer B ---")
-# Імітуємо перезапуск: створюємо новий екземпляр, офсети будуть завантажені
+# Імітуємо перезапуск: старий екземпляр покидає групу, новий завантажує офсети
+consumer_b.close()
 consumer_b_restarted = FileConsumer(group_id="analytics_service")
 consumer_b_restarted.subscribe("orders")
 
@@ -63,4 +69,62 @@ events_b_restarted = consumer_b_restarted.poll()
 print(f"Оброблено Consumer B (Restart): {len(events_b_restarted)} подій")
 # Очікується 1 (тільки нова подія ORDER_SHIPPED)
 
+print("\n--- ЕТАП 7: Дві копії сервісу в одній групі ділять партиції топіка ---")
+create_topic("invoices", partitions=4)
+billing_1 = FileConsumer(group_id="billing_service")
+billing_1.subscribe("invoices")
+billing_2 = FileConsumer(group_id="billing_service")
+billing_2.subscribe("invoices")
+
+for order_id in range(101, 109):
+    producer.send("invoices", {"type": "INVOICE_ISSUED", "order_id": order_id}, key=order_id)
+producer.flush()
+
+events_1 = billing_1.poll()
+events_2 = billing_2.poll()
+print(f"Оброблено Billing 1: {len(events_1)} подій з партицій {sorted({e['__partition__'] for e in events_1})}")
+print(f"Оброблено Billing 2: {len(events_2)} подій з партицій {sorted({e['__partition__'] for e in events_2})}")
+# Очікується 8 подій сумарно, без перетину партицій
+
+print("\n--- ЕТАП 8: Billing 2 зупиняється, його партиції переходять до Billing 1 ---")
+billing_2.close()
+producer.send("invoices", {"type": "INVOICE_PAID", "order_id": 101}, key=101)
+producer.send("invoices", {"type": "INVOICE_PAID", "order_id": 102}, key=102)
+producer.flush()
+events_1 = billing_1.poll()
+print(f"Оброблено Billing 1: {len(events_1)} подій")
+# Очікується 2
+
+print("\n--- ЕТАП 9: Ущільнений топік зберігає лише останню ціну кожного товару ---")
+create_topic("prices", segment_bytes=1024, cleanup_policy="compact")
+for version in range(20):
+    for sku in ("A-1", "B-2", "C-3"):
+        producer.send("prices", {"sku": sku, "price": 100 + version}, key=sku)
+    producer.flush()  # Окремі пакети, щоб топік розбився на кілька сегментів
+print(f"Видалено ущільненням: {clean_topic('prices')[1]} записів")
+
+catalog = FileConsumer(group_id="catalog_service")
+catalog.subscribe("prices")
+events_prices = catalog.poll()
+print(f"Оброблено Catalog: {len(events_prices)} подій, остання ціна A-1: "
+      f"{[e['price'] for e in events_prices if e['sku'] == 'A-1'][-1]}")
+# Очікується значно менше за 60 подій; остання ціна A-1 — 119
+
+print("\n--- ЕТАП 10: Відставання та повторна обробка з моменту часу ---")
+replay_from = time.time()
+for order_id in range(201, 206):
+    producer.send("orders", {"type": "ORDER_CREATED", "id": order_id, "amount": 10})
+producer.flush()
+print(f"Відставання Consumer B: {consumer_b_restarted.lag()}")
+# Очікується 5 записів
+events_b_new = consumer_b_restarted.poll()
+consumer_b_restarted.seek_to_time("orders", replay_from)
+events_b_replayed = consumer_b_restarted.poll()
+print(f"Оброблено Consumer B: {len(events_b_new)} подій, після seek_to_time повторно: {len(events_b_replayed)}")
+# Очікується 5 та 5
+
+producer.close()
+# Споживачі фіксують офсети періодично; close() фіксує останні позиції перед виходом
+for consumer in (consumer_a, consumer_b_restarted, billing_1, catalog):
+    consumer.close()
 print("\n--- Завершення демонстрації Log-Based Storage ---")
@@ -0,0 +1,524 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPACT_MIN_LINES = 10_000
+"""Мінімальна кількість рядків журналу стану, після якої розглядається ущільнення."""
+
+RUNNING = "RUNNING"
+COMPENSATING = "COMPENSATING"
+COMPLETED = "COMPLETED"
+COMPENSATED = "COMPENSATED"
+TERMINAL_STATUSES = (COMPLETED, COMPENSATED)
+
+SagaAction = Callable[[str, Dict[str, Any]], Any]
+"""Локальна транзакція або компенсація кроку: (saga_id, data) -> результат (ігнорується)."""
+
+
+class SagaStep:
+    """
+    Крок Saga: локальна транзакція сервісу та її компенсація.
+
+    Кроки утворюють граф залежностей (`depends_on`): крок запускається, щойно
+    виконано всі його залежності, тож незалежні кроки виконуються паралельно.
+    Після збою оркестратор може повторно виконати крок, результат якого не встиг
+    потрапити в журнал стану, тож дії та компенсації мають бути ідемпотентними
+    (наприклад, за `saga_id`).
+    """
+
+    def __init__(self, name: str, event_type: str, compensating_event: str,
+                 action: Optional[SagaAction] = None, compensation: Optional[SagaAction] = None,
+                 depends_on: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """
+        :param name: Назва локальної транзакції (наприклад, 'payment_service.reserve').
+        :type name: str
+        :param event_type: Подія успіху кроку в 'saga_log'.
+        :type event_type: str
+        :param compensating_event: Подія компенсації кроку в 'saga_log'.
+        :type compensating_event: str
+        :param action: Локальна транзакція. Виняток означає збій кроку та запуск компенсацій.
+        :type action: Optional[SagaAction]
+        :param compensation: Компенсуюча транзакція.
+        :type compensation: Optional[SagaAction]
+        :param depends_on: Назви кроків, які мають завершитися до цього. None — попередній
+                           крок у списку (лінійна Saga); порожній список — без залежностей.
+        :type depends_on: Optional[Iterable[str]]
+        :param timeout: Найбільша тривалість дії та компенсації кроку (секунди), що
+                        відраховується від початку їх виконання, а не від постановки в
+                        чергу пулу кроків. Крок, що не встиг, вважається збійним і
+                        компенсується (його дія могла завершитися пізніше). None — без обмеження.
+        :type timeout: Optional[float]
+        """
+        self.name = name
+        self.event_type = event_type
+        self.compensating_event = compensating_event
+        self.action = action
+        self.compensation = compensation
+        self.depends_on = None if depends_on is None else tuple(depends_on)
+        self.timeout = timeout
+
+
+class _StepRun:
+    """Запущений у пулі кроків крок Saga та момент початку його виконання."""
+
+    __slots__ = ("step", "started")
+
+    def __init__(self, step: SagaStep):
+        self.step = step
+        self.started: Optional[float] = None
+        """Момент (`time.monotonic()`) початку виконання; None — крок ще чекає в черзі пулу."""
+
+    def deadline(self) -> Optional[float]:
+        """Крайній термін кроку або None, якщо тайм-ауту немає чи крок ще не почався."""
+        if self.step.timeout is None or self.started is None:
+            return None
+        return self.started + self.step.timeout
+
+
+class SagaStateStore:
+    """
+    Журнал станів незавершених Saga з індексом у пам'яті.
+
+    Кожен перехід стану дописується в журнал (JSON-рядки) під ключем `saga_id`;
+    завершена Saga позначається записом 'done' і зникає з індексу. Коли рядків
+    журналу стає удвічі більше, ніж незавершених Saga, журнал переписується лише з
+    їхніми останніми станами, тож відновлення після перезапуску читає кількість
+    рядків, пропорційну кількості незавершених Saga, а не всю історію 'saga_log'.
+    """
+
+    def __init__(self, journal_path: str = "saga_state.journal", fsync: bool = False):
+        """
+        :param journal_path: Шлях до журналу станів.
+        :type journal_path: str
+        :param fsync: Чи виконувати `fsync` після кожного переходу (стійкість до збою ОС).
+        :type fsync: bool
+        """
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self._states: Dict[str, Dict[str, Any]] = {}
+        """Незавершені Saga: {saga_id: останній стан}."""
+        self._lock = threading.Lock()
+        self._journal_lines = 0
+        self._load_journal()
+        self._journal = open(journal_path, "a", encoding="utf-8")
+
+    def _load_journal(self):
+        """Внутрішній метод. Відновлює стани незавершених Saga, пропускаючи пошкоджені рядки."""
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._journal_lines += 1
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "state":
+                        self._states[record["id"]] = record["state"]
+                    else:
+                        self._states.pop(record["id"], None)
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("SAGA STORE: Пропущено пошкоджений рядок журналу: %r", line)
+        logger.info("SAGA STORE: Незавершених Saga у '%s': %d", self.journal_path, len(self._states))
+
+    def in_flight(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: Копія індексу незавершених Saga: {saga_id: стан}.
+        :rtype: Dict[str, Dict[str, Any]]
+        """
+        with self._lock:
+            return {saga_id: dict(state) for saga_id, state in self._states.items()}
+
+    def get(self, saga_id: str) -> Optional[Dict[str, Any]]:
+        """
+        :return: Останній стан незавершеної Saga або None.
+        :rtype: Optional[Dict[str, Any]]
+        """
+        with self._lock:
+            state = self._states.get(saga_id)
+            return dict(state) if state is not None else None
+
+    def save(self, saga_id: str, state: Dict[str, Any]):
+        """
+        Записує новий стан Saga. Термінальний стан (`TERMINAL_STATUSES`) видаляє Saga з індексу.
+
+        :param saga_id: Ідентифікатор Saga.
+        :type saga_id: str
+        :param state: Стан Saga (має серіалізуватися в JSON).
+        :type state: Dict[str, Any]
+        """
+        if state["status"] in TERMINAL_STATUSES:
+            line = json.dumps({"op": "done", "id": saga_id, "status": state["status"]})
+        else:
+            line = json.dumps({"op": "state", "id": saga_id, "state": state})
+        with self._lock:
+            if state["status"] in TERMINAL_STATUSES:
+                self._states.pop(saga_id, None)
+            else:
+                self._states[saga_id] = state
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._journal_lines += 1
+            if self._journal_lines > max(2 * len(self._states), COMPACT_MIN_LINES):
+                self._compact_journal()
+
+    def _compact_journal(self):
+        """
+        Внутрішній метод (під локом). Переписує журнал лише зі станами незавершених
+        Saga через тимчасовий файл та атомарне перейменування.
+        """
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for saga_id, state in self._states.items():
+                file.write(json.dumps({"op": "state", "id": saga_id, "state": state}) + "\n")
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+        self._journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_lines = len(self._states)
+
+    def close(self):
+        """Закриває журнал. Незавершені Saga залишаються в ньому для відновлення."""
+        with self._lock:
+            self._journal.close()
+
+
+class SagaOrchestrator:
+    """
+    Оркестратор Saga: виконує багато Saga одночасно в пулі потоків, зберігаючи
+    кожен перехід стану в `SagaStateStore`, а кожну подію кроку — в топік журналу
+    Saga (ключ партиціонування — `saga_id`, тож події однієї Saga впорядковані).
+
+    Кроки однієї Saga виконуються за графом залежностей: кожен готовий крок
+    запускається в окремому пулі кроків, тож тривалість Saga визначається
+    критичним шляхом графа, а не сумою кроків. У разі збою чи тайм-ауту кроку
+    нові кроки не запускаються; після завершення вже запущених виконані кроки
+    компенсуються у зворотному порядку залежностей (компенсація кроку — після
+    компенсацій усіх залежних від нього), незалежні компенсації — паралельно.
+
+    Після перезапуску `recover()` продовжує кожну незавершену Saga з останнього
+    збереженого стану: виконання вперед (або компенсацію всіх виконаних кроків,
+    якщо `resume=False`), або розпочату компенсацію. Збій компенсації залишає Saga
+    незавершеною в журналі стану: її повторить наступний `recover()`.
+    """
+
+    def __init__(self, steps: List[SagaStep], producer: Any, store: SagaStateStore, max_workers: int = 64,
+                 log_topic: str = "saga_log", step_workers: Optional[int] = None):
+        """
+        :param steps: Кроки Saga (див. `SagaStep.depends_on`).
+        :type steps: List[SagaStep]
+        :param producer: Виробник для журналу Saga (`FileProducer`).
+        :type producer: Any
+        :param store: Сховище станів Saga.
+        :type store: SagaStateStore
+        :param max_workers: Кількість Saga, що виконуються одночасно.
+        :type max_workers: int
+        :param log_topic: Топік журналу подій Saga.
+        :type log_topic: str
+        :param step_workers: Кількість кроків (усіх Saga), що виконуються одночасно.
+                             Типово — `4 * max_workers`.
+        :type step_workers: Optional[int]
+        :raises ValueError: Якщо назви кроків повторюються, залежність невідома або граф має цикл.
+        """
+        self.steps = steps
+        self._dependencies: Dict[str, Tuple[str, ...]] = self._build_graph(steps)
+        """{крок: кроки, від яких він залежить}."""
+        self._dependents: Dict[str, Set[str]] = {step.name: set() for step in steps}
+        """{крок: кроки, що залежать від нього}."""
+        for name, dependencies in self._dependencies.items():
+            for dependency in dependencies:
+                self._dependents[dependency].add(name)
+        self.producer = producer
+        self.store = store
+        self.log_topic = log_topic
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="saga")
+        self._step_pool = ThreadPoolExecutor(max_workers=step_workers or 4 * max_workers,
+                                             thread_name_prefix="saga-step")
+        self._running: Dict[str, Future] = {}
+        """Saga, що виконуються в пулі: {saga_id: ф'ючерс}."""
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _build_graph(steps: List[SagaStep]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Внутрішній метод. Повертає залежності кроків (None замінюється попереднім кроком
+        списку) і перевіряє, що граф ациклічний (алгоритм Кана).
+        """
+        names = [step.name for step in steps]
+        if len(set(names)) != len(names):
+            raise ValueError("Назви кроків Saga мають бути унікальними")
+
+        dependencies = {}
+        for number, step in enumerate(steps):
+            if step.depends_on is None:
+                dependencies[step.name] = (names[number - 1],) if number else ()
+            else:
+                unknown = set(step.depends_on) - set(names)
+                if unknown:
+                    raise ValueError(f"Крок '{step.name}' залежить від невідомих кроків: {sorted(unknown)}")
+                dependencies[step.name] = step.depends_on
+
+        remaining = {name: set(dependencies[name]) for name in names}
+        ready = [name for name in names if not remaining[name]]
+        while ready:
+            done = ready.pop()
+            del remaining[done]
+            for name, waiting in remaining.items():
+                if done in waiting:
+                    waiting.discard(done)
+                    if not waiting:
+                        ready.append(name)
+        if remaining:
+            raise ValueError(f"Граф кроків Saga містить цикл: {sorted(remaining)}")
+        return dependencies
+
+    def log_event(self, saga_id: str, event_type: str, details: Dict[str, Any]):
+        """
+        Генерує подію в топік журналу Saga з ключем `saga_id` і чекає на її запис.
+        Перехід стану зберігається лише після запису події, тож після аварії журнал
+        Saga може містити повторні події кроку, але не пропущені.
+
+        :param saga_id: Ідентифікатор Saga.
+        :type saga_id: str
+        :param event_type: Тип події (наприклад, 'PAYMENT_RESERVED').
+        :type event_type: str
+        :param details: Додаткові дані про подію.
+        :type details: Dict[str, Any]
+        """
+        self.producer.send(self.log_topic, {"saga_id": saga_id, "type": event_type, "details": details},
+                           key=saga_id).result()
+        logger.debug("  [LOG]: Подія '%s' для Saga %s записана.", event_type, saga_id)
+
+    def start(self, saga_id: str, data: Dict[str, Any]) -> Future:
+        """
+        Запускає нову Saga.
+
+        :param saga_id: Унікальний ідентифікатор Saga (ідентифікатор замовлення).
+        :type saga_id: str
+        :param data: Дані, необхідні для всіх кроків (мають серіалізуватися в JSON).
+        :type data: Dict[str, Any]
+        :return: Ф'ючерс з підсумковим статусом Saga (`COMPLETED` або `COMPENSATED`).
+        :rtype: Future
+        :raises ValueError: Якщо Saga з таким ідентифікатором ще не завершена.
+        """
+        state = {"status": RUNNING, "data": data, "completed": [], "compensated": [], "timed_out": [],
+                 "error": None}
+        with self._lock:
+            if saga_id in self._running or self.store.get(saga_id) is not None:
+                raise ValueError(f"Saga '{saga_id}' вже виконується")
+            self.store.save(saga_id, state)
+            return self._submit(saga_id, state)
+
+    def recover(self, resume: bool = True) -> Dict[str, Future]:
+        """
+        Продовжує всі незавершені Saga з журналу станів (після перезапуску процесу).
+
+        :param resume: True — продовжити виконання Saga, що були в стані RUNNING;
+                       False — компенсувати їхні виконані кроки. Розпочаті компенсації
+                       завершуються в обох випадках.
+        :type resume: bool
+        :return: {saga_id: ф'ючерс з підсумковим статусом}.
+        :rtype: Dict[str, Future]
+        """
+        futures = {}
+        with self._lock:
+            for saga_id, state in self.store.in_flight().items():
+                if saga_id in self._running:
+                    continue
+                if state["status"] == RUNNING and not resume:
+                    state = dict(state, status=COMPENSATING, error="recovery")
+                    self.store.save(saga_id, state)
+                futures[saga_id] = self._submit(saga_id, state)
+        logger.info("SAGA: Відновлено %d незавершених Saga", len(futures))
+        return futures
+
+    def _submit(self, saga_id: str, state: Dict[str, Any]) -> Future:
+        """Внутрішній метод (під локом). Передає Saga в пул і відстежує її до завершення."""
+        future = self._pool.submit(self._run, saga_id, state)
+        self._running[saga_id] = future
+        future.add_done_callback(lambda _: self._forget(saga_id, future))
+        return future
+
+    def _forget(self, saga_id: str, future: Future):
+        with self._lock:
+            if self._running.get(saga_id) is future:
+                del self._running[saga_id]
+
+    def _run(self, saga_id: str, state: Dict[str, Any]) -> str:
+        """
+        Внутрішній метод (у потоці пулу Saga). Виконує решту кроків Saga і, у разі
+        збою, компенсації. Кожен перехід стану зберігається після запису його події.
+        """
+        if state["status"] == RUNNING:
+            logger.info("--- SAGA: Початок обробки замовлення %s ---", saga_id)
+            state = self._run_steps(saga_id, state)
+
+        if state["status"] == COMPENSATING:
+            logger.info("--- SAGA COMPENSATION: Запуск компенсаційних транзакцій (Saga %s) ---", saga_id)
+            state = self._compensate(saga_id, state)
+            status = COMPENSATED
+        else:
+            self.log_event(saga_id, "SAGA_COMPLETED", {"order_id": saga_id})
+            logger.info("✅ SAGA: Процес %s успішно завершено.", saga_id)
+            status = COMPLETED
+
+        self.store.save(saga_id, dict(state, status=status))
+        return status
+
+    def _execute(self, saga_id: str, run: _StepRun, data: Dict[str, Any], compensate: bool):
+        """
+        Внутрішній метод (у пулі кроків). Виконує дію або компенсацію кроку і записує її подію.
+        Момент початку виконання запам'ятовується в `run`: від нього відраховується тайм-аут.
+        """
+        run.started = time.monotonic()
+        step = run.step
+        action = step.compensation if compensate else step.action
+        if action is not None:
+            action(saga_id, data)
+        self.log_event(saga_id, step.compensating_event if compensate else step.event_type, data)
+
+    def _submit_step(self, running: Dict[Future, _StepRun], saga_id: str, step: SagaStep, data: Dict[str, Any],
+                     compensate: bool = False):
+        """Внутрішній метод. Запускає крок у пулі кроків."""
+        run = _StepRun(step)
+        running[self._step_pool.submit(self._execute, saga_id, run, data, compensate)] = run
+
+    @staticmethod
+    def _wait_steps(running: Dict[Future, _StepRun]) -> Tuple[List[Tuple[SagaStep, Future]], List[SagaStep]]:
+        """
+        Внутрішній метод. Чекає, доки завершиться хоча б один запущений крок або сплине
+        найближчий крайній термін. Повертає завершені кроки та кроки з тайм-аутом
+        (обидва видаляються з `running`; потік кроку з тайм-аутом не переривається).
+
+        Крок, що ще чекає в черзі пулу, не може сплинути раніше ніж через свій `timeout`,
+        тож очікування обмежується й цим значенням, щоб помітити термін кроку, який
+        почнеться під час очікування.
+        """
+        now = time.monotonic()
+        bounds = []
+        for run in running.values():
+            if run.step.timeout is None:
+                continue
+            deadline = run.deadline()
+            bounds.append(run.step.timeout if deadline is None else deadline - now)
+        done, _ = wait(running, timeout=max(min(bounds), 0) if bounds else None, return_when=FIRST_COMPLETED)
+        finished = [(running.pop(future).step, future) for future in done]
+
+        now = time.monotonic()
+        expired = [future for future, run in running.items() if run.deadline() is not None and now >= run.deadline()]
+        return finished, [running.pop(future).step for future in expired]
+
+    @staticmethod
+    def _cancel_queued(running: Dict[Future, _StepRun]) -> List[SagaStep]:
+        """
+        Внутрішній метод. Скасовує кроки, що ще чекають у черзі пулу, та видаляє їх з
+        `running`, щоб після відмови від Saga їхні дії не виконались. Повертає скасовані кроки.
+        """
+        cancelled = [future for future in running if future.cancel()]
+        return [running.pop(future).step for future in cancelled]
+
+    def _run_steps(self, saga_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Внутрішній метод. Виконує невиконані кроки за графом залежностей, запускаючи
+        кожен готовий крок паралельно. Повертає стан RUNNING (усі кроки виконано) або
+        COMPENSATING (збій чи тайм-аут кроку).
+        """
+        running: Dict[Future, _StepRun] = {}
+        failure: Optional[str] = None
+        timed_out: List[str] = []
+
+        while True:
+            if failure is None:
+                started = {run.step.name for run in running.values()}
+                for step in self.steps:
+                    if (step.name not in state["completed"] and step.name not in started
+                            and all(dependency in state["completed"] for dependency in self._dependencies[step.name])):
+                        self._submit_step(running, saga_id, step, state["data"])
+            if not running:
+                break
+
+            finished, expired = self._wait_steps(running)
+            for step, future in finished:
+                error = future.exception()
+                if error is None:
+                    logger.info("  [+] SAGA STEP: Успіх: %s", step.name)
+                    state = dict(state, completed=state["completed"] + [step.name])
+                    self.store.save(saga_id, state)
+                elif failure is None:
+                    logger.warning("!!! SAGA FAILED: Помилка на кроці %s (Saga %s): %s", step.name, saga_id, error)
+                    failure = f"{step.name}: {error}"
+                    self.log_event(saga_id, "SAGA_FAILED", {"step": step.name})
+            for step in expired:
+                logger.warning("!!! SAGA FAILED: Тайм-аут кроку %s (Saga %s)", step.name, saga_id)
+                timed_out.append(step.name)
+                if failure is None:
+                    failure = f"{step.name}: тайм-аут {step.timeout} с"
+                    self.log_event(saga_id, "SAGA_FAILED", {"step": step.name, "reason": "timeout"})
+            if failure is not None:
+                for step in self._cancel_queued(running):
+                    logger.info("  [x] SAGA STEP: Скасовано до початку: %s (Saga %s)", step.name, saga_id)
+
+        if failure is None:
+            return state
+        state = dict(state, status=COMPENSATING, error=failure, timed_out=state.get("timed_out", []) + timed_out)
+        self.store.save(saga_id, state)
+        return state
+
+    def _compensate(self, saga_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Внутрішній метод. Компенсує виконані кроки та кроки з тайм-аутом у зворотному
+        порядку залежностей, запускаючи незалежні компенсації паралельно.
+
+        :raises Exception: Перший збій (або `TimeoutError`) компенсації — після завершення
+                           вже запущених компенсацій; Saga залишається в стані COMPENSATING.
+        """
+        steps = {step.name: step for step in self.steps}
+        remaining = [name for name in dict.fromkeys(state["completed"] + state.get("timed_out", []))
+                     if name not in state["compensated"]]
+        running: Dict[Future, _StepRun] = {}
+        failure: Optional[BaseException] = None
+
+        while True:
+            if failure is None:
+                pending = set(remaining) | {run.step.name for run in running.values()}
+                for name in [name for name in remaining if not self._dependents[name] & pending]:
+                    remaining.remove(name)
+                    logger.info("  [<] SAGA COMPENSATING: Відміна: %s -> %s", name, steps[name].compensating_event)
+                    self._submit_step(running, saga_id, steps[name], state["data"], compensate=True)
+            if not running:
+                break
+
+            finished, expired = self._wait_steps(running)
+            for step, future in finished:
+                error = future.exception()
+                if error is None:
+                    state = dict(state, compensated=state["compensated"] + [step.name])
+                    self.store.save(saga_id, state)
+                elif failure is None:
+                    failure = error
+            if expired and failure is None:
+                failure = TimeoutError(f"Тайм-аут компенсації кроку '{expired[0].name}' (Saga {saga_id})")
+            if failure is not None:
+                # Скасовані компенсації повторить наступний `recover()`.
+                self._cancel_queued(running)
+
+        if failure is not None:
+            logger.error("SAGA ERROR: Компенсацію Saga %s не завершено: %s", saga_id, failure)
+            raise failure
+        return state
+
+    def close(self):
+        """Дочікується виконання запущених Saga та закриває сховище станів."""
+        self._pool.shutdown(wait=True)
+        self._step_pool.shutdown(wait=True)
+        self.store.close()
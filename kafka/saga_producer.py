@@ -1,40 +1,74 @@
-from log_storage import FileProducer
-from typing import Dict, Any, List
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from log_storage import FileProducer, create_topic
+from saga_orchestrator import COMPLETED, SagaOrchestrator, SagaStateStore, SagaStep
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
 
-producer = FileProducer()
 SAGA_ID_SUCCESS = "order_123_success"
 SAGA_ID_FAILURE = "order_456_failure"
+STEP_LATENCY = 0.01
+"""Імітована тривалість локальної транзакції (мережевий виклик сервісу), у секундах."""
 
 
-def log_saga_event(saga_id: str, event_type: str, details: Dict[str, Any]):
+def local_transaction(name: str):
     """
-    Генерує подію в топік 'saga_log'.
+    Створює імітацію локальної транзакції сервісу. Транзакція завершується збоєм,
+    якщо її назва вказана в полі `simulate_failure_step` даних Saga.
 
-    Використовує FileProducer для імітації відправлення повідомлення
-    до розподіленого брокера (наприклад, Kafka).
-    Цей лог являє собою "журнал" Saga, який можна використовувати для
-    відновлення або аудиту.
-
-    :param saga_id: Унікальний ідентифікатор Saga (ідентифікатор замовлення).
-    :type saga_id: str
-    :param event_type: Тип події (наприклад, 'PAYMENT_RESERVED', 'INVENTORY_RESTORED').
-    :type event_type: str
-    :param details: Додаткові дані про подію.
-    :type details: Dict[str, Any]
+    :param name: Назва локальної транзакції (наприклад, 'payment_service.reserve').
+    :type name: str
+    :return: Дія кроку Saga.
     """
-    producer.send("saga_log", {"saga_id": saga_id, "type": event_type, "details": details})
-    print(f"  [LOG]: Подія '{event_type}' для Saga {saga_id} записана.")
+    def action(saga_id: str, data: Dict[str, Any]):
+        time.sleep(STEP_LATENCY)
+        if data.get("simulate_failure_step") == name:
+            raise RuntimeError(f"Симульована помилка на кроці: {name}")
+    return action
+
+
+def compensating_transaction(saga_id: str, data: Dict[str, Any]):
+    """Імітація компенсуючої транзакції сервісу."""
+    time.sleep(STEP_LATENCY)
+
+
+STEP_TIMEOUT = 2.0
+"""Крайній термін кожного кроку Saga, у секундах."""
+
+# Граф кроків Saga: (Локальна Транзакція, Назва Події, Компенсуюча Подія, Залежності).
+# Резерв коштів і списання товару незалежні, тож виконуються (і компенсуються) паралельно.
+ORDER_SAGA_STEPS = [
+    SagaStep(name, event_type, compensating_event, local_transaction(name), compensating_transaction,
+             depends_on=depends_on, timeout=STEP_TIMEOUT)
+    for name, event_type, compensating_event, depends_on in [
+        ("order_service.create", "ORDER_CREATED", "ORDER_CANCELLED", []),
+        ("payment_service.reserve", "PAYMENT_RESERVED", "PAYMENT_CANCELLED", ["order_service.create"]),
+        ("inventory_service.deduct", "INVENTORY_DEDUCTED", "INVENTORY_RESTORED", ["order_service.create"]),
+        ("delivery_service.request", "DELIVERY_REQUESTED", "DELIVERY_CANCELLED",
+         ["payment_service.reserve", "inventory_service.deduct"]),
+    ]
+]
 
 
-def process_order_saga(saga_id: str, order_data: Dict[str, Any], simulate_failure_step: str = None):
+def process_order_saga(orchestrator: SagaOrchestrator, saga_id: str, order_data: Dict[str, Any],
+                       simulate_failure_step: str = None) -> str:
     """
-    Виконує повний процес Saga для обробки замовлення.
+    Виконує повний процес Saga для обробки замовлення та чекає на його завершення.
 
     Кожен крок Saga є **локальною транзакцією**, яка емітує подію про свій успіх.
-    У разі збою на будь-якому кроці, запускається послідовність
-    компенсаційних транзакцій у зворотному порядку, використовуючи збережений
-    список виконаних кроків.
+    Незалежні кроки виконуються паралельно. У разі збою на будь-якому кроці
+    запускаються компенсаційні транзакції у зворотному порядку залежностей. Стан Saga зберігається
+    оркестратором після кожного кроку, тож після аварії її продовжить `recover()`.
 
+    :param orchestrator: Оркестратор Saga.
+    :type orchestrator: SagaOrchestrator
     :param saga_id: ID замовлення/Saga.
     :type saga_id: str
     :param order_data: Дані, необхідні для всіх кроків Saga.
@@ -42,61 +76,66 @@ def process_order_saga(saga_id: str, order_data: Dict[str, Any], simulate_failur
     :param simulate_failure_step: Назва локальної транзакції, на якій потрібно
                                   симулювати збій (наприклад, 'payment_service.reserve').
     :type simulate_failure_step: str, optional
+    :return: Підсумковий статус Saga.
+    :rtype: str
     """
-    print(f"\n--- SAGA: Початок обробки замовлення {saga_id} ---")
-
-    # Кроки Saga: (Назва Події, Локальна Транзакція, Компенсуюча Подія)
-    steps = [
-        ("ORDER_CREATED", "order_service.create", "ORDER_CANCELLED"),
-        ("PAYMENT_RESERVED", "payment_service.reserve", "PAYMENT_CANCELLED"),
-        ("INVENTORY_DEDUCTED", "inventory_service.deduct", "INVENTORY_RESTORED"),
-        ("DELIVERY_REQUESTED", "delivery_service.request", "DELIVERY_CANCELLED"),
-    ]
-
-    executed_steps = []
-    success = True
+    if simulate_failure_step:
+        order_data = dict(order_data, simulate_failure_step=simulate_failure_step)
+    return orchestrator.start(saga_id, order_data).result()
 
-    for event_type, local_transaction, compensating_event in steps:
 
-        if success:
-            # 1. Виконуємо пряму транзакцію
+def main():
+    parser = argparse.ArgumentParser(description="Імітація шаблону Saga на файловому журналі Kafka")
+    parser.add_argument("--sagas", type=int, default=1000, help="Кількість одночасних Saga")
+    parser.add_argument("--workers", type=int, default=64, help="Кількість Saga, що виконуються паралельно")
+    parser.add_argument("--crash-after", type=float, default=None,
+                        help="Аварійно завершити процес через N секунд (перевірка відновлення)")
+    args = parser.parse_args()
 
-            # --- СИМУЛЯЦІЯ ПОМИЛКИ ---
-            if local_transaction == simulate_failure_step:
-                print(f"!!! SAGA FAILED: Симульована помилка на кроці: {local_transaction}")
-                success = False
-                log_saga_event(saga_id, "SAGA_FAILED", {"step": local_transaction})
-                # Переходимо до компенсації
-                break
+    logging.basicConfig(level=logging.DEBUG if args.sagas <= 10 else logging.ERROR, format="%(message)s",
+                        stream=sys.stdout)
 
-                # --- Успіх ---
-            print(f"  [+] SAGA STEP: Успіх: {local_transaction}")
-            log_saga_event(saga_id, event_type, order_data)
-            executed_steps.append((local_transaction, compensating_event))  # Зберігаємо для компенсації
+    create_topic("saga_log", partitions=4)
+    producer = FileProducer()
+    orchestrator = SagaOrchestrator(ORDER_SAGA_STEPS, producer, SagaStateStore("saga_state.journal"),
+                                    max_workers=args.workers)
 
-    if not success:
-        print("\n--- SAGA COMPENSATION: Запуск компенсаційних транзакцій ---")
+    # 0. Відновлення Saga, незавершених попереднім (аварійно зупиненим) запуском
+    recovered = orchestrator.recover()
+    if recovered:
+        statuses = [future.result() for future in recovered.values()]
+        print(f"Відновлено Saga: {len(statuses)}, завершено успішно: {statuses.count(COMPLETED)}")
 
-        # 2. Виконуємо компенсаційні транзакції у зворотному порядку
-        executed_steps.reverse()
-        for local_transaction, compensating_event in executed_steps:
-            print(f"  [<] SAGA COMPENSATING: Відміна: {local_transaction} -> {compensating_event}")
-            log_saga_event(saga_id, compensating_event, order_data)
-
-    else:
-        log_saga_event(saga_id, "SAGA_COMPLETED", {"order_id": saga_id})
-        print(f"\n✅ SAGA: Процес {saga_id} успішно завершено.")
-
-
-if __name__ == '__main__':
     # 1. Успішна Saga (повний цикл)
     order_details_1 = {"user_id": 42, "amount": 100.0}
-    process_order_saga(SAGA_ID_SUCCESS, order_details_1)
+    process_order_saga(orchestrator, f"{SAGA_ID_SUCCESS}_{os.getpid()}", order_details_1)
 
-    # 2. Невдала Saga (збій на резерві коштів)
+    # 2. Невдала Saga (збій на списанні товару)
     order_details_2 = {"user_id": 43, "amount": 250.0}
-    # Симулюємо збій на кроці "payment_service.reserve"
-    process_order_saga(SAGA_ID_FAILURE, order_details_2, simulate_failure_step="inventory_service.deduct")
+    process_order_saga(orchestrator, f"{SAGA_ID_FAILURE}_{os.getpid()}", order_details_2,
+                       simulate_failure_step="inventory_service.deduct")
+
+    # 3. Багато одночасних Saga, кожна десята — зі збоєм на випадковому кроці
+    if args.crash_after is not None:
+        threading.Timer(args.crash_after, os._exit, args=(1,)).start()
+    started = time.perf_counter()
+    futures = []
+    for number in range(args.sagas):
+        data = {"user_id": number, "amount": float(number % 500)}
+        if number % 10 == 0:
+            data["simulate_failure_step"] = random.choice(ORDER_SAGA_STEPS[1:]).name
+        futures.append(orchestrator.start(f"order_{os.getpid()}_{number}", data))
+    statuses = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    print(f"\nSaga: {len(statuses)} за {elapsed:.2f} с, завершено успішно: {statuses.count(COMPLETED)}, "
+          f"компенсовано: {len(statuses) - statuses.count(COMPLETED)}")
+
+    orchestrator.close()
+    producer.close()
 
     print("\n\n--- Перевірка логу Saga ---")
-    print("Виконайте: 'cat kafka_logs/saga_log.log' для перегляду повної послідовності.")
+    print("Виконайте: 'cat kafka_logs/saga_log-*.log' для перегляду повної послідовності.")
+
+
+if __name__ == '__main__':
+    main()
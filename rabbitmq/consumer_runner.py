@@ -0,0 +1,210 @@
+import functools
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional, Set
+
+import pika
+
+from producer import CONNECTION_PARAMS, EXCHANGE_NAME, EXCHANGE_TYPE
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_COUNT = 64
+"""Типова кількість непідтверджених повідомлень, які брокер видає споживачу наперед."""
+ACK_BATCH = 16
+"""Типова кількість оброблених повідомлень, що підтверджуються одним `basic_ack(multiple=True)`."""
+ACK_INTERVAL = 0.05
+"""Типовий найбільший час (секунди), протягом якого оброблене повідомлення чекає на підтвердження."""
+
+EventHandler = Callable[[str, Any], None]
+"""Обробник події: handler(event_name, data). Виняток означає, що подію не оброблено."""
+
+
+class ConsumerRunner:
+    """
+    Споживач RabbitMQ з пулом потоків обробки та пакетними підтвердженнями.
+
+    Черга прив'язується до topic-обмінника лише з ключами `binding_keys`, тож Worker
+    отримує тільки ті події, які обробляє. Брокер видає наперед до `prefetch_count`
+    повідомлень; потік з'єднання pika лише передає їх у пул із `workers` потоків, тому
+    повільна обробка не блокує отримання наступних повідомлень.
+
+    Канал pika не потокобезпечний, тож потоки обробки не викликають `basic_ack`
+    самі, а передають результат у потік з'єднання через
+    `connection.add_callback_threadsafe`. Там оброблені повідомлення накопичуються і
+    підтверджуються одним `basic_ack(multiple=True)` до найбільшого тегу, перед яким
+    усі доставки вже оброблені: щойно набралося `ack_batch` повідомлень або минуло
+    `ack_interval` секунд. Повідомлення, обробник якого завершився винятком,
+    відхиляється окремо (`basic_nack`, без повернення в чергу), тож не зупиняє чергу.
+    """
+
+    def __init__(self, name: str, handler: EventHandler, binding_keys: Iterable[str], queue: str = '',
+                 prefetch_count: int = PREFETCH_COUNT, workers: int = 8, ack_batch: int = ACK_BATCH,
+                 ack_interval: float = ACK_INTERVAL, parameters: pika.ConnectionParameters = CONNECTION_PARAMS,
+                 exchange: str = EXCHANGE_NAME, connection_factory: Callable[..., Any] = pika.BlockingConnection):
+        """
+        :param name: Назва Worker-а (для журналу).
+        :type name: str
+        :param handler: Обробник подій; викликається в потоках пулу.
+        :type handler: EventHandler
+        :param binding_keys: Ключі прив'язки черги до topic-обмінника (наприклад, 'user.registered' або 'user.*').
+        :type binding_keys: Iterable[str]
+        :param queue: Назва черги. Порожня — анонімна ексклюзивна черга, що видаляється разом із з'єднанням;
+                      інакше — стійка черга, яку Worker-и з однаковою назвою ділять між собою.
+        :type queue: str
+        :param prefetch_count: Кількість непідтверджених повідомлень, які брокер видає наперед.
+        :type prefetch_count: int
+        :param workers: Кількість потоків обробки.
+        :type workers: int
+        :param ack_batch: Кількість повідомлень в одному пакетному підтвердженні.
+        :type ack_batch: int
+        :param ack_interval: Найбільша затримка підтвердження (секунди).
+        :type ack_interval: float
+        :param parameters: Параметри з'єднання з RabbitMQ.
+        :type parameters: pika.ConnectionParameters
+        :param exchange: Topic-обмінник подій.
+        :type exchange: str
+        :param connection_factory: Фабрика з'єднань із інтерфейсом `pika.BlockingConnection`.
+        :type connection_factory: Callable[..., Any]
+        """
+        self.name = name
+        self.handler = handler
+        self.binding_keys = list(binding_keys)
+        self.queue = queue
+        self.prefetch_count = prefetch_count
+        self.workers = workers
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.parameters = parameters
+        self.exchange = exchange
+        self._connection_factory = connection_factory
+        self._connection: Any = None
+        self._channel: Any = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Стан підтверджень; змінюється лише в потоці з'єднання.
+        self._settled_upto = 0
+        """Найбільший тег, перед яким (включно) всі доставки оброблені."""
+        self._finished: Set[int] = set()
+        """Оброблені теги, більші за `_settled_upto` (обробка попередніх ще триває)."""
+        self._failed: Set[int] = set()
+        self._ack_upto = 0
+        """Найбільший успішно оброблений тег серед `_settled_upto` (межа наступного `basic_ack`)."""
+        self._acked = 0
+        """Межа останнього надісланого `basic_ack(multiple=True)`."""
+        self._unacked = 0
+        self._flush_scheduled = False
+        self._stopping = threading.Event()
+
+    def run(self):
+        """
+        Підключається до RabbitMQ, декларує обмінник і чергу та споживає події, доки не
+        буде викликано `stop()` (або натиснуто Ctrl+C). Перед поверненням дочікується
+        обробки отриманих повідомлень і підтверджує їх.
+
+        :raises KeyboardInterrupt: При натисканні Ctrl+C (після коректного завершення).
+        :raises Exception: У разі помилки підключення або каналу.
+        """
+        self._connection = self._connection_factory(self.parameters)
+        self._channel = self._connection.channel()
+        self._channel.exchange_declare(exchange=self.exchange, exchange_type=EXCHANGE_TYPE)
+        if self.queue:
+            result = self._channel.queue_declare(queue=self.queue, durable=True)
+        else:
+            result = self._channel.queue_declare(queue='', exclusive=True)
+        queue_name = result.method.queue
+        for binding_key in self.binding_keys:
+            self._channel.queue_bind(exchange=self.exchange, queue=queue_name, routing_key=binding_key)
+
+        self._channel.basic_qos(prefetch_count=self.prefetch_count)
+        self._channel.basic_consume(queue=queue_name, on_message_callback=self._on_message)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        logger.info("%s: Очікування подій %s (prefetch=%d, workers=%d)", self.name, self.binding_keys,
+                    self.prefetch_count, self.workers)
+        try:
+            if not self._stopping.is_set():
+                self._channel.start_consuming()
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        """Зупиняє споживання. Безпечно викликати з будь-якого потоку."""
+        self._stopping.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(self._stop_consuming)
+            except Exception:
+                pass
+
+    def _stop_consuming(self):
+        if self._channel.is_open:
+            self._channel.stop_consuming()
+
+    def _shutdown(self):
+        """Внутрішній метод. Дочікується обробки, підтверджує результати та закриває з'єднання."""
+        self._stopping.set()
+        self._pool.shutdown(wait=True)
+        try:
+            if self._connection.is_open:
+                # Виконує відкладені з потоків обробки підтвердження.
+                self._connection.process_data_events(time_limit=0)
+                self._flush_acks()
+                self._connection.close()
+        except Exception as error:
+            logger.error("%s: Помилка під час завершення: %s", self.name, error)
+
+    def _on_message(self, channel: Any, method: Any, properties: Any, body: bytes):
+        """Внутрішній метод (потік з'єднання). Передає доставку в пул потоків обробки."""
+        if self._stopping.is_set():
+            # Не підтверджене повідомлення брокер поверне в чергу після закриття з'єднання.
+            return
+        self._pool.submit(self._process, method.delivery_tag, body)
+
+    def _process(self, delivery_tag: int, body: bytes):
+        """Внутрішній метод (потік пулу). Обробляє подію та повідомляє результат потоку з'єднання."""
+        try:
+            message = json.loads(body)
+            self.handler(message["event"], message["data"])
+            succeeded = True
+        except Exception as error:
+            logger.error("%s: Помилка обробки повідомлення %d: %s", self.name, delivery_tag, error)
+            succeeded = False
+        try:
+            self._connection.add_callback_threadsafe(functools.partial(self._on_processed, delivery_tag, succeeded))
+        except Exception as error:
+            # З'єднання закрито: брокер поверне непідтверджене повідомлення в чергу.
+            logger.warning("%s: Не вдалося підтвердити повідомлення %d: %s", self.name, delivery_tag, error)
+
+    def _on_processed(self, delivery_tag: int, succeeded: bool):
+        """
+        Внутрішній метод (потік з'єднання). Зсуває межу послідовно оброблених тегів і
+        надсилає пакетне підтвердження, коли воно набрало `ack_batch` повідомлень.
+        """
+        if not succeeded:
+            self._channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+            self._failed.add(delivery_tag)
+        self._finished.add(delivery_tag)
+        while self._settled_upto + 1 in self._finished:
+            self._settled_upto += 1
+            self._finished.remove(self._settled_upto)
+            if self._settled_upto in self._failed:
+                self._failed.remove(self._settled_upto)
+            else:
+                self._ack_upto = self._settled_upto
+                self._unacked += 1
+
+        if self._unacked >= self.ack_batch:
+            self._flush_acks()
+        elif self._unacked and not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._connection.call_later(self.ack_interval, self._flush_acks)
+
+    def _flush_acks(self):
+        """Внутрішній метод (потік з'єднання). Підтверджує всі послідовно оброблені повідомлення."""
+        self._flush_scheduled = False
+        if self._ack_upto > self._acked and self._channel.is_open:
+            self._channel.basic_ack(delivery_tag=self._ack_upto, multiple=True)
+            self._acked = self._ack_upto
+            self._unacked = 0
@@ -1,70 +1,49 @@
-import pika
-import json
+import logging
 import time
-from producer import CONNECTION_PARAMS, EXCHANGE_NAME
 
+from consumer_runner import ConsumerRunner
 
-def callback(ch, method, properties, body):
-    """
-    Функція зворотного виклику (callback), яка викликається Pika при отриманні нового повідомлення.
+PREFETCH_COUNT = 32
+WORKERS = 16
 
-    Обробляє повідомлення 'user.registered', симулюючи відправку вітального листа.
-    Виконує **ручне підтвердження (basic_ack)** після симуляції успішної обробки.
 
-    :param ch: Об'єкт каналу (Channel).
-    :type ch: pika.channel.Channel
-    :param method: Об'єкт, що містить інформацію про доставку.
-    :type method: pika.spec.Basic.Deliver
-    :param properties: Об'єкт властивостей повідомлення.
-    :type properties: pika.spec.BasicProperties
-    :param body: Тіло повідомлення (байти JSON).
-    :type body: bytes
+def handle_event(event, data):
     """
-    data = json.loads(body)
-    event = data["event"]
+    Обробник подій Worker-а сповіщень, який викликається в потоці пулу `ConsumerRunner`.
 
-    if event == "user.registered":
-        print(f" [EMAIL_WORKER] Отримано подію {event}.")
-        time.sleep(2)
-        print(f" [EMAIL_WORKER] Відправлено вітальний лист на {data['data']['email']}")
+    Обробляє подію 'user.registered', симулюючи відправку вітального листа. Черга
+    прив'язана лише до цієї події, тож інші події до Worker-а не надходять.
+    Підтвердження (basic_ack) виконує `ConsumerRunner` після успішної обробки.
 
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+    :param event: Назва події.
+    :type event: str
+    :param data: Корисне навантаження події.
+    :type data: dict
+    """
+    print(f" [EMAIL_WORKER] Отримано подію {event}.")
+    time.sleep(2)
+    print(f" [EMAIL_WORKER] Відправлено вітальний лист на {data['email']}")
 
 
 def start_worker():
     """
-    Встановлює з'єднання з RabbitMQ та запускає Worker-споживача.
+    Запускає Worker-споживача подій 'user.registered'.
 
-    Етапи:
-    1. Створює **блокуюче з'єднання** та канал.
-    2. Декларує обмінник `fanout` (що дозволяє широкомовну розсилку).
-    3. Декларує **анонімну, ексклюзивну чергу** (`queue=''`, `exclusive=True`). Ця черга:
-       - Має випадкове ім'я.
-       - Видаляється, коли з'єднання закривається.
-    4. Прив'язує чергу до обмінника (`queue_bind`), щоб отримувати всі повідомлення, які потрапляють в обмінник.
-    5. Встановлює **prefetch_count=1** (`basic_qos`) — гарантує, що Worker бере лише одне повідомлення за раз (для рівномірного розподілу навантаження між Workers).
-    6. Запускає цикл споживання (`start_consuming`).
+    `ConsumerRunner` декларує topic-обмінник і анонімну ексклюзивну чергу, прив'язану
+    лише до 'user.registered', отримує до `PREFETCH_COUNT` повідомлень наперед і
+    обробляє їх паралельно в `WORKERS` потоках, підтверджуючи результати пакетами.
 
     :raises KeyboardInterrupt: При натисканні Ctrl+C.
     :raises Exception: У разі помилки підключення або каналу.
     """
-    connection = pika.BlockingConnection(CONNECTION_PARAMS)
-    channel = connection.channel()
-
-    channel.exchange_declare(exchange=EXCHANGE_NAME, exchange_type='fanout')
-    result = channel.queue_declare(queue='', exclusive=True)
-    queue_name = result.method.queue
-
-    channel.queue_bind(exchange=EXCHANGE_NAME, queue=queue_name)
-
+    runner = ConsumerRunner("EMAIL_WORKER", handle_event, binding_keys=["user.registered"],
+                            prefetch_count=PREFETCH_COUNT, workers=WORKERS)
     print(' [EMAIL_WORKER] Очікування подій. Натисніть CTRL+C для виходу.')
-
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue=queue_name, on_message_callback=callback)
-    channel.start_consuming()
+    runner.run()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     try:
         start_worker()
     except KeyboardInterrupt:
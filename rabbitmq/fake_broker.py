@@ -0,0 +1,221 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pika
+
+Published = Tuple["FakeChannel", int, str, str, bytes]
+"""Опубліковане повідомлення: (канал, delivery_tag, exchange, routing_key, body)."""
+
+
+class FakeIOLoop:
+    """Цикл подій з'єднання: виконує колбеки по черзі в потоці, що викликав `start()`."""
+
+    def __init__(self):
+        self._callbacks: "queue.Queue[Callable[[], Any]]" = queue.Queue()
+        self._stopped = False
+
+    def add_callback_threadsafe(self, callback: Callable[[], Any]):
+        self._callbacks.put(callback)
+
+    def start(self):
+        while not self._stopped:
+            self._callbacks.get()()
+
+    def stop(self):
+        self._stopped = True
+        self._callbacks.put(lambda: None)
+
+
+class FakeChannel:
+    """Канал `FakeConnection` з підмножиною інтерфейсу `pika.channel.Channel`, яку використовує Publisher."""
+
+    def __init__(self, connection: "FakeConnection", channel_number: int):
+        self.connection = connection
+        self.channel_number = channel_number
+        self.is_open = True
+        self.delivery_tag = 0
+        self.confirming = False
+        self.unconfirmed: Dict[int, Published] = {}
+        """Публікації каналу, які брокер ще не підтвердив: {delivery_tag: публікація}."""
+        self._on_close: List[Callable] = []
+        self._ack_nack_callback: Optional[Callable] = None
+
+    def add_on_close_callback(self, callback: Callable):
+        self._on_close.append(callback)
+
+    def confirm_delivery(self, ack_nack_callback: Callable, callback: Optional[Callable] = None):
+        broker = self.connection.broker
+        self._ack_nack_callback = ack_nack_callback
+        with broker.condition:
+            fail = broker.close_before_confirm > 0
+            broker.close_before_confirm -= fail
+        if fail:
+            self.connection.ioloop.add_callback_threadsafe(lambda: self.close(406, "confirm_delivery failed"))
+            return
+        with broker.condition:
+            self.confirming = True
+            broker.condition.notify_all()
+        if callback is not None:
+            self.connection.ioloop.add_callback_threadsafe(
+                lambda: callback(pika.frame.Method(self.channel_number, pika.spec.Confirm.SelectOk())))
+
+    def exchange_declare(self, exchange: str, exchange_type: str = "direct", callback: Optional[Callable] = None,
+                         **kwargs):
+        broker = self.connection.broker
+        if exchange in broker.failing_exchanges:
+            self.connection.ioloop.add_callback_threadsafe(lambda: self.close(406, f"PRECONDITION_FAILED {exchange}"))
+            return
+        with broker.condition:
+            broker.exchanges[exchange] = exchange_type
+        if callback is not None:
+            self.connection.ioloop.add_callback_threadsafe(
+                lambda: callback(pika.frame.Method(self.channel_number, pika.spec.Exchange.DeclareOk())))
+
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes, properties: Any = None,
+                      mandatory: bool = False):
+        broker = self.connection.broker
+        self.delivery_tag += 1
+        entry = (self, self.delivery_tag, exchange, routing_key, body)
+        with broker.condition:
+            self.unconfirmed[self.delivery_tag] = entry
+            broker.published.append(entry)
+            broker.condition.notify_all()
+
+    def confirm(self, delivery_tag: int, multiple: bool = False, ack: bool = True):
+        """Надсилає `Basic.Ack` / `Basic.Nack` (викликається в потоці циклу подій)."""
+        with self.connection.broker.condition:
+            for tag in [tag for tag in self.unconfirmed if tag == delivery_tag or multiple and tag < delivery_tag]:
+                del self.unconfirmed[tag]
+        method = pika.spec.Basic.Ack(delivery_tag, multiple) if ack else pika.spec.Basic.Nack(delivery_tag, multiple)
+        self._ack_nack_callback(pika.frame.Method(self.channel_number, method))
+
+    def close(self, reply_code: int = 200, reply_text: str = "Normal shutdown"):
+        """Закриває канал і викликає колбеки закриття (у потоці циклу подій)."""
+        if not self.is_open:
+            return
+        with self.connection.broker.condition:
+            self.is_open = False
+            self.connection.channels.remove(self)
+            self.connection.broker.condition.notify_all()
+        reason = pika.exceptions.ChannelClosedByBroker(reply_code, reply_text)
+        for callback in self._on_close:
+            callback(self, reason)
+
+
+class FakeConnection:
+    """
+    Заміна `pika.SelectConnection` без мережі: підмножина інтерфейсу, яку використовує
+    `RabbitPublisher`. Створюється фабрикою `FakeBroker.connect`.
+    """
+
+    def __init__(self, broker: "FakeBroker", on_open_callback: Callable, on_close_callback: Callable):
+        self.broker = broker
+        self.ioloop = FakeIOLoop()
+        self.is_open = True
+        self.channels: List[FakeChannel] = []
+        self._next_channel = 0
+        self._on_close_callback = on_close_callback
+        self.ioloop.add_callback_threadsafe(lambda: on_open_callback(self))
+
+    def channel(self, on_open_callback: Callable) -> FakeChannel:
+        self._next_channel += 1
+        channel = FakeChannel(self, self._next_channel)
+        self.channels.append(channel)
+        self.ioloop.add_callback_threadsafe(lambda: on_open_callback(channel))
+        return channel
+
+    def close(self, reply_code: int = 200, reply_text: str = "Normal shutdown"):
+        """Закриває канали, а потім з'єднання, як це робить pika (у потоці циклу подій)."""
+        if not self.is_open:
+            return
+        self.is_open = False
+        for channel in list(self.channels):
+            channel.close(reply_code, reply_text)
+        self._on_close_callback(self, pika.exceptions.ConnectionClosedByBroker(reply_code, reply_text))
+
+
+class FakeBroker:
+    """
+    Локальна заміна брокера RabbitMQ для перевірки `RabbitPublisher` без сервера.
+
+    `connect` передається як `connection_factory`. Брокер записує всі публікації
+    (`published`), але не підтверджує їх сам: тест викликає `ack` / `nack`, щоб
+    надіслати пакетні чи окремі підтвердження, `close_channel` та `drop_connection`,
+    щоб перевірити повторну публікацію. Усі дії виконуються в потоці циклу подій
+    поточного з'єднання, як і колбеки pika.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.connections: List[FakeConnection] = []
+        """Усі створені з'єднання (останнє — поточне)."""
+        self.published: List[Published] = []
+        """Публікації всіх з'єднань у порядку надходження."""
+        self.exchanges: Dict[str, str] = {}
+        """Задекларовані обмінники: {назва: тип}."""
+        self.failing_exchanges: Set[str] = set()
+        """Обмінники, декларація яких закриває канал (як PRECONDITION_FAILED)."""
+        self.close_before_confirm = 0
+        """Кількість наступних каналів, що закриються до ввімкнення publisher confirms."""
+
+    def connect(self, parameters: Any = None, on_open_callback: Optional[Callable] = None,
+                on_open_error_callback: Optional[Callable] = None,
+                on_close_callback: Optional[Callable] = None) -> FakeConnection:
+        """Фабрика з'єднань із сигнатурою `pika.SelectConnection`."""
+        connection = FakeConnection(self, on_open_callback, on_close_callback)
+        with self.condition:
+            self.connections.append(connection)
+            self.condition.notify_all()
+        return connection
+
+    @property
+    def connection(self) -> FakeConnection:
+        return self.connections[-1]
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+        """Чекає, доки `predicate()` (під локом брокера) стане істинним."""
+        with self.condition:
+            return self.condition.wait_for(predicate, timeout)
+
+    def _call(self, action: Callable[[], Any]):
+        """Внутрішній метод. Виконує дію в потоці циклу подій поточного з'єднання і чекає на неї."""
+        done = threading.Event()
+
+        def run():
+            try:
+                action()
+            finally:
+                done.set()
+
+        self.connection.ioloop.add_callback_threadsafe(run)
+        done.wait(5.0)
+
+    def unconfirmed(self) -> List[Published]:
+        """Непідтверджені публікації на відкритих каналах поточного з'єднання."""
+        with self.condition:
+            return [entry for channel in self.connection.channels for entry in channel.unconfirmed.values()]
+
+    def ack(self, multiple: bool = True):
+        """Підтверджує всі публікації поточного з'єднання: одним `Basic.Ack(multiple)` на канал або по одному."""
+        def action():
+            for channel in list(self.connection.channels):
+                tags = sorted(channel.unconfirmed)
+                if tags and multiple:
+                    channel.confirm(tags[-1], multiple=True)
+                elif tags:
+                    for tag in tags:
+                        channel.confirm(tag)
+        self._call(action)
+
+    def nack(self, channel: FakeChannel, delivery_tag: int):
+        """Відхиляє одну публікацію (`Basic.Nack`)."""
+        self._call(lambda: channel.confirm(delivery_tag, ack=False))
+
+    def close_channel(self, channel: FakeChannel):
+        """Закриває канал з боку брокера."""
+        self._call(lambda: channel.close(320, "CHANNEL_FORCED"))
+
+    def drop_connection(self):
+        """Розриває поточне з'єднання з боку брокера."""
+        self._call(lambda: self.connection.close(320, "CONNECTION_FORCED"))
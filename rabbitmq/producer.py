@@ -1,48 +1,387 @@
-import pika
-import time
+import atexit
+import collections
+import functools
 import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, List, Optional, Set, Tuple
+
+import pika
+
+logger = logging.getLogger(__name__)
 
 CONNECTION_PARAMS = pika.ConnectionParameters('localhost', 5672, '/', pika.PlainCredentials('user', 'password'))
-EXCHANGE_NAME = 'user_events_fanout'
+EXCHANGE_NAME = 'user_events_topic'
+EXCHANGE_TYPE = 'topic'
+"""Обмінник подій: ключ маршрутизації — назва події, тож кожен Worker отримує лише події, на які підписаний."""
+
+_Message = Tuple[str, str, str, bytes, Future]
+"""Повідомлення в черзі публікації: (exchange, exchange_type, routing_key, body, future)."""
+
+
+class _ChannelState:
+    """Канал пулу в режимі publisher confirms та його непідтверджені повідомлення."""
+
+    def __init__(self, channel: Any):
+        self.channel = channel
+        self.delivery_tag = 0
+        self.unconfirmed: "collections.OrderedDict[int, _Message]" = collections.OrderedDict()
+        """Опубліковані, але ще не підтверджені брокером повідомлення: {delivery_tag: повідомлення}."""
+        self.declaring: Optional[str] = None
+        """Обмінник, декларація якого виконується на цьому каналі."""
+
+
+class RabbitPublisher:
+    """
+    Довгоживучий Publisher RabbitMQ з пулом каналів та пакетними підтвердженнями.
+
+    Одне з'єднання (`pika.SelectConnection`) обслуговує фоновий I/O потік; на ньому
+    відкрито `channels` каналів у режимі publisher confirms, між якими повідомлення
+    розподіляються по колу. `publish` лише ставить повідомлення в чергу і повертає
+    `Future`, що виконується, коли брокер підтвердив повідомлення (`Basic.Ack`). Брокер
+    підтверджує повідомлення пакетами (`multiple=True`), тож одне підтвердження
+    закриває багато ф'ючерсів, а кількість непідтверджених повідомлень обмежена
+    `max_in_flight` (`publish` блокується, доки вікно не звільниться).
 
+    Обмінники декларуються один раз на з'єднання й кешуються. Після розриву з'єднання
+    Publisher перепідключається з експоненційною паузою і повторно публікує всі
+    непідтверджені повідомлення (at-least-once: можливі дублікати).
 
-def produce_event(event_name, data):
+    Через `connection_factory` замість `pika.SelectConnection` можна передати локальну
+    заміну брокера з тим самим інтерфейсом, наприклад `FakeBroker.connect` з
+    `fake_broker.py` (для тестів без RabbitMQ).
     """
-    Встановлює з'єднання з RabbitMQ, декларує обмінник та відправляє одне повідомлення.
+
+    def __init__(self, parameters: pika.ConnectionParameters = CONNECTION_PARAMS, channels: int = 2,
+                 max_in_flight: int = 1024, reconnect_delay: float = 0.5, max_reconnect_delay: float = 30.0,
+                 connection_factory: Callable[..., Any] = pika.SelectConnection):
+        """
+        :param parameters: Параметри з'єднання з RabbitMQ.
+        :type parameters: pika.ConnectionParameters
+        :param channels: Кількість каналів у пулі.
+        :type channels: int
+        :param max_in_flight: Найбільша кількість повідомлень, що чекають на підтвердження.
+        :type max_in_flight: int
+        :param reconnect_delay: Перша пауза перед перепідключенням (секунди).
+        :type reconnect_delay: float
+        :param max_reconnect_delay: Найбільша пауза перед перепідключенням (секунди).
+        :type max_reconnect_delay: float
+        :param connection_factory: Фабрика з'єднань із сигнатурою `pika.SelectConnection`.
+        :type connection_factory: Callable[..., Any]
+        """
+        self.parameters = parameters
+        self.channels = channels
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._connection_factory = connection_factory
+        self._connection: Any = None
+        self._open_channels: List[_ChannelState] = []
+        self._next_channel = 0
+        self._outbox: Deque[_Message] = collections.deque()
+        """Повідомлення, що чекають на публікацію (додаються з будь-якого потоку, забираються I/O потоком)."""
+        self._declared: Set[str] = set()
+        """Обмінники, задекларовані в поточному з'єднанні. Декларуються заново після кожного перепідключення."""
+        self._window = threading.BoundedSemaphore(max_in_flight)
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._drain_scheduled = False
+        self._closing = False
+        self._was_open = False
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rabbit-publisher", daemon=True)
+        self._thread.start()
+
+    def publish(self, event_name: str, data: Any, exchange: str = EXCHANGE_NAME, exchange_type: str = EXCHANGE_TYPE,
+                routing_key: Optional[str] = None) -> Future:
+        """
+        Ставить подію в чергу публікації. Повідомлення містить назву події, дані та
+        часову мітку у форматі JSON і публікується як стійке (`delivery_mode=PERSISTENT`).
+
+        :param event_name: Назва події (наприклад, 'user.registered').
+        :type event_name: str
+        :param data: Корисне навантаження події.
+        :type data: Any
+        :param exchange: Обмінник.
+        :type exchange: str
+        :param exchange_type: Тип обмінника (для декларації).
+        :type exchange_type: str
+        :param routing_key: Ключ маршрутизації. Якщо None — назва події.
+        :type routing_key: Optional[str]
+        :return: Ф'ючерс, що виконується після підтвердження брокером (або з винятком при `nack`).
+        :rtype: Future
+        :raises RuntimeError: Якщо Publisher закрито.
+        """
+        if self._closing:
+            raise RuntimeError("RabbitPublisher закрито")
+        body = json.dumps({'event': event_name, 'data': data, 'timestamp': time.time()}).encode('utf-8')
+        future = Future()
+        self._window.acquire()
+        with self._condition:
+            self._pending += 1
+        future.add_done_callback(self._release)
+        self._outbox.append((exchange, exchange_type, event_name if routing_key is None else routing_key, body,
+                             future))
+        self._schedule_drain()
+        return future
+
+    def _release(self, future: Future):
+        """Внутрішній метод. Звільняє місце у вікні непідтверджених повідомлень."""
+        self._window.release()
+        with self._condition:
+            self._pending -= 1
+            if not self._pending:
+                self._condition.notify_all()
+
+    def _schedule_drain(self):
+        """Внутрішній метод. Будить I/O потік для публікації черги (не більше одного запланованого виклику)."""
+        connection = self._connection
+        with self._condition:
+            if self._drain_scheduled or connection is None:
+                return
+            self._drain_scheduled = True
+        try:
+            connection.ioloop.add_callback_threadsafe(self._drain)
+        except Exception:
+            # З'єднання закривається; черга буде опублікована після перепідключення.
+            with self._condition:
+                self._drain_scheduled = False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Чекає, доки всі опубліковані повідомлення будуть підтверджені брокером.
+
+        :param timeout: Найбільший час очікування (секунди). None — без обмеження.
+        :type timeout: Optional[float]
+        :return: True, якщо всі повідомлення підтверджено.
+        :rtype: bool
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """
+        Дочікується підтвердження повідомлень (не довше `timeout`) і закриває з'єднання.
+        Ф'ючерси непідтверджених повідомлень завершуються винятком.
+
+        :param timeout: Найбільший час очікування підтверджень (секунди).
+        :type timeout: Optional[float]
+        """
+        if self._closing:
+            return
+        self.flush(timeout)
+        self._closing = True
+        self._wakeup.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(functools.partial(self._close_connection, connection))
+            except Exception:
+                pass
+        self._thread.join(timeout)
+
+        error = RuntimeError("RabbitPublisher закрито до підтвердження повідомлення")
+        for state in self._open_channels:
+            self._outbox.extend(state.unconfirmed.values())
+        while self._outbox:
+            future = self._outbox.popleft()[4]
+            if not future.done():
+                future.set_exception(error)
+
+    # --- I/O потік ---
+
+    def _run(self):
+        """Внутрішній метод. Цикл I/O потоку: з'єднання, обробка подій, перепідключення з паузою."""
+        delay = self.reconnect_delay
+        while not self._closing:
+            self._was_open = False
+            try:
+                self._connection = self._connection_factory(
+                    parameters=self.parameters, on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_error, on_close_callback=self._on_connection_closed)
+                self._connection.ioloop.start()
+            except Exception as error:
+                logger.error("RABBIT PUBLISHER: Помилка з'єднання: %s", error)
+            if self._closing:
+                break
+            if self._was_open:
+                delay = self.reconnect_delay
+            logger.warning("RABBIT PUBLISHER: З'єднання втрачено, перепідключення через %.1f с", delay)
+            self._wakeup.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _on_connection_open(self, connection: Any):
+        self._was_open = True
+        logger.info("RABBIT PUBLISHER: З'єднання встановлено, відкриття %d каналів", self.channels)
+        for _ in range(self.channels):
+            connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection: Any, error: Exception):
+        logger.error("RABBIT PUBLISHER: Не вдалося підключитися: %s", error)
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection: Any, reason: Exception):
+        for state in reversed(self._open_channels):
+            self._requeue(state)
+        self._open_channels = []
+        self._declared = set()
+        with self._condition:
+            self._drain_scheduled = False
+        if not self._closing:
+            logger.warning("RABBIT PUBLISHER: З'єднання закрито: %s", reason)
+        connection.ioloop.stop()
+
+    def _close_connection(self, connection: Any):
+        if connection.is_open:
+            connection.close()
+        else:
+            connection.ioloop.stop()
+
+    def _on_channel_open(self, channel: Any):
+        state = _ChannelState(channel)
+        channel.add_on_close_callback(functools.partial(self._on_channel_closed, state))
+        channel.confirm_delivery(ack_nack_callback=functools.partial(self._on_confirm, state),
+                                 callback=lambda _: self._on_confirm_enabled(state))
+
+    def _on_confirm_enabled(self, state: _ChannelState):
+        self._open_channels.append(state)
+        self._drain()
+
+    def _on_channel_closed(self, state: _ChannelState, channel: Any, reason: Exception):
+        """
+        Внутрішній метод. Канал закрито брокером (наприклад, через помилку декларації):
+        повідомлення повертаються в чергу, а канал відкривається заново. Якщо канал
+        закрито під час декларації обмінника, повідомлення для нього завершуються винятком.
+        Канал, закритий ще до ввімкнення publisher confirms, теж відкривається заново,
+        щоб пул не зменшувався.
+        """
+        if state in self._open_channels:
+            self._open_channels.remove(state)
+            self._requeue(state)
+            if state.declaring is not None:
+                exchange, state.declaring = state.declaring, None
+                logger.error("RABBIT PUBLISHER: Не вдалося задекларувати обмінник '%s': %s", exchange, reason)
+                kept = collections.deque()
+                while self._outbox:
+                    message = self._outbox.popleft()
+                    if message[0] == exchange:
+                        message[4].set_exception(reason)
+                    else:
+                        kept.append(message)
+                self._outbox.extendleft(reversed(kept))
+        else:
+            logger.warning("RABBIT PUBLISHER: Канал закрито до ввімкнення підтверджень: %s", reason)
+        if not self._closing and self._connection is not None and self._connection.is_open:
+            self._connection.channel(on_open_callback=self._on_channel_open)
+
+    def _requeue(self, state: _ChannelState):
+        """Внутрішній метод. Повертає непідтверджені повідомлення каналу на початок черги."""
+        self._outbox.extendleft(reversed(state.unconfirmed.values()))
+        state.unconfirmed.clear()
+
+    def _on_declared(self, state: _ChannelState, exchange: str):
+        state.declaring = None
+        self._declared.add(exchange)
+        self._drain()
+
+    def _drain(self):
+        """Внутрішній метод (I/O потік). Публікує повідомлення з черги, декларуючи нові обмінники."""
+        with self._condition:
+            self._drain_scheduled = False
+        while self._outbox and self._open_channels:
+            exchange, exchange_type, routing_key, body, future = message = self._outbox[0]
+            if future.done():
+                self._outbox.popleft()
+                continue
+
+            if exchange not in self._declared:
+                if not any(state.declaring == exchange for state in self._open_channels):
+                    state = self._open_channels[0]
+                    state.declaring = exchange
+                    state.channel.exchange_declare(
+                        exchange=exchange, exchange_type=exchange_type,
+                        callback=functools.partial(lambda state, exchange, _: self._on_declared(state, exchange),
+                                                   state, exchange))
+                return
+
+            self._next_channel = (self._next_channel + 1) % len(self._open_channels)
+            state = self._open_channels[self._next_channel]
+            self._outbox.popleft()
+            state.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body,
+                                        properties=pika.BasicProperties(
+                                            delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE))
+            state.delivery_tag += 1
+            state.unconfirmed[state.delivery_tag] = message
+
+    def _on_confirm(self, state: _ChannelState, frame: Any):
+        """
+        Внутрішній метод (I/O потік). Обробляє `Basic.Ack` / `Basic.Nack`. При
+        `multiple=True` підтвердження стосується всіх повідомлень каналу до `delivery_tag`.
+        """
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = []
+            for tag in state.unconfirmed:
+                if tag > method.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [method.delivery_tag]
+
+        for tag in tags:
+            message = state.unconfirmed.pop(tag, None)
+            if message is None or message[4].done():
+                continue
+            if acked:
+                message[4].set_result(None)
+            else:
+                message[4].set_exception(RuntimeError(f"Брокер відхилив повідомлення (nack) '{message[2]}'"))
+
+
+_publisher: Optional[RabbitPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> RabbitPublisher:
+    """
+    Повертає спільний для процесу `RabbitPublisher`, створюючи його під час першого
+    виклику. Publisher закривається (з очікуванням підтверджень) при завершенні процесу.
+
+    :rtype: RabbitPublisher
+    """
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = RabbitPublisher()
+            atexit.register(_publisher.close)
+        return _publisher
+
+
+def produce_event(event_name, data, timeout=30.0):
+    """
+    Публікує подію через спільний довгоживучий `RabbitPublisher` і чекає на її
+    підтвердження брокером. З'єднання, канали та декларація обмінника створюються
+    один раз і перевикористовуються між викликами.
 
     Кожне повідомлення містить назву події, дані та часову мітку,
-    серіалізовані у формат JSON.
+    серіалізовані у формат JSON. Повідомлення стійке: RabbitMQ запише його
+    на диск, якщо сервер впаде до того, як повідомлення буде доставлено.
+
+    Для високої пропускної здатності використовуйте `get_publisher().publish(...)`
+    без очікування кожного підтвердження.
 
     :param event_name: Назва події (наприклад, 'user.registered').
     :type event_name: str
     :param data: Корисне навантаження події (словник).
     :type data: dict
+    :param timeout: Найбільший час очікування підтвердження (секунди).
+    :type timeout: float
+    :raises concurrent.futures.TimeoutError: Якщо брокер не підтвердив подію вчасно (наприклад, недоступний).
     """
-    connection = pika.BlockingConnection(CONNECTION_PARAMS)
-    channel = connection.channel()
-
-    # Тип 'fanout' означає: надіслати повідомлення всім чергам, прив'язаним до цього Exchange.
-    channel.exchange_declare(exchange=EXCHANGE_NAME, exchange_type='fanout')
-
-    message = json.dumps({'event': event_name, 'data': data, 'timestamp': time.time()})
-    channel.basic_publish(
-        exchange=EXCHANGE_NAME,
-        routing_key='',
-        body=message,
-        properties=pika.BasicProperties(
-            delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE  # Робить повідомлення стійким
-        )
-    )
-    """
-    Публікує повідомлення в обмінник:
-    - exchange=EXCHANGE_NAME: Відправляє до обмінника fanout.
-    - routing_key='': Для fanout ключ маршрутизації ігнорується.
-    - delivery_mode=PERSISTENT: Робить повідомлення стійким. RabbitMQ запише його на диск,
-    якщо сервер впаде до того, як повідомлення буде доставлено.
-    """
-
+    get_publisher().publish(event_name, data).result(timeout)
     print(f"[x] Producer: Надіслано {event_name}")
-    connection.close()
 
 
 if __name__ == '__main__':
@@ -55,4 +394,5 @@ if __name__ == '__main__':
         event_name="user.registered",
         data={"user_id": 102, "email": "jane@example.com", "username": "JaneSmith"}
     )
+    get_publisher().close()
     print("Готово")
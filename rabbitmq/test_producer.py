@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from fake_broker import FakeBroker
+from producer import RabbitPublisher
+
+
+@pytest.fixture
+def broker():
+    return FakeBroker()
+
+
+@pytest.fixture
+def publisher(broker):
+    publisher = RabbitPublisher(channels=2, reconnect_delay=0.01, connection_factory=broker.connect)
+    yield publisher
+    publisher.close(timeout=1.0)
+
+
+def _events(entries):
+    return [json.loads(entry[4])["data"]["n"] for entry in entries]
+
+
+def test_publish_multi_ack_reconnect_republish(broker, publisher):
+    futures = [publisher.publish("order.created", {"n": n}) for n in range(10)]
+    assert broker.wait_for(lambda: len(broker.published) == 10)
+    assert broker.exchanges == {"user_events_topic": "topic"}
+
+    broker.ack(multiple=True)
+    assert all(future.result(timeout=1.0) is None for future in futures)
+    assert publisher.flush(timeout=1.0)
+
+    futures = [publisher.publish("order.paid", {"n": n}) for n in range(10, 16)]
+    assert broker.wait_for(lambda: len(broker.published) == 16)
+    broker.drop_connection()
+
+    assert broker.wait_for(lambda: len(broker.connections) == 2 and len(broker.unconfirmed()) == 6)
+    assert sorted(_events(broker.unconfirmed())) == list(range(10, 16))
+    assert not any(future.done() for future in futures)
+
+    broker.ack(multiple=True)
+    assert all(future.result(timeout=1.0) is None for future in futures)
+
+
+def test_nack_fails_only_the_rejected_message(broker, publisher):
+    futures = [publisher.publish("order.created", {"n": n}) for n in range(4)]
+    assert broker.wait_for(lambda: len(broker.published) == 4)
+
+    rejected = broker.published[0]
+    broker.nack(rejected[0], rejected[1])
+    broker.ack(multiple=False)
+
+    results = {json.loads(entry[4])["data"]["n"]: entry for entry in broker.published}
+    for n, future in enumerate(futures):
+        if results[n] is rejected:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=1.0)
+        else:
+            assert future.result(timeout=1.0) is None
+
+
+def test_channel_close_requeues_unconfirmed(broker, publisher):
+    futures = [publisher.publish("order.created", {"n": n}) for n in range(6)]
+    assert broker.wait_for(lambda: len(broker.published) == 6)
+
+    channel = broker.published[0][0]
+    lost = _events(entry for entry in broker.published if entry[0] is channel)
+    broker.close_channel(channel)
+
+    assert broker.wait_for(lambda: len(broker.published) == 6 + len(lost)
+                           and sum(c.confirming for c in broker.connection.channels) == 2)
+    assert sorted(_events(broker.unconfirmed())) == list(range(6))
+    broker.ack(multiple=True)
+    assert all(future.result(timeout=1.0) is None for future in futures)
+
+
+def test_channel_closed_before_confirm_is_reopened(broker):
+    broker.close_before_confirm = 1
+    publisher = RabbitPublisher(channels=2, reconnect_delay=0.01, connection_factory=broker.connect)
+    try:
+        assert broker.wait_for(lambda: sum(c.confirming for c in broker.connection.channels) == 2)
+        future = publisher.publish("order.created", {"n": 1})
+        assert broker.wait_for(lambda: len(broker.published) == 1)
+        broker.ack()
+        assert future.result(timeout=1.0) is None
+    finally:
+        publisher.close(timeout=1.0)
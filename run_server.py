@@ -1,54 +1,205 @@
-from typing import Optional
+import argparse
+import os
+import tempfile
+from typing import List, Optional, Union
 
 import uvicorn
 from queue import Queue
 
-from app import app, set_event_bus
+from app import (app, set_event_bus, set_idempotency_cache, set_order_projection, EVENT_BROKER_SOCKET_ENV,
+                 EVENT_TRACE_FILE_ENV)
+from core.durable_bus import DurableEventBus
 from core.event_bus import EventBus
+from core.idempotency import IdempotencyCache
+from core.log_pipeline import LogPipeline
+from core.log_writer import EventLogWriter
+from core.metrics import REGISTRY
+from core.scheduler import EventScheduler
+from core.sharded_queue import ShardedQueue
+from core.tracing import TRACER, TraceWriter
+from core.transport import EventBroker
 
-from ecommerce.worker import start_worker, stop_worker, EventWorker
+from ecommerce.worker import start_worker, stop_worker, start_sharded_workers, stop_sharded_workers, EventWorker
 from ecommerce.notification_service import email_sender, sms_sender
+from ecommerce.notification_dispatcher import NotificationDispatcher
 from ecommerce.analytics_service import analytics_counter
+from ecommerce.order_projection import OrderProjection
 
-event_queue = Queue()
-bus = EventBus(event_queue)
-set_event_bus(bus)
+# Ініціалізація виконується у `setup()`, а не на рівні модуля: у режимі кількох
+# процесів uvicorn запускає дочірні процеси через spawn, і вони повторно
+# імпортують цей модуль — кожен з них не повинен створювати власну шину.
+event_queue: Optional[Union[Queue, ShardedQueue]] = None
+log_writer: Optional[EventLogWriter] = None
+bus: Optional[EventBus] = None
+notifications: Optional[NotificationDispatcher] = None
+projection: Optional[OrderProjection] = None
+trace_writer: Optional[TraceWriter] = None
+scheduler: Optional[EventScheduler] = None
+idempotency_cache: Optional[IdempotencyCache] = None
 
-bus.subscribe("order.created", email_sender)
-bus.subscribe("order.created", analytics_counter)
-bus.subscribe("order.paid", sms_sender)
-bus.subscribe("order.paid", analytics_counter)
+
+def setup(event_workers: int = 1, trace_file: Optional[str] = None, durable: bool = False):
+    """
+    Створює шину подій, підписки та допоміжні сервіси.
+
+    :param event_workers: Кількість EventWorker'ів. Якщо більше 1, використовується
+                          `ShardedQueue`, що зберігає порядок подій у межах одного `order_id`.
+    :type event_workers: int
+    :param trace_file: Файл трасування (формат Chrome Trace Event). Якщо None, трасування вимкнене.
+    :type trace_file: Optional[str]
+    :param durable: Якщо True, використовується `DurableEventBus`: чергою слугує `events.log`,
+                    а кожен слухач має власний курсор зі збереженим зміщенням (at-least-once).
+                    `event_workers` у цьому режимі не використовується.
+    :type durable: bool
+    """
+    global event_queue, log_writer, bus, notifications, projection, trace_writer, scheduler, idempotency_cache
+
+    if trace_file:
+        trace_writer = TraceWriter(trace_file)
+        TRACER.configure(trace_writer)
+
+    if durable:
+        bus = DurableEventBus("events.log", offsets_dir="bus_offsets")
+    else:
+        event_queue = ShardedQueue(event_workers) if event_workers > 1 else Queue()
+        log_writer = EventLogWriter("events.log")
+        bus = EventBus(event_queue, log_writer=log_writer)
+    set_event_bus(bus)
+    scheduler = EventScheduler(bus, journal_path="timers.journal")
+    bus.scheduler = scheduler
+    idempotency_cache = IdempotencyCache(max_size=100_000, ttl=24 * 3600, index_path="idempotency.index")
+    set_idempotency_cache(idempotency_cache)
+
+    # Сповіщення відправляються через окремі канали з лімітами провайдерів,
+    # щоб повільний провайдер не гальмував EventWorker та інших слухачів.
+    notifications = NotificationDispatcher()
+    email_channel = notifications.add_channel("email", email_sender, rate=10, burst=20, max_in_flight=8)
+    sms_channel = notifications.add_channel("sms", sms_sender, rate=5, burst=5, max_in_flight=4)
+
+    bus.subscribe("order.created", email_channel.as_listener())
+    bus.subscribe("order.created", analytics_counter)
+    bus.subscribe("order.paid", sms_channel.as_listener())
+    bus.subscribe("order.paid", analytics_counter)
+
+    projection = OrderProjection(archive_path="orders_archive.log")
+    set_order_projection(projection)
+    if durable:
+        bus.subscribe("order.*", projection.apply, subscriber_id="order_projection")
+        # Хвіст журналу після зафіксованого зміщення курсор проєкції доставить сам,
+        # тож відновлюємо лише події до нього, щоб не застосовувати їх двічі.
+        projection.rebuild("events.log", end_offset=bus.cursors["order_projection"].offset)
+    else:
+        projection.rebuild("events.log")
+        bus.subscribe("order.*", projection.apply)
 
 
 def run_worker():
     """
-    Запускає фоновий потік EventWorker, який буде безперервно
-    обробляти завдання з `event_queue`.
+    Запускає фонові потоки EventWorker, які будуть безперервно
+    обробляти завдання з `event_queue` (по одному на кожен шард).
 
-    Зберігає об'єкт потоку у глобальній змінній `worker_thread` для коректної зупинки.
+    Зберігає об'єкти потоків у глобальній змінній `worker_threads` для коректної зупинки.
+    У довговічному режимі замість EventWorker'ів запускаються курсори підписників.
     """
-    global worker_thread
+    global worker_threads
     print("SYSTEM: Запуск Worker'a...")
-    worker_thread = start_worker(event_queue)
+    if trace_writer:
+        trace_writer.start()
+    notifications.start()
+    if isinstance(bus, DurableEventBus):
+        worker_threads = bus.start()
+    else:
+        log_writer.start()
+        if isinstance(event_queue, ShardedQueue):
+            worker_threads = start_sharded_workers(event_queue)
+        else:
+            worker_threads = [start_worker(event_queue)]
+        REGISTRY.watch_queue(event_queue)
+    REGISTRY.watch_workers(worker_threads)
+    scheduler.start()
 
 
-def run_server():
+def stop_workers():
+    """
+    Зупиняє планувальник, EventWorker'и, диспетчер сповіщень, записувачі журналу,
+    індексу ідемпотентності та трасування.
+    """
+    scheduler.stop()
+    if isinstance(bus, DurableEventBus):
+        bus.stop()
+    elif worker_threads:
+        if isinstance(event_queue, ShardedQueue):
+            stop_sharded_workers(event_queue, worker_threads)
+        else:
+            stop_worker(event_queue, worker_threads[0])
+    notifications.stop()
+    if log_writer:
+        log_writer.stop()
+    if idempotency_cache:
+        idempotency_cache.close()
+    if trace_writer:
+        TRACER.configure(None)
+        trace_writer.stop()
+
+
+def run_server(workers: int = 1, host: str = "127.0.0.1", port: int = 8000):
     """
     Запускає основний веб-сервер FastAPI за допомогою Uvicorn.
     Це блокуюча операція, яка триватиме, поки не буде перервана (наприклад, Ctrl+C).
+
+    При `workers > 1` запускається `EventBroker` на Unix-domain сокеті, а процеси
+    uvicorn публікують події в нього (див. `app.lifespan`), тож усі процеси
+    використовують спільний пул EventWorker'ів та кеш ідемпотентності цього процесу.
+
+    :param workers: Кількість процесів uvicorn.
+    :type workers: int
     """
-    print("SYSTEM: Запуск FastAPI-сервера на http://127.0.0.1:8000")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    print(f"SYSTEM: Запуск FastAPI-сервера на http://{host}:{port} (процесів: {workers})")
+    if workers == 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    socket_path = os.path.join(tempfile.gettempdir(), f"event_broker_{os.getpid()}.sock")
+    broker = EventBroker(bus, socket_path, projection=projection, idempotency=idempotency_cache)
+    broker.start()
+    os.environ[EVENT_BROKER_SOCKET_ENV] = socket_path
+    if trace_writer:
+        os.environ[EVENT_TRACE_FILE_ENV] = trace_writer.filename
+    try:
+        uvicorn.run("app:app", host=host, port=port, workers=workers)
+    finally:
+        broker.stop()
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="FastAPI сервер вебхуків з EventBus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Кількість процесів uvicorn")
+    parser.add_argument("--event-workers", type=int, default=1,
+                        help="Кількість EventWorker'ів (порядок зберігається в межах order_id)")
+    parser.add_argument("--log-level", default="INFO", help="Рівень логування (DEBUG — діагностика кожної події)")
+    parser.add_argument("--log-sample-rate", type=float, default=1.0,
+                        help="Частка записів рівня INFO і нижче, що потрапляють у лог")
+    parser.add_argument("--durable", action="store_true",
+                        help="Довговічна шина: журнал подій як черга, зміщення кожного слухача в bus_offsets/")
+    parser.add_argument("--trace-file", help="Файл трасування подій у форматі Chrome Trace Event (напр. traces.json)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    worker_thread: Optional[EventWorker] = None
+    args = parse_args()
+    log_pipeline = LogPipeline(args.log_level.upper(), json_format=True, sample_rate=args.log_sample_rate).start()
+    worker_threads: List[EventWorker] = []
+    setup(args.event_workers, args.trace_file, args.durable)
     run_worker()
 
     try:
-        run_server()
+        run_server(args.workers, args.host, args.port)
     except KeyboardInterrupt:
+        pass
+    finally:
         print("\nSYSTEM: Отримано сигнал зупинки сервера. Завершення Worker'а...")
-        if worker_thread:
-            stop_worker(event_queue, worker_thread)
+        stop_workers()
         print("SYSTEM: Програма завершена.")
+        log_pipeline.stop()